@@ -0,0 +1,170 @@
+"""
+Size, load time, memory and accuracy of compact serving artifacts.
+
+Trains a TF-IDF bigram model like sentiment-model-v2 on a synthetic corpus
+(or takes `--model` and a labelled `--eval` JSONL), then exports it as:
+
+    pipeline                 the model.joblib itself
+    artifact                 the float64 serving artifact
+    float32 sorted           float32 parameters and a sorted vocabulary
+    int8 sorted              int8 log-probabilities and a sorted vocabulary
+    min-df 2 float32 sorted  also dropping features seen in one document
+    top-k int8 sorted        the --max-features most class-dependent features
+
+and reports for each the size on disk, the time to load it and compile its
+feature extractor in a fresh process (as a server worker does), the RSS
+afterwards, scoring throughput, held-out accuracy, and agreement with and
+largest probability difference from the pipeline.
+
+Usage:
+    $ python benchmarks/bench_compact_artifact.py --documents 200000
+    $ python benchmarks/bench_compact_artifact.py --model sentiment-model-v2/model.joblib --eval labelled.jsonl
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from bench_training import review, write_corpus
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server')
+sys.path.insert(0, SERVER_DIR)
+
+from artifact import export_serving_artifact, load_model  # noqa: E402
+from feature_extractor import compile_features  # noqa: E402
+
+LOAD_SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {server_dir!r})
+import numpy, sklearn.pipeline
+from artifact import load_model
+from feature_extractor import compile_features
+
+start = time.perf_counter()
+model = compile_features(load_model({path!r}))
+model.predict_proba(["warm up the lookup path"])
+elapsed = time.perf_counter() - start
+
+with open('/proc/self/status') as f:
+    rss = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+print(json.dumps({{"load_seconds": elapsed, "rss_mb": rss / 1024}}))
+"""
+
+
+def measure_load(path, repeats):
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, '-c', LOAD_SNIPPET.format(server_dir=SERVER_DIR, path=path)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    # The fastest run has a warm page cache, like a replica starting on a node that already serves the model
+    return min(runs, key=lambda r: r['load_seconds'])
+
+
+def disk_size_mb(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 2 ** 20
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 2 ** 20
+
+
+def throughput(model, texts, batch_size=64, seconds=2.0):
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    scored, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for batch in batches:
+            model.predict_proba(batch)
+            scored += len(batch)
+    return scored / (time.perf_counter() - start)
+
+
+def read_labelled(path):
+    texts, labels = [], []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                texts.append(record['text'])
+                labels.append(record['label'])
+    return texts, np.array(labels)
+
+
+def train_synthetic(directory, documents, seed):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.naive_bayes import MultinomialNB
+    from sklearn.pipeline import Pipeline
+
+    corpus = os.path.join(directory, 'corpus.jsonl')
+    write_corpus(corpus, documents, seed)
+    texts, labels = read_labelled(corpus)
+    model = Pipeline([('vectorizer', TfidfVectorizer(ngram_range=(1, 2))), ('classifier', MultinomialNB())])
+    model.fit(texts, labels)
+    path = os.path.join(directory, 'model.joblib')
+    joblib.dump(model, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Size, load time, memory and accuracy of compact serving artifacts')
+    parser.add_argument('--model', type=str, default=None, help='TF-IDF model.joblib (default: train a synthetic one)')
+    parser.add_argument('--eval', type=str, default=None, help='Held-out JSONL with text and label fields')
+    parser.add_argument('--documents', type=int, default=100000, help='Synthetic training corpus size')
+    parser.add_argument('--held-out', type=int, default=5000)
+    parser.add_argument('--max-features', type=int, default=50000)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.abspath(args.model) if args.model else train_synthetic(tmp, args.documents, args.seed)
+        if args.eval:
+            texts, labels = read_labelled(args.eval)
+        else:
+            rng = random.Random(args.seed + 1)
+            labels = np.array([rng.randint(0, 1) for _ in range(args.held_out)])
+            texts = [review(rng, label, max(args.documents, 1000)) for label in labels]
+
+        pipeline = joblib.load(model_path)
+        configs = [
+            ('pipeline', None),
+            ('artifact', {}),
+            ('float32 sorted', {'dtype': 'float32', 'sorted_vocabulary': True}),
+            ('int8 sorted', {'dtype': 'int8', 'sorted_vocabulary': True}),
+            ('min-df 2 float32 sorted', {'min_df': 2, 'dtype': 'float32', 'sorted_vocabulary': True}),
+            ('top-k int8 sorted', {'max_features': args.max_features, 'dtype': 'int8', 'sorted_vocabulary': True}),
+        ]
+
+        print(f"{'format':<24} {'size':>9} {'load':>8} {'RSS':>8} {'features':>10} {'docs/s':>8} "
+              f"{'accuracy':>9} {'agree':>8} {'max |dp|':>9}")
+        reference = None
+        for name, options in configs:
+            path = model_path
+            if options is not None:
+                path = os.path.join(tmp, name.replace(' ', '-'))
+                export_serving_artifact(pipeline, path, **options)
+
+            load = measure_load(path, args.repeats)
+            model = compile_features(load_model(path))
+            proba = model.predict_proba(texts)
+            predictions = model.classes_[proba.argmax(axis=1)]
+            if reference is None:
+                reference, reference_predictions = proba, predictions
+            n_features = len(model.named_steps['vectorizer'].vocabulary_)
+            print(f"{name:<24} {disk_size_mb(path):>7.1f}MB {load['load_seconds']:>7.2f}s "
+                  f"{load['rss_mb']:>6.0f}MB {n_features:>10,} {throughput(model, texts):>8.0f} "
+                  f"{np.mean(predictions == labels):>9.2%} "
+                  f"{np.mean(predictions == reference_predictions):>8.2%} "
+                  f"{np.abs(proba - reference).max():>9.2g}")
+
+
+if __name__ == '__main__':
+    main()
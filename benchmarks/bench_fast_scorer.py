@@ -0,0 +1,84 @@
+"""
+Compare the throughput of the NumPy fast scorer (server/fast_scorer.py) with
+the sklearn pipeline at several batch sizes. tests/test_fast_scorer.py checks
+that both give the same probabilities.
+
+Usage:
+    $ python benchmarks/bench_fast_scorer.py \\
+        --models sentiment-model-v1/model.joblib sentiment-model-v2/model.joblib
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+from artifact import load_model  # noqa: E402
+from fast_scorer import FastScorer  # noqa: E402
+
+sample_texts = [
+    "I love this product, it's amazing",
+    "Great service and fast delivery",
+    "This is terrible, doesn't work at all",
+    "Awful experience, never buying again",
+    "Fantastic customer support",
+    "Disappointed with the quality",
+    "Best purchase I've made this year",
+    "Would recommend to everyone",
+    "Complete waste of money",
+    "Exceeded all my expectations"
+]
+
+edge_texts = [
+    "",
+    "   ",
+    "zzz qqq unseen words only",
+    "GREAT great Great service SERVICE and and and fast",
+    "Complete waste of money. Complete waste of money!",
+    "I love this product, it's amazing " * 20,
+]
+
+
+def random_texts(rng, n):
+    words = ' '.join(sample_texts + edge_texts).split()
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(0, 30))) for _ in range(n)]
+
+
+def throughput(fn, batches, min_seconds=1.0):
+    instances = 0
+    start = time.perf_counter()
+    while True:
+        for batch in batches:
+            fn(batch)
+            instances += len(batch)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return instances / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput of the fast scorer')
+    parser.add_argument('--models', nargs='+',
+                        default=['sentiment-model-v1/model.joblib', 'sentiment-model-v2/model.joblib'])
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 64, 512])
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    for model_path in args.models:
+        model = load_model(model_path)
+        scorer = FastScorer.from_model(model)
+        print(f"\n{model_path}")
+
+        print(f"{'batch':>6} {'sklearn':>14} {'fast':>14} {'speedup':>8}")
+        for batch_size in args.batch_sizes:
+            batches = [[rng.choice(sample_texts) for _ in range(batch_size)] for _ in range(20)]
+            base = throughput(model.predict_proba, batches)
+            fast = throughput(scorer.predict_proba, batches)
+            print(f"{batch_size:>6} {base:>10.0f}/s {fast:>10.0f}/s {fast / base:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Compare the throughput of the compiled feature extractor
+(server/feature_extractor.py) with `vectorizer.transform` at several batch
+sizes. tests/test_feature_extractor.py checks that both produce the same
+matrix.
+
+Usage:
+    $ python benchmarks/bench_feature_extractor.py \\
+        --models sentiment-model-v1/model.joblib sentiment-model-v2/model.joblib
+"""
+
+import argparse
+import os
+import random
+import sys
+
+from bench_fast_scorer import sample_texts, throughput
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+from artifact import load_model  # noqa: E402
+from feature_extractor import FeatureExtractor  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput of the compiled feature extractor')
+    parser.add_argument('--models', nargs='+',
+                        default=['sentiment-model-v1/model.joblib', 'sentiment-model-v2/model.joblib'])
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 64, 512])
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for model_path in args.models:
+        vectorizer = load_model(model_path).named_steps['vectorizer']
+        extractor = FeatureExtractor(vectorizer)
+        print(f"\n{model_path}")
+
+        print(f"{'batch':>6} {'sklearn':>14} {'compiled':>14} {'speedup':>8}")
+        for batch_size in args.batch_sizes:
+            batches = [[rng.choice(sample_texts) for _ in range(batch_size)] for _ in range(20)]
+            base = throughput(vectorizer.transform, batches)
+            fast = throughput(extractor.transform, batches)
+            print(f"{batch_size:>6} {base:>10.0f}/s {fast:>10.0f}/s {fast / base:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
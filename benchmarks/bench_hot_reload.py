@@ -0,0 +1,135 @@
+"""
+Latency of requests that overlap a hot model reload.
+
+Starts the model server on a scratch copy of the model, drives it with
+`--concurrency` client threads, and every `--interval` seconds atomically
+replaces the model file, alternating between `--model` and `--other-model`
+(the server's file watcher picks the change up), or calls the reload endpoint
+with --admin. Latency is reported separately for requests that overlapped a
+reload and for the rest, along with the number of failed requests.
+tests/test_artifact.py checks that no request fails during a reload.
+
+Usage:
+    $ python benchmarks/bench_hot_reload.py --model sentiment-model-v1/model.joblib \\
+        --other-model sentiment-model-v2/model.joblib --duration 30
+"""
+
+import argparse
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import requests
+
+from bench_serving_modes import sample_texts, start_server
+
+
+def replace_model(source, target):
+    """Swap in a new model file the way a deploy should: write aside, then rename over."""
+    tmp = target + '.tmp'
+    shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+
+def reloads_total(base_url):
+    text = requests.get(f"{base_url}/metrics", timeout=5).text
+    match = re.search(r'^model_server_model_reloads_total (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive the model server while its model is reloaded')
+    parser.add_argument('--model', type=str, default='sentiment-model-v1/model.joblib')
+    parser.add_argument('--other-model', type=str, default='sentiment-model-v2/model.joblib')
+    parser.add_argument('--mode', choices=['gunicorn', 'asgi'], default='gunicorn')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--interval', type=float, default=2.0, help='Seconds between reloads')
+    parser.add_argument('--watch-seconds', type=float, default=0.5, help='MODEL_WATCH_SECONDS for the server')
+    parser.add_argument('--admin', action='store_true', help='Reload through the :reload endpoint instead')
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    url = f"{base_url}/v1/models/sentiment-classifier:predict"
+
+    workdir = tempfile.mkdtemp(prefix='hot-reload-')
+    model_path = os.path.join(workdir, 'model.joblib')
+    shutil.copyfile(args.model, model_path)
+
+    # One worker, so /metrics reports every reload
+    process = start_server(args.mode, model_path, args.port, 1,
+                           MODEL_WATCH_SECONDS=str(0 if args.admin else args.watch_seconds))
+
+    results = []  # (start, end, ok)
+    lock = threading.Lock()
+    reload_windows = []
+    stop_at = time.perf_counter() + args.duration
+
+    def client():
+        session = requests.Session()
+        rng = random.Random()
+        local = []
+        while time.perf_counter() < stop_at:
+            data = {"instances": [{"text": rng.choice(sample_texts)} for _ in range(rng.randint(1, 5))]}
+            start = time.perf_counter()
+            try:
+                ok = session.post(url, json=data, timeout=10).status_code == 200
+            except requests.exceptions.RequestException:
+                ok = False
+            local.append((start, time.perf_counter(), ok))
+        with lock:
+            results.extend(local)
+
+    def reloader():
+        sources = [args.other_model, args.model]
+        i = 0
+        time.sleep(args.interval)
+        while time.perf_counter() + args.interval < stop_at:
+            before = reloads_total(base_url)
+            started = time.perf_counter()
+            replace_model(sources[i % 2], model_path)
+            if args.admin:
+                requests.post(f"{base_url}/v1/models/sentiment-classifier:reload", timeout=30)
+            # The window lasts until the swap is visible in /metrics
+            while reloads_total(base_url) == before and time.perf_counter() < started + 10:
+                time.sleep(0.05)
+            reload_windows.append((started, time.perf_counter()))
+            i += 1
+            time.sleep(args.interval)
+
+    try:
+        threads = [threading.Thread(target=client) for _ in range(args.concurrency)]
+        threads.append(threading.Thread(target=reloader))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        reloads = reloads_total(base_url)
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    def overlaps(start, end):
+        return any(start < window_end and end > window_start for window_start, window_end in reload_windows)
+
+    errors = sum(1 for _, _, ok in results if not ok)
+    during = np.array([end - start for start, end, ok in results if ok and overlaps(start, end)]) * 1000
+    outside = np.array([end - start for start, end, ok in results if ok and not overlaps(start, end)]) * 1000
+
+    print(f"Requests: {len(results)}, errors: {errors}, reloads: {reloads:.0f}")
+    print(f"{'':<16} {'requests':>9} {'p50':>9} {'p99':>9} {'max':>9}")
+    for label, latencies in (('outside reloads', outside), ('during reloads', during)):
+        if len(latencies):
+            print(f"{label:<16} {len(latencies):>9} {np.percentile(latencies, 50):>7.2f}ms "
+                  f"{np.percentile(latencies, 99):>7.2f}ms {latencies.max():>7.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
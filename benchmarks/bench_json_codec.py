@@ -0,0 +1,56 @@
+"""
+Time the JSON codecs of the v1 predict endpoint.
+
+For every installed codec (server/json_codec.py), times request decoding and
+response encoding per batch size. tests/test_json_codec.py checks that they
+decode like `request.json` and encode byte-identically to Flask's `jsonify`.
+
+Usage:
+    $ python benchmarks/bench_json_codec.py
+"""
+
+import json
+import os
+import random
+import sys
+import timeit
+
+import numpy as np
+
+from bench_serving_modes import sample_texts
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+from json_codec import CODECS  # noqa: E402
+
+BATCH_SIZES = [1, 32, 256, 1024]
+
+
+def installed_codecs():
+    codecs = []
+    for name, codec in CODECS.items():
+        try:
+            codecs.append(codec())
+        except ImportError:
+            print(f"{name}: not installed, skipped")
+    return codecs
+
+
+def main():
+    rng = np.random.default_rng(0)
+    codecs = installed_codecs()
+
+    print(f"{'batch':>6} {'codec':<8} {'decode':>10} {'encode':>10}")
+    pick = random.Random(0).choice
+    for batch_size in BATCH_SIZES:
+        body = json.dumps({"instances": [{"text": pick(sample_texts)} for _ in range(batch_size)]}).encode('utf-8')
+        labels, confidences = rng.integers(0, 2, batch_size), rng.random(batch_size)
+        number = max(10, 20000 // batch_size)
+        for codec in codecs:
+            decode = timeit.timeit(lambda: codec.decode_predict_request(body), number=number) / number
+            encode = timeit.timeit(lambda: codec.encode_predictions(labels, confidences), number=number) / number
+            print(f"{batch_size:>6} {codec.name:<8} {decode * 1e6:>8.1f}us {encode * 1e6:>8.1f}us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Measure model startup time and memory for the joblib pipeline and the
+memory-mapped serving artifact (server/artifact.py).
+
+Each load happens in a fresh subprocess, which is what a cold start or a
+scale-from-zero replica sees. For each format it reports the time spent in the
+load call, the process RSS afterwards, and how much of that RSS is
+file-backed (shareable between replicas on the same node) vs anonymous.
+
+The demo models are tiny, so `--synthetic-vocab N` trains a TF-IDF bigram
+model with roughly N features on generated text to show how both paths scale.
+
+Usage:
+    $ python benchmarks/bench_model_load.py --model sentiment-model-v2/model.joblib
+    $ python benchmarks/bench_model_load.py --synthetic-vocab 500000
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server')
+sys.path.insert(0, SERVER_DIR)
+
+LOAD_SNIPPET = """
+import json, sys, time
+sys.path.insert(0, {server_dir!r})
+import numpy, sklearn.pipeline
+from artifact import load_model
+
+start = time.perf_counter()
+model = load_model({path!r})
+model.predict_proba(["warm up the lookup path"])
+elapsed = time.perf_counter() - start
+
+status = {{}}
+with open('/proc/self/status') as f:
+    for line in f:
+        key, _, value = line.partition(':')
+        if key in ('VmRSS', 'RssAnon', 'RssFile'):
+            status[key] = int(value.split()[0]) / 1024
+print(json.dumps({{"load_seconds": elapsed, **status}}))
+"""
+
+
+def measure(path, repeats):
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, '-c', LOAD_SNIPPET.format(server_dir=SERVER_DIR, path=path)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    # Report the fastest run, i.e. with a warm page cache, like a replica
+    # starting on a node that already serves the model
+    return min(runs, key=lambda r: r['load_seconds'])
+
+
+def build_synthetic(directory, vocab_size, seed=0):
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.naive_bayes import MultinomialNB
+    from sklearn.pipeline import Pipeline
+    from artifact import export_serving_artifact
+
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(max(1, vocab_size // 4))]
+    texts = [' '.join(rng.choice(words) for _ in range(12)) for _ in range(vocab_size // 6 + 10)]
+    labels = [rng.randint(0, 1) for _ in texts]
+
+    model = Pipeline([
+        ('vectorizer', TfidfVectorizer(ngram_range=(1, 2))),
+        ('classifier', MultinomialNB())
+    ])
+    model.fit(texts, labels)
+
+    joblib_path = os.path.join(directory, 'model.joblib')
+    artifact_path = os.path.join(directory, 'serving')
+    joblib.dump(model, joblib_path)
+    export_serving_artifact(model, artifact_path)
+    print(f"Synthetic model with {len(model[0].vocabulary_)} features")
+    return joblib_path, artifact_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare joblib and memory-mapped model loading')
+    parser.add_argument('--model', type=str, default='sentiment-model-v2/model.joblib')
+    parser.add_argument('--artifact', type=str, default=None,
+                        help='Serving artifact directory (exported from --model if not given)')
+    parser.add_argument('--synthetic-vocab', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.synthetic_vocab:
+            joblib_path, artifact_path = build_synthetic(tmp, args.synthetic_vocab)
+        else:
+            joblib_path, artifact_path = args.model, args.artifact
+            if artifact_path is None:
+                import joblib
+                from artifact import export_serving_artifact
+                artifact_path = os.path.join(tmp, 'serving')
+                export_serving_artifact(joblib.load(joblib_path), artifact_path)
+
+        print(f"{'format':<10} {'load':>9} {'RSS':>9} {'anon':>9} {'file':>9}")
+        for name, path in (('joblib', joblib_path), ('mmap', artifact_path)):
+            r = measure(path, args.repeats)
+            print(f"{name:<10} {r['load_seconds'] * 1000:>7.1f}ms {r['VmRSS']:>7.1f}MB "
+                  f"{r['RssAnon']:>7.1f}MB {r['RssFile']:>7.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Overload scenario: does goodput hold when offered load exceeds capacity?
+
+Starts the server under gunicorn and drives it with the open-loop load
+generator (scripts/async_load_generator.py) on a step profile: half of
+capacity, then `--overload` times capacity, then half again. It is run three
+ways:
+
+    unbounded  - admission control off (MAX_IN_FLIGHT=0), the old behaviour:
+                 every request is accepted and queues until it is served
+    admission  - admission control on; clients send their timeout as a
+                 deadline, so requests they gave up on are dropped unscored
+    priority   - admission control on, with a `high` priority client at a quarter
+                 of capacity next to a `best-effort` client supplying the
+                 overload
+
+Goodput is responses with status 200 within the client timeout, per second.
+Without admission control it collapses during the overload step and stays
+low while the queue drains; with it, goodput stays near capacity and excess
+requests get a fast 429/503. In the priority run, the high-priority client
+should see almost no shedding.
+
+Capacity is measured first with 16 closed-loop clients, unless `--capacity` is
+given.
+
+Usage:
+    $ python benchmarks/bench_overload.py --model sentiment-model-v2/model.joblib
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from bench_serving_modes import drive, start_server
+
+LOAD_GENERATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts',
+                              'async_load_generator.py')
+
+
+def start_load(port, steps, timeout, output, *extra):
+    return subprocess.Popen(
+        [sys.executable, LOAD_GENERATOR, '--port', str(port), '--profile', 'step', '--steps', steps,
+         '--timeout', str(timeout), '--connections', '1000', '--output-json', output, *extra],
+        stdout=subprocess.DEVNULL)
+
+
+def run_load(port, steps, timeout, *clients):
+    """Run one load generator per client (extra arguments); returns their results."""
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = [os.path.join(tmp, f'client{i}.json') for i in range(len(clients))]
+        processes = [start_load(port, steps, timeout, output, *extra) for output, extra in zip(outputs, clients)]
+        for process in processes:
+            process.wait()
+        results = []
+        for output in outputs:
+            with open(output) as f:
+                results.append(json.load(f))
+        return results
+
+
+def measure_capacity(model, port):
+    server = start_server('gunicorn', model, port, 1)
+    try:
+        url = f"http://127.0.0.1:{port}/v1/models/sentiment-classifier:predict"
+        drive(url, 16, 1.0)  # warm-up
+        return drive(url, 16, 5.0)['throughput_rps']
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def phase_summary(result, phases):
+    """Goodput, failed requests and worst p99 of successes per phase of the step profile."""
+    timeline = {row['second']: row for row in result['timeline']}
+    summary, start = [], 0
+    for _, seconds in phases:
+        rows = [timeline[s] for s in range(start, start + int(seconds)) if s in timeline]
+        start += int(seconds)
+        summary.append({
+            "goodput": sum(row['ok'] for row in rows) / seconds,
+            "failed": sum(row['errors'] for row in rows) / seconds,
+            "p99_ms": max((row['p99_ms'] for row in rows if row['ok']), default=None),
+        })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Goodput under overload with and without admission control')
+    parser.add_argument('--model', type=str, default='sentiment-model-v2/model.joblib')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--capacity', type=float, default=None, help='Requests/second one worker can serve')
+    parser.add_argument('--overload', type=float, default=3.0, help='Offered load during the overload step')
+    parser.add_argument('--phase-seconds', type=int, default=10)
+    parser.add_argument('--timeout', type=float, default=2.0, help='Client timeout (and deadline) in seconds')
+    args = parser.parse_args()
+
+    capacity = args.capacity or measure_capacity(args.model, args.port)
+    print(f"Capacity: {capacity:.0f} requests/second")
+
+    phases = [(capacity * 0.5, args.phase_seconds), (capacity * args.overload, args.phase_seconds * 2),
+              (capacity * 0.5, args.phase_seconds)]
+    steps = ','.join(f"{rate:.0f}x{seconds}" for rate, seconds in phases)
+    deadline = ['--deadline-ms', str(int(args.timeout * 1000))]
+
+    # The priority run splits the same load between a high and a best-effort client
+    high_rate = capacity * 0.25
+    best_effort = ','.join(f"{max(1.0, rate - high_rate):.0f}x{seconds}" for rate, seconds in phases)
+
+    scenarios = [
+        ('unbounded', {'MAX_IN_FLIGHT': '0'}, [[]]),
+        ('admission', {}, [deadline]),
+        ('priority', {}, [deadline + ['--priority', 'high', '--steps', f"{high_rate:.0f}x{args.phase_seconds * 4}"],
+                          deadline + ['--priority', 'best-effort', '--steps', best_effort]]),
+    ]
+
+    names = ['before', 'overload', 'after']
+    print(f"\n{'scenario':<24}" + ''.join(f"{name + ' goodput':>18}{'p99':>9}" for name in names)
+          + f"{'failed/s':>9}")
+    for scenario, env, clients in scenarios:
+        server = start_server('gunicorn', args.model, args.port, 1, **env)
+        try:
+            results = run_load(args.port, steps, args.timeout, *clients)
+        finally:
+            server.terminate()
+            server.wait()
+
+        for result in results:
+            label = scenario if len(results) == 1 else f"{scenario} ({result['config']['priority']})"
+            summary = phase_summary(result, phases)
+            row = ''.join(f"{phase['goodput']:>16.0f}/s{phase['p99_ms'] or 0:>7.0f}ms" for phase in summary)
+            print(f"{label:<24}{row}{summary[1]['failed']:>9.0f}")
+            codes = ', '.join(f"{code}: {count}" for code, count in sorted(result['status_codes'].items()))
+            print(f"{'':<24}responses: {codes}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Overhead of request tracing and the sampling profiler.
+
+Runs the same closed-loop load against gunicorn with:
+
+    off          tracing and profiling disabled (the default)
+    trace 1/100  REQUEST_TRACE_EVERY=100
+    trace all    REQUEST_TRACE_EVERY=1, every request traced and logged
+    profiling    GET /admin/profile running for the whole measurement
+
+and reports throughput and latency for each, relative to `off`.
+
+Usage:
+    $ python benchmarks/bench_profiling.py --model sentiment-model-v2/model.joblib
+"""
+
+import argparse
+import threading
+
+import requests
+
+from bench_serving_modes import drive, start_server
+
+CONFIGS = [
+    ('off', {}, False),
+    ('trace 1/100', {'REQUEST_TRACE_EVERY': '100'}, False),
+    ('trace all', {'REQUEST_TRACE_EVERY': '1'}, False),
+    ('profiling', {'PROFILING_ENABLED': 'true'}, True),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Overhead of request tracing and the sampling profiler')
+    parser.add_argument('--model', type=str, default='sentiment-model-v2/model.joblib')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per configuration')
+    args = parser.parse_args()
+
+    base = f"http://127.0.0.1:{args.port}"
+    url = f"{base}/v1/models/sentiment-classifier:predict"
+
+    print(f"{'config':<14} {'req/s':>9} {'p50':>9} {'p99':>9} {'vs off':>8}")
+    baseline = None
+    for name, env, profile in CONFIGS:
+        server = start_server('gunicorn', args.model, args.port, 1, **env)
+        try:
+            drive(url, args.concurrency, 1.0)  # warm-up
+            profiler = None
+            if profile:
+                profiler = threading.Thread(target=requests.get, args=(f"{base}/admin/profile",),
+                                            kwargs={'params': {'seconds': args.duration + 1}})
+                profiler.start()
+            r = drive(url, args.concurrency, args.duration)
+            if profiler:
+                profiler.join()
+        finally:
+            server.terminate()
+            server.wait()
+
+        baseline = baseline or r['throughput_rps']
+        print(f"{name:<14} {r['throughput_rps']:>9.0f} {r['p50_ms']:>7.2f}ms {r['p99_ms']:>7.2f}ms "
+              f"{r['throughput_rps'] / baseline - 1:>+7.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+Scale-out simulation: latency while replicas join a load-balanced pool.
+
+Starts one replica (gunicorn, one worker, as in kubernetes/kserve_autoscaling.yaml),
+then sends open-loop traffic at `--rate` requests per second through a
+client-side round-robin balancer while `--replicas - 1` more replicas start,
+one every `--join-every` seconds. Like a Kubernetes Service, the balancer
+polls each new replica's /v2/health/ready every 50ms and only sends it
+traffic once it returns 200. It is run two ways:
+
+    cold   WARMUP_BATCHES=0, the old behaviour: ready as soon as the port is
+           open, so the first requests a replica is sent load its model
+           (in MODEL_DIR mode) and run the scoring path for the first time
+    warm   the default: ready once the worker has loaded and warmed up
+           every model it serves
+
+and reports overall latency percentiles, the p99 over the 2 seconds after
+each replica joined, the slowest request, and the latency of the first
+`--first` requests each new replica served.
+
+By default it serves a synthetic TF-IDF bigram model, large enough for
+loading to matter, from a MODEL_DIR; `--model` serves a given model.joblib
+and `--single` serves it as MODEL_PATH, where it is loaded before the port
+opens.
+
+Usage:
+    $ python benchmarks/bench_scale_out.py --documents 200000 --rate 20
+    $ python benchmarks/bench_scale_out.py --model sentiment-model-v2/model.joblib --single
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from bench_compact_artifact import train_synthetic
+from bench_serving_modes import MODES, SERVER_DIR, sample_texts
+
+MODEL_NAME = 'sentiment-classifier'
+
+
+class Replica:
+    def __init__(self, port, env):
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}/v1/models/{MODEL_NAME}:predict"
+        self.process = subprocess.Popen(MODES['gunicorn'], cwd=SERVER_DIR,
+                                        env=dict(env, PORT=str(port), WEB_CONCURRENCY='1', GRPC_PORT='0'),
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.started = time.perf_counter()
+        self.joined = None
+
+    def ready(self):
+        try:
+            return requests.get(f"http://127.0.0.1:{self.port}/v2/health/ready", timeout=1).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+class Balancer:
+    """Round-robin over the replicas whose readiness probe has passed."""
+
+    def __init__(self):
+        self.pool = []
+        self.pending = []
+        self.lock = threading.Lock()
+        self.next = 0
+        self.stopped = threading.Event()
+        self.prober = threading.Thread(target=self._probe, daemon=True)
+        self.prober.start()
+
+    def add(self, replica):
+        with self.lock:
+            self.pending.append(replica)
+
+    def _probe(self):
+        while not self.stopped.wait(0.05):
+            with self.lock:
+                pending = list(self.pending)
+            for replica in pending:
+                if replica.ready():
+                    replica.joined = time.perf_counter()
+                    with self.lock:
+                        self.pending.remove(replica)
+                        self.pool.append(replica)
+
+    def pick(self):
+        with self.lock:
+            replica = self.pool[self.next % len(self.pool)]
+            self.next += 1
+            return replica
+
+
+def run(policy, env, args):
+    env = dict(env, WARMUP_BATCHES='0' if policy == 'cold' else str(args.warmup_batches))
+    balancer = Balancer()
+    replicas = [Replica(args.port, env)]
+    balancer.add(replicas[0])
+    deadline = time.time() + 60
+    while not balancer.pool:
+        if time.time() > deadline:
+            raise RuntimeError(f"First replica did not become ready on port {args.port}")
+        time.sleep(0.05)
+
+    session = threading.local()
+    results = []
+    lock = threading.Lock()
+
+    def send(intended, replica, data):
+        if not hasattr(session, 'value'):
+            session.value = requests.Session()
+        try:
+            ok = session.value.post(replica.url, json=data, timeout=30).status_code == 200
+        except requests.exceptions.RequestException:
+            ok = False
+        with lock:
+            # From when it should have been sent, so a stalled client is not hidden (open loop)
+            results.append((intended, time.perf_counter() - intended, replica.port, ok))
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    join_times = [start + args.join_every * i for i in range(1, args.replicas)]
+    try:
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            for i in range(int(args.duration * args.rate)):
+                intended = start + i / args.rate
+                while join_times and join_times[0] <= intended:
+                    join_times.pop(0)
+                    replicas.append(Replica(args.port + len(replicas), env))
+                    balancer.add(replicas[-1])
+                delay = intended - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                data = {"instances": [{"text": rng.choice(sample_texts)} for _ in range(rng.randint(1, 5))]}
+                pool.submit(send, intended, balancer.pick(), data)
+    finally:
+        balancer.stopped.set()
+        balancer.prober.join()
+        for replica in replicas:
+            replica.stop()
+
+    latencies = np.array([latency for _, latency, _, ok in results if ok]) * 1000
+    report = {
+        "errors": sum(1 for *_, ok in results if not ok),
+        "p50": np.percentile(latencies, 50),
+        "p99": np.percentile(latencies, 99),
+        "max": latencies.max(),
+        "after_join_p99": [],
+        "first": [],
+        "join_seconds": [],
+    }
+    for replica in replicas[1:]:
+        if replica.joined is None:
+            continue
+        report["join_seconds"].append(replica.joined - replica.started)
+        after = [latency for intended, latency, _, ok in results
+                 if ok and replica.joined <= intended < replica.joined + 2]
+        first = sorted(((intended, latency) for intended, latency, port, ok in results
+                        if ok and port == replica.port))[:args.first]
+        if after:
+            report["after_join_p99"].append(np.percentile(after, 99) * 1000)
+        if first:
+            report["first"].append(max(latency for _, latency in first) * 1000)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latency while replicas join a load-balanced pool')
+    parser.add_argument('--model', type=str, default=None, help='model.joblib (default: train a synthetic one)')
+    parser.add_argument('--documents', type=int, default=200000, help='Synthetic training corpus size')
+    parser.add_argument('--single', action='store_true', help='Serve the model as MODEL_PATH instead of MODEL_DIR')
+    parser.add_argument('--rate', type=float, default=20.0, help='Requests per second, below one replica\'s capacity')
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--replicas', type=int, default=3)
+    parser.add_argument('--join-every', type=float, default=5.0)
+    parser.add_argument('--first', type=int, default=10, help='Requests per new replica to report on')
+    parser.add_argument('--warmup-batches', type=int, default=3)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--port', type=int, default=8120)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.abspath(args.model) if args.model else train_synthetic(tmp, args.documents, args.seed)
+        env = dict(os.environ)
+        if args.single:
+            env['MODEL_PATH'] = model_path
+        else:
+            version_dir = os.path.join(tmp, 'models', MODEL_NAME, '1')
+            os.makedirs(version_dir)
+            shutil.copy(model_path, os.path.join(version_dir, 'model.joblib'))
+            env['MODEL_DIR'] = os.path.join(tmp, 'models')
+
+        print(f"{'policy':<8} {'p50':>8} {'p99':>8} {'max':>9} {'errors':>7}  "
+              f"{'join after':>12}  {'p99 2s after join':>20}  {'first requests max':>20}")
+        for policy in ('cold', 'warm'):
+            r = run(policy, env, args)
+            print(f"{policy:<8} {r['p50']:>6.1f}ms {r['p99']:>6.1f}ms {r['max']:>7.1f}ms {r['errors']:>7}  "
+                  f"{' '.join(f'{s:.1f}s' for s in r['join_seconds']):>12}  "
+                  f"{' '.join(f'{v:.0f}ms' for v in r['after_join_p99']):>20}  "
+                  f"{' '.join(f'{v:.0f}ms' for v in r['first']):>20}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Compare the serving modes of the model server on the local machine:
+
+    flask     - Flask development server (the old `python model_server.py`)
+    gunicorn  - gunicorn with preloaded gthread workers (gunicorn.conf.py)
+    asgi      - gunicorn with uvicorn workers serving asgi.py
+
+Each mode is started as a subprocess, warmed up, and then driven by
+`--concurrency` client threads for `--duration` seconds with keep-alive
+sessions. Throughput and latency percentiles are printed per mode.
+
+Usage:
+    $ python benchmarks/bench_serving_modes.py --model sentiment-model-v1/model.joblib
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import requests
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server')
+
+MODES = {
+    'flask': [sys.executable, 'model_server.py'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'model_server:app'],
+    'asgi': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+             '-k', 'uvicorn.workers.UvicornWorker', 'asgi:app'],
+}
+
+sample_texts = [
+    "I love this product, it's amazing",
+    "Great service and fast delivery",
+    "This is terrible, doesn't work at all",
+    "Awful experience, never buying again",
+    "Fantastic customer support",
+    "Disappointed with the quality",
+    "Best purchase I've made this year",
+    "Would recommend to everyone",
+    "Complete waste of money",
+    "Exceeded all my expectations"
+]
+
+
+def start_server(mode, model_path, port, workers, **extra_env):
+    env = dict(os.environ, MODEL_PATH=os.path.abspath(model_path), PORT=str(port), WEB_CONCURRENCY=str(workers),
+               **extra_env)
+    process = subprocess.Popen(MODES[mode], cwd=SERVER_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    health_url = f"http://127.0.0.1:{port}/v1/models/sentiment-classifier"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(health_url, timeout=1).status_code == 200:
+                return process
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+
+    process.terminate()
+    raise RuntimeError(f"{mode} server did not become ready on port {port}")
+
+
+def drive(url, concurrency, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        session = requests.Session()
+        rng = random.Random()
+        local = []
+        while time.perf_counter() < stop_at:
+            data = {"instances": [{"text": rng.choice(sample_texts)} for _ in range(rng.randint(1, 5))]}
+            start = time.perf_counter()
+            try:
+                ok = session.post(url, json=data, timeout=10).status_code == 200
+            except requests.exceptions.RequestException:
+                ok = False
+            if ok:
+                local.append(time.perf_counter() - start)
+            else:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput_rps": len(latencies) / duration,
+        "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Flask dev server vs gunicorn vs ASGI')
+    parser.add_argument('--model', type=str, default='sentiment-model-v1/model.joblib')
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for gunicorn modes')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per mode')
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}/v1/models/sentiment-classifier:predict"
+
+    print(f"{'mode':<10} {'req/s':>9} {'p50':>9} {'p99':>9} {'errors':>7}")
+    for mode in args.modes:
+        process = start_server(mode, args.model, args.port, args.workers)
+        try:
+            drive(url, args.concurrency, 1.0)  # warm-up
+            r = drive(url, args.concurrency, args.duration)
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{mode:<10} {r['throughput_rps']:>9.1f} {r['p50_ms']:>7.2f}ms {r['p99_ms']:>7.2f}ms {r['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
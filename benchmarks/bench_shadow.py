@@ -0,0 +1,75 @@
+"""
+Client latency with shadow traffic on, and what the comparison reports.
+
+Serves `--model` under gunicorn and mirrors requests to `--shadow` at each
+sample rate in `--sample-rates` (0 = shadowing off). For each it reports the
+client's throughput and latency, then the shadow statistics from
+/v1/models/sentiment-classifier/stats: requests scored and dropped, label
+agreement rate, mean confidence delta and the shadow model's p50 latency.
+
+Client latency should stay close to the `0` row. Run below saturation (the
+default `--concurrency` of 2 on a machine with a few cores): shadow scoring
+uses spare CPU in the worker, and a fully loaded worker has none.
+
+Usage:
+    $ python benchmarks/bench_shadow.py --model sentiment-model-v1/model.joblib \\
+        --shadow sentiment-model-v2/model.joblib
+"""
+
+import argparse
+import os
+import time
+
+import requests
+
+from bench_serving_modes import drive, start_server
+
+
+def histogram_percentile(snapshot, q):
+    """Upper bound of the bucket holding the q-th quantile of a Histogram snapshot."""
+    target = q * snapshot['count']
+    # jsonify sorts the keys as strings, so put the buckets back in order
+    for bound, cumulative in sorted((float(b), n) for b, n in snapshot['buckets'].items()):
+        if cumulative >= target:
+            return bound
+    return float('inf')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Client latency and model comparison with shadow traffic')
+    parser.add_argument('--model', type=str, default='sentiment-model-v1/model.joblib')
+    parser.add_argument('--shadow', type=str, default='sentiment-model-v2/model.joblib')
+    parser.add_argument('--sample-rates', nargs='+', type=float, default=[0, 0.1, 1.0])
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--concurrency', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per sample rate')
+    args = parser.parse_args()
+
+    base = f"http://127.0.0.1:{args.port}/v1/models/sentiment-classifier"
+
+    print(f"{'sample':>7} {'req/s':>8} {'p50':>9} {'p99':>9} {'scored':>8} {'dropped':>8} {'agree':>7} "
+          f"{'delta':>7} {'shadow p50':>11}")
+    for rate in args.sample_rates:
+        env = {'SHADOW_MODEL_PATH': os.path.abspath(args.shadow), 'SHADOW_SAMPLE_RATE': str(rate)} if rate else {}
+        server = start_server('gunicorn', args.model, args.port, 1, **env)
+        try:
+            drive(f"{base}:predict", args.concurrency, 1.0)  # warm-up
+            r = drive(f"{base}:predict", args.concurrency, args.duration)
+            time.sleep(0.5)  # let the shadow queue drain
+            shadow = requests.get(f"{base}/stats").json()['shadow']
+        finally:
+            server.terminate()
+            server.wait()
+
+        line = f"{rate:>7g} {r['throughput_rps']:>8.0f} {r['p50_ms']:>7.2f}ms {r['p99_ms']:>7.2f}ms"
+        if shadow:
+            agreement = shadow['agreement_rate'] or 0.0
+            delta = shadow['mean_confidence_delta'] or 0.0
+            p50 = histogram_percentile(shadow['latency_seconds'], 0.5) * 1000
+            line += (f" {shadow['scored']:>8} {shadow['dropped']:>8} {agreement:>7.1%} {delta:>+7.3f} "
+                     f"{'<=' + format(p50, 'g') + 'ms':>11}")
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Compare the original two-pass inference path (`model.predict` followed by
+`model.predict_proba` and a per-row formatting loop) with the single-pass path
+used by the model server.
+
+Requests are built the same way the load generators build them: 1-5 instances
+drawn from the sample review texts. CPU time is measured with
+`time.process_time` so the numbers are not skewed by other load on the box.
+
+Usage:
+    $ python benchmarks/bench_single_pass.py \\
+        --models sentiment-model-v1/model.joblib sentiment-model-v2/model.joblib
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+from inference import predict_with_confidence, format_predictions  # noqa: E402
+
+sample_texts = [
+    "I love this product, it's amazing",
+    "Great service and fast delivery",
+    "This is terrible, doesn't work at all",
+    "Awful experience, never buying again",
+    "Fantastic customer support",
+    "Disappointed with the quality",
+    "Best purchase I've made this year",
+    "Would recommend to everyone",
+    "Complete waste of money",
+    "Exceeded all my expectations"
+]
+
+
+def two_pass(model, texts):
+    predictions = model.predict(texts)
+    probabilities = model.predict_proba(texts)
+    results = []
+    for i, pred in enumerate(predictions):
+        results.append({
+            'prediction': int(pred),
+            'confidence': float(probabilities[i][pred])
+        })
+    return results
+
+
+def single_pass(model, texts):
+    labels, confidences = predict_with_confidence(model, texts)
+    return format_predictions(labels, confidences)
+
+
+def make_requests(n, seed=0):
+    rng = random.Random(seed)
+    return [[rng.choice(sample_texts) for _ in range(rng.randint(1, 5))] for _ in range(n)]
+
+
+def cpu_per_request(fn, model, requests_):
+    start = time.process_time()
+    for texts in requests_:
+        fn(model, texts)
+    return (time.process_time() - start) / len(requests_)
+
+
+def check_parity(model, requests_):
+    for texts in requests_:
+        expected = two_pass(model, texts)
+        actual = single_pass(model, texts)
+        for e, a in zip(expected, actual):
+            assert e['prediction'] == a['prediction'], (texts, e, a)
+            assert np.isclose(e['confidence'], a['confidence']), (texts, e, a)
+
+
+def run(model_path, num_requests):
+    model = joblib.load(model_path)
+    requests_ = make_requests(num_requests)
+    check_parity(model, requests_[:200])
+
+    # Warm up both paths before timing
+    cpu_per_request(two_pass, model, requests_[:50])
+    cpu_per_request(single_pass, model, requests_[:50])
+
+    before = cpu_per_request(two_pass, model, requests_)
+    after = cpu_per_request(single_pass, model, requests_)
+    return {
+        "model": model_path,
+        "two_pass_us": before * 1e6,
+        "single_pass_us": after * 1e6,
+        "saving_pct": (1 - after / before) * 100,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark single-pass vs two-pass inference')
+    parser.add_argument('--models', nargs='+',
+                        default=['sentiment-model-v1/model.joblib', 'sentiment-model-v2/model.joblib'])
+    parser.add_argument('--requests', type=int, default=2000, help='Number of requests to score')
+    args = parser.parse_args()
+
+    print(f"{'model':<40} {'two-pass':>12} {'single-pass':>12} {'saving':>8}")
+    for model_path in args.models:
+        r = run(model_path, args.requests)
+        print(f"{r['model']:<40} {r['two_pass_us']:>10.1f}us {r['single_pass_us']:>10.1f}us {r['saving_pct']:>7.1f}%")
+
+
+if __name__ == '__main__':
+    main()
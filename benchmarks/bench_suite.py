@@ -0,0 +1,259 @@
+"""
+Repeatable performance numbers for the serving stack, saved as JSON, and a
+comparison between two result files that flags regressions.
+
+`run` measures, for each model:
+
+    load_seconds                    loading the model in a fresh process
+    load_rss_mb                     RSS of that process after loading
+    infer_batch_<n>_per_second      instances/second scored in-process at batch
+                                    size n, through the same model wrapper as
+                                    the server (batch 1 is single inference)
+    http_p50_ms, http_p99_ms        latency of one client against a locally
+                                    started server (gunicorn + model_server.py)
+    http_throughput_rps             requests/second with `--concurrency` clients
+    replica_pss_mb, replica_rss_mb  memory of the whole server (master and
+                                    workers) after that traffic
+
+Each number is the median of `--repeats` runs. Nothing needs more than a
+Linux box: the server runs on a local port and memory is read from /proc.
+
+`compare` lines up two result files and reports every metric that got worse
+by more than `--threshold` (relative), exiting with status 1 if there are
+any, so it can gate CI. Throughputs regress when they fall, times and memory
+when they rise.
+
+Usage:
+    $ python benchmarks/bench_suite.py run --output results/baseline.json
+    $ python benchmarks/bench_suite.py run --output results/candidate.json
+    $ python benchmarks/bench_suite.py compare results/baseline.json results/candidate.json --threshold 0.1
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from bench_fast_scorer import sample_texts, throughput
+from bench_model_load import measure as measure_load
+from bench_serving_modes import MODES, SERVER_DIR, drive, start_server
+
+sys.path.insert(0, SERVER_DIR)
+
+from model_repository import ServedModel, ServingOptions  # noqa: E402
+
+# Which direction is better, by metric name suffix
+LOWER_IS_BETTER = ('_seconds', '_ms', '_mb')
+HIGHER_IS_BETTER = ('_per_second', '_rps')
+
+
+def metric(value, unit, samples):
+    return {"value": value, "unit": unit, "samples": samples}
+
+
+def median_of(repeats, fn):
+    samples = [fn() for _ in range(repeats)]
+    return statistics.median(samples), samples
+
+
+def model_label(path):
+    """`sentiment-model-v2/model.joblib` -> `sentiment-model-v2`."""
+    path = os.path.normpath(path)
+    if os.path.isfile(path):
+        path = os.path.dirname(path)
+    return os.path.basename(path)
+
+
+def bench_load(path, repeats):
+    runs = [measure_load(os.path.abspath(path), 1) for _ in range(repeats)]
+    seconds = [r['load_seconds'] for r in runs]
+    rss = [r['VmRSS'] for r in runs]
+    return {
+        "load_seconds": metric(statistics.median(seconds), "s", seconds),
+        "load_rss_mb": metric(statistics.median(rss), "MB", rss),
+    }
+
+
+def bench_inference(path, batch_sizes, repeats, seconds):
+    served = ServedModel('bench', '1', path, ServingOptions(batching=False))
+    served.warm_up()
+    rng = random.Random(0)
+    results = {}
+    for batch_size in batch_sizes:
+        batches = [[rng.choice(sample_texts) for _ in range(batch_size)] for _ in range(20)]
+        value, samples = median_of(repeats, lambda: throughput(served.run_model, batches, seconds))
+        results[f"infer_batch_{batch_size}_per_second"] = metric(value, "instances/s", samples)
+    return results
+
+
+def process_tree(pid):
+    pids = [pid]
+    for child in open(f'/proc/{pid}/task/{pid}/children').read().split():
+        pids.extend(process_tree(int(child)))
+    return pids
+
+
+def tree_memory_mb(pid):
+    """PSS and RSS summed over a process and its descendants, in MB."""
+    pss = rss = 0
+    for p in process_tree(pid):
+        with open(f'/proc/{p}/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key == 'Pss':
+                    pss += int(value.split()[0])
+                elif key == 'Rss':
+                    rss += int(value.split()[0])
+    return pss / 1024, rss / 1024
+
+
+def bench_http(path, mode, port, workers, concurrency, repeats, seconds):
+    url = f"http://127.0.0.1:{port}/v1/models/sentiment-classifier:predict"
+    server = start_server(mode, path, port, workers)
+    try:
+        drive(url, concurrency, 1.0)  # warm-up
+        latency = [drive(url, 1, seconds) for _ in range(repeats)]
+        loaded = [drive(url, concurrency, seconds)['throughput_rps'] for _ in range(repeats)]
+        # Give workers a moment to return memory held for in-flight requests
+        time.sleep(0.5)
+        pss, rss = tree_memory_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+    p50 = [r['p50_ms'] for r in latency]
+    p99 = [r['p99_ms'] for r in latency]
+    return {
+        "http_p50_ms": metric(statistics.median(p50), "ms", p50),
+        "http_p99_ms": metric(statistics.median(p99), "ms", p99),
+        "http_throughput_rps": metric(statistics.median(loaded), "requests/s", loaded),
+        "replica_pss_mb": metric(pss, "MB", [pss]),
+        "replica_rss_mb": metric(rss, "MB", [rss]),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=SERVER_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    metrics = {}
+    for path in args.models:
+        label = model_label(path)
+        print(f"{label}: load")
+        results = bench_load(path, args.repeats)
+        print(f"{label}: inference")
+        results.update(bench_inference(path, args.batch_sizes, args.repeats, args.seconds))
+        if not args.skip_http:
+            print(f"{label}: HTTP ({args.server_mode}, {args.workers} worker(s))")
+            results.update(bench_http(path, args.server_mode, args.port, args.workers, args.concurrency,
+                                      args.repeats, args.seconds))
+        for name, result in results.items():
+            metrics[f"{label}.{name}"] = result
+
+    output = {
+        "meta": {
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            "git_commit": git_commit(),
+            "hostname": platform.node(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "config": {k: v for k, v in vars(args).items() if k not in ('command', 'func', 'output')},
+        },
+        "metrics": metrics,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+
+    print(f"\n{'metric':<56} {'value':>12}")
+    for name, result in metrics.items():
+        print(f"{name:<56} {result['value']:>12.4g} {result['unit']}")
+    print(f"\nSaved to {args.output}")
+
+
+def direction(name):
+    """+1 if larger values are better, -1 if smaller are, 0 if unknown."""
+    if name.endswith(HIGHER_IS_BETTER):
+        return 1
+    if name.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    for key in ('platform', 'cpu_count', 'python'):
+        if baseline['meta'].get(key) != candidate['meta'].get(key):
+            print(f"Warning: {key} differs ({baseline['meta'].get(key)} vs {candidate['meta'].get(key)}); "
+                  f"results may not be comparable")
+
+    regressions = []
+    print(f"{'metric':<56} {'baseline':>12} {'candidate':>12} {'change':>8}")
+    for name in sorted(set(baseline['metrics']) | set(candidate['metrics'])):
+        old, new = baseline['metrics'].get(name), candidate['metrics'].get(name)
+        if old is None or new is None:
+            print(f"{name:<56} {'only in ' + ('candidate' if old is None else 'baseline'):>34}")
+            continue
+        old, new = old['value'], new['value']
+        change = (new - old) / old if old else 0.0
+        worse = -change * direction(name)
+        flag = ''
+        if worse > args.threshold:
+            flag = 'REGRESSION'
+            regressions.append(name)
+        elif -worse > args.threshold:
+            flag = 'improved'
+        print(f"{name:<56} {old:>12.4g} {new:>12.4g} {change:>+7.1%} {flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serving stack benchmark suite with regression checks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run the suite and save the results as JSON')
+    run_parser.add_argument('--models', nargs='+',
+                            default=['sentiment-model-v1/model.joblib', 'sentiment-model-v2/model.joblib'])
+    run_parser.add_argument('--output', type=str, default='benchmark-results.json')
+    run_parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 64, 512])
+    run_parser.add_argument('--repeats', type=int, default=3, help='Runs per measurement; the median is kept')
+    run_parser.add_argument('--seconds', type=float, default=3.0, help='Duration of each throughput run')
+    run_parser.add_argument('--server-mode', choices=list(MODES), default='gunicorn')
+    run_parser.add_argument('--port', type=int, default=18080)
+    run_parser.add_argument('--workers', type=int, default=1, help='gunicorn workers per replica')
+    run_parser.add_argument('--concurrency', type=int, default=16, help='Clients for the throughput run')
+    run_parser.add_argument('--skip-http', action='store_true', help='Only run the in-process benchmarks')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser('compare', help='Flag regressions between two result files')
+    compare_parser.add_argument('baseline', type=str)
+    compare_parser.add_argument('candidate', type=str)
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='Relative change counted as a regression (0.1 = 10%%)')
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Peak memory and wall time of in-memory versus streaming training.
+
+Generates a synthetic labelled review corpus of `--documents` rows as JSONL,
+then trains on it with:
+
+    in-memory v1         CountVectorizer + MultinomialNB, `fit` on lists (as train_model_v1.py)
+    in-memory v2         TfidfVectorizer(1, 2) + MultinomialNB, `fit` on lists (as train_model_v2.py)
+    streaming            models/train_streaming.py, full vocabulary
+    streaming pruned     the same with --min-df 2 --max-features 200000
+    streaming hashed     the same with --features hashed
+
+each in its own process, sampling the PSS of its process tree (so worker
+processes count, and shared pages only once) for the peak. Each model then
+scores a held-out set; the table shows accuracy, agreement with in-memory v2
+and the largest difference from its probabilities. The unpruned streaming
+model should agree on every review, with probabilities equal up to rounding.
+
+Usage:
+    $ python benchmarks/bench_training.py --documents 500000 --workers 4
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from bench_suite import tree_memory_mb
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+POSITIVE = ['great', 'excellent', 'love', 'fantastic', 'perfect', 'recommend', 'happy', 'fast', 'sturdy', 'best']
+NEGATIVE = ['terrible', 'awful', 'broken', 'waste', 'refund', 'disappointed', 'slow', 'cheap', 'worst', 'returned']
+NEUTRAL = ['product', 'delivery', 'price', 'battery', 'screen', 'quality', 'box', 'order', 'size', 'colour',
+           'the', 'it', 'was', 'and', 'with', 'for', 'this', 'after', 'week', 'day']
+
+# Trains the way the existing scripts do: the whole corpus as lists, then `fit`
+IN_MEMORY = """
+import json, sys, joblib
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline
+
+corpus, output, version = sys.argv[1:]
+texts, labels = [], []
+with open(corpus) as f:
+    for line in f:
+        record = json.loads(line)
+        texts.append(record['text'])
+        labels.append(record['label'])
+vectorizer = CountVectorizer() if version == 'v1' else TfidfVectorizer(ngram_range=(1, 2))
+model = Pipeline([('vectorizer', vectorizer), ('classifier', MultinomialNB())])
+model.fit(texts, labels)
+joblib.dump(model, output)
+"""
+
+
+def review(rng, label, rare_words):
+    sentiment, opposite = (POSITIVE, NEGATIVE) if label else (NEGATIVE, POSITIVE)
+    words = [rng.choice(NEUTRAL) for _ in range(rng.randint(8, 30))]
+    for _ in range(rng.randint(1, 3)):
+        # Mixed reviews: one sentiment word in four has the opposite polarity
+        words.insert(rng.randrange(len(words)), rng.choice(sentiment if rng.random() < 0.75 else opposite))
+    # Product names, typos and the like: the long tail that makes vocabularies large
+    for _ in range(rng.randint(1, 4)):
+        words.insert(rng.randrange(len(words)), f"w{rng.randrange(rare_words)}")
+    return ' '.join(words)
+
+
+def write_corpus(path, documents, seed):
+    rng = random.Random(seed)
+    rare_words = max(documents, 1000)
+    with open(path, 'w') as f:
+        for _ in range(documents):
+            label = rng.randint(0, 1)
+            f.write(json.dumps({"text": review(rng, label, rare_words), "label": label}) + '\n')
+
+
+def run_measured(cmd, interval=0.05):
+    """Run `cmd`, returning (seconds, peak tree PSS in MB, peak tree RSS in MB)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    peak_pss = peak_rss = 0
+    while proc.poll() is None:
+        try:
+            pss, rss = tree_memory_mb(proc.pid)
+        except (FileNotFoundError, ProcessLookupError):
+            pss = rss = 0
+        peak_pss, peak_rss = max(peak_pss, pss), max(peak_rss, rss)
+        time.sleep(interval)
+    elapsed = time.perf_counter() - start
+    if proc.returncode:
+        raise SystemExit(f"{' '.join(cmd)} exited with {proc.returncode}")
+    return elapsed, peak_pss, peak_rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Peak memory and wall time of in-memory versus streaming training')
+    parser.add_argument('--documents', type=int, default=200000)
+    parser.add_argument('--held-out', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    trainer = os.path.join(ROOT, 'models', 'train_streaming.py')
+    streaming = [sys.executable, trainer, '--workers', str(args.workers), '--chunk-size', str(args.chunk_size)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, 'corpus.jsonl')
+        write_corpus(corpus, args.documents, args.seed)
+        print(f"Corpus: {args.documents:,} reviews, {os.path.getsize(corpus) / 2 ** 20:.0f}MB")
+
+        rng = random.Random(args.seed + 1)
+        held_out_labels = np.array([rng.randint(0, 1) for _ in range(args.held_out)])
+        held_out = [review(rng, label, max(args.documents, 1000)) for label in held_out_labels]
+
+        def output(name):
+            return os.path.join(tmp, name, 'model.joblib')
+
+        configs = [
+            ('in-memory v1', [sys.executable, '-c', IN_MEMORY, corpus, output('v1'), 'v1'], 'v1'),
+            ('in-memory v2', [sys.executable, '-c', IN_MEMORY, corpus, output('v2'), 'v2'], 'v2'),
+            ('streaming', streaming + ['--input', corpus, '--output', os.path.join(tmp, 's')], 's'),
+            ('streaming pruned', streaming + ['--input', corpus, '--output', os.path.join(tmp, 'p'),
+                                              '--min-df', '2', '--max-features', '200000'], 'p'),
+            ('streaming hashed', streaming + ['--input', corpus, '--output', os.path.join(tmp, 'h'),
+                                              '--features', 'hashed'], 'h'),
+        ]
+
+        print(f"{'trainer':<18} {'wall':>8} {'peak PSS':>10} {'peak RSS':>10} {'features':>10} "
+              f"{'accuracy':>9} {'agree v2':>9} {'max |dp|':>9}")
+        reference = reference_proba = None
+        for name, cmd, directory in configs:
+            os.makedirs(os.path.join(tmp, directory), exist_ok=True)
+            seconds, pss, rss = run_measured(cmd)
+
+            model = joblib.load(output(directory))
+            proba = model.predict_proba(held_out)
+            predictions = model.classes_[proba.argmax(axis=1)]
+            if directory == 'v2':
+                reference, reference_proba = predictions, proba
+            n_features = model.named_steps['classifier'].feature_count_.shape[1]
+            if reference is None:
+                comparison = f"{'-':>9} {'-':>9}"
+            else:
+                comparison = (f"{np.mean(predictions == reference):>9.2%} "
+                              f"{np.abs(proba - reference_proba).max():>9.2g}")
+            print(f"{name:<18} {seconds:>7.1f}s {pss:>8.0f}MB {rss:>8.0f}MB {n_features:>10,} "
+                  f"{np.mean(predictions == held_out_labels):>9.2%} {comparison}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Compare payload size and server CPU of the v1 and v2 prediction protocols.
+
+    v1         - POST /v1/models/<name>:predict with {"instances": [{"text": ...}]}
+    v2-json    - POST /v2/models/<name>/infer with a JSON BYTES tensor
+    v2-binary  - the same with the binary data extension for inputs and outputs
+
+Requests are sent through Flask's test client inside this process, with
+prebuilt request bodies and batching off, so the CPU time per request is the
+server's own work: parsing, scoring and serializing. The model cost is the
+same for every protocol, so differences come from encoding.
+
+Usage:
+    $ python benchmarks/bench_v2_protocol.py --model sentiment-model-v1/model.joblib
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from bench_serving_modes import sample_texts
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+from v2_protocol import HEADER_LENGTH, encode_bytes_tensor  # noqa: E402
+
+
+def v1_request(texts):
+    return json.dumps({"instances": [{"text": text} for text in texts]}).encode('utf-8'), {}
+
+
+def v2_json_request(texts):
+    body = {"inputs": [{"name": "text", "datatype": "BYTES", "shape": [len(texts)], "data": texts}]}
+    return json.dumps(body).encode('utf-8'), {}
+
+
+def v2_binary_request(texts):
+    data = encode_bytes_tensor(texts)
+    header = json.dumps({
+        "inputs": [{"name": "text", "datatype": "BYTES", "shape": [len(texts)],
+                    "parameters": {"binary_data_size": len(data)}}],
+        "parameters": {"binary_data_output": True},
+    }).encode('utf-8')
+    return header + data, {HEADER_LENGTH: str(len(header))}
+
+
+PROTOCOLS = {
+    'v1': ('/v1/models/sentiment-classifier:predict', v1_request),
+    'v2-json': ('/v2/models/sentiment-classifier/infer', v2_json_request),
+    'v2-binary': ('/v2/models/sentiment-classifier/infer', v2_binary_request),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare v1 and v2 protocol payloads and server CPU')
+    parser.add_argument('--model', type=str, default='sentiment-model-v1/model.joblib')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 32, 256, 1024])
+    parser.add_argument('--requests', type=int, default=200, help='Requests per protocol and batch size')
+    args = parser.parse_args()
+
+    os.environ['MODEL_PATH'] = os.path.abspath(args.model)
+    os.environ['BATCHING_ENABLED'] = 'false'
+    os.environ['MODEL_WATCH_SECONDS'] = '0'
+    import model_server
+    client = model_server.app.test_client()
+
+    rng = random.Random(0)
+    print(f"{'batch':>6} {'protocol':<10} {'request':>10} {'response':>10} {'cpu/request':>12}")
+    for batch_size in args.batch_sizes:
+        texts = [rng.choice(sample_texts) for _ in range(batch_size)]
+        for protocol, (path, build) in PROTOCOLS.items():
+            body, headers = build(texts)
+            response = client.post(path, data=body, headers=headers, content_type='application/json')
+            assert response.status_code == 200, response.data
+            response_bytes = len(response.data)
+
+            n = max(1, args.requests // max(1, batch_size // 32))
+            start = time.process_time()
+            for _ in range(n):
+                client.post(path, data=body, headers=headers, content_type='application/json')
+            cpu_ms = (time.process_time() - start) / n * 1000
+
+            print(f"{batch_size:>6} {protocol:<10} {len(body):>9}B {response_bytes:>9}B {cpu_ms:>10.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
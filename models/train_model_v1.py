@@ -18,10 +18,13 @@ Pipeline Components:
 
 Outputs:
     - Saves the trained model pipeline to 'sentiment-model-v1/model.joblib'
+    - With --serving-artifact, also writes a memory-mappable serving artifact
+      to 'sentiment-model-v1/serving' (see server/artifact.py)
 
 Usage:
     Run this script directly to train and save the model:
     $ python train_model_v1.py
+    $ python train_model_v1.py --serving-artifact
 
 Requirements:
     - numpy
@@ -37,6 +40,13 @@ from sklearn.naive_bayes import MultinomialNB
 from sklearn.pipeline import Pipeline
 import joblib
 import os
+import sys
+import argparse
+
+parser = argparse.ArgumentParser(description='Train the sentiment model')
+parser.add_argument('--serving-artifact', action='store_true',
+                    help='Also export a memory-mappable serving artifact')
+args = parser.parse_args()
 
 # Sample dataset for text classification
 texts = [
@@ -69,4 +79,12 @@ os.makedirs("sentiment-model-v1", exist_ok=True)
 # Save the model
 joblib.dump(model, 'sentiment-model-v1/model.joblib')
 
-print("Model saved to 'sentiment-model-v1/model.joblib'")
\ No newline at end of file
+print("Model saved to 'sentiment-model-v1/model.joblib'")
+
+# Export the memory-mappable serving artifact
+if args.serving_artifact:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+    from artifact import export_serving_artifact
+
+    export_serving_artifact(model, 'sentiment-model-v1/serving')
+    print("Serving artifact saved to 'sentiment-model-v1/serving'")
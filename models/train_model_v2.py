@@ -5,6 +5,13 @@ from sklearn.naive_bayes import MultinomialNB
 from sklearn.pipeline import Pipeline
 import joblib
 import os
+import sys
+import argparse
+
+parser = argparse.ArgumentParser(description='Train the sentiment model')
+parser.add_argument('--serving-artifact', action='store_true',
+                    help='Also export a memory-mappable serving artifact')
+args = parser.parse_args()
 
 # Enhanced dataset for text classification
 texts = [
@@ -43,4 +50,12 @@ os.makedirs("sentiment-model-v2", exist_ok=True)
 # Save the model
 joblib.dump(improved_model, 'sentiment-model-v2/model.joblib')
 
-print("Improved model saved to 'sentiment-model-v2/model.joblib'")
\ No newline at end of file
+print("Improved model saved to 'sentiment-model-v2/model.joblib'")
+
+# Export the memory-mappable serving artifact
+if args.serving_artifact:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+    from artifact import export_serving_artifact
+
+    export_serving_artifact(improved_model, 'sentiment-model-v2/serving')
+    print("Serving artifact saved to 'sentiment-model-v2/serving'")
@@ -0,0 +1,300 @@
+"""
+Train the sentiment model from a labelled corpus that does not fit in memory.
+
+`train_model_v1.py` and `train_model_v2.py` fit on Python lists held in
+memory, and their vectorizers keep every n-gram they have seen. This script
+reads the corpus from disk in chunks, vectorizes the chunks on a pool of
+worker processes, and trains MultinomialNB with `partial_fit` one chunk at a
+time, so memory is bounded by the chunk size and the feature space instead
+of the corpus.
+
+Two feature spaces are available:
+
+    vocabulary  (default) two passes over the corpus. The first counts in how
+                many documents each n-gram appears, pruning the rarest
+                candidates whenever more than --max-candidates are held; the
+                second vectorizes with the `--max-features` most frequent
+                n-grams that pass --min-df. The result is an ordinary fitted
+                TfidfVectorizer (or CountVectorizer with --counts) pipeline,
+                so the server's fast paths and serving artifacts work as
+                with the existing scripts. Without pruning it produces the
+                same model as `fit` on the whole corpus.
+    hashed      n-grams are hashed into --n-features columns with a
+                HashingVectorizer, so no vocabulary is kept at all. TF-IDF
+                needs document frequencies first, so with TF-IDF it also
+                makes two passes; --counts trains in one. The server scores
+                hashed models through the sklearn pipeline.
+
+The output directory gets `model.joblib` (and `serving/` with
+--serving-artifact), like `sentiment-model-v2/`.
+
+Input is JSONL, CSV or Parquet (optionally gzipped JSONL/CSV) with a text and
+a label column, read the same way as scripts/bulk_score.py reads it.
+
+Usage:
+    $ python models/train_streaming.py --input reviews.jsonl.gz --output sentiment-model-v3
+    $ python models/train_streaming.py --input reviews.parquet --output sentiment-model-hashed \\
+        --features hashed --n-features 1048576 --workers 8
+"""
+
+import argparse
+import collections
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+sys.path.insert(0, os.path.join(ROOT, 'server'))
+
+from bulk_score import chunked, read_columns  # noqa: E402
+
+
+def parse_label(value):
+    # CSV gives every label as a string; keep integer labels integers like the existing models
+    if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+        return int(value)
+    return value
+
+
+def read_examples(path, text_field, label_field):
+    """Yield (text, label) for every row of the corpus; a row without a label is an error."""
+    for row, (text, label) in enumerate(read_columns(path, [text_field, label_field]), 1):
+        if label is None or label == '':
+            raise SystemExit(f"{path}: row {row} has no label (`{label_field}`)")
+        yield text or '', parse_label(label)
+
+
+def read_chunks(path, text_field, label_field, chunk_size):
+    """Yield (texts, labels) chunks of the corpus."""
+    for chunk in chunked(read_examples(path, text_field, label_field), chunk_size):
+        yield [text for text, _ in chunk], [label for _, label in chunk]
+
+
+def smooth_idf(document_frequency, n_documents):
+    """The idf TfidfVectorizer(smooth_idf=True) computes for these document frequencies."""
+    return np.log((1 + n_documents) / (1 + np.asarray(document_frequency, dtype=np.float64))) + 1
+
+
+def peak_rss_mb():
+    """Peak RSS of this process and of its largest finished worker, in MB."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own, workers
+
+
+# Per-process vectorizer, set by the pool initializer
+_vectorizer = None
+
+
+def _init_worker(vectorizer):
+    global _vectorizer
+    _vectorizer = vectorizer
+
+
+def _count_terms(texts):
+    """Document frequency of each n-gram in the chunk."""
+    analyze = _vectorizer.build_analyzer()
+    counts = collections.Counter()
+    for text in texts:
+        counts.update(set(analyze(text)))
+    return counts
+
+
+def _hashed_document_frequency(texts):
+    X = _vectorizer.transform(texts)
+    return np.bincount(X.indices, minlength=X.shape[1]).astype(np.int64)
+
+
+def _transform(texts):
+    return _vectorizer.transform(texts)
+
+
+def in_order(pool, fn, chunks, window):
+    """
+    Map `fn` over the texts of each (texts, labels) chunk on `pool`, yielding
+    (result, labels) in input order with at most `window` chunks in flight.
+    """
+    pending = collections.deque()
+    for texts, labels in chunks:
+        pending.append((pool.submit(fn, texts), labels))
+        if len(pending) >= window:
+            future, labels = pending.popleft()
+            yield future.result(), labels
+    while pending:
+        future, labels = pending.popleft()
+        yield future.result(), labels
+
+
+class Trainer:
+    def __init__(self, args):
+        self.args = args
+        self.n_documents = 0
+        self.classes = set()
+        self.timings = {}
+
+    def chunks(self):
+        return read_chunks(self.args.input, self.args.text_field, self.args.label_field, self.args.chunk_size)
+
+    def pool(self, vectorizer):
+        return ProcessPoolExecutor(self.args.workers, initializer=_init_worker, initargs=(vectorizer,))
+
+    def progress(self, stage, documents):
+        print(f"{stage}: {documents:,} documents", flush=True)
+
+    def count_vocabulary(self, analyzer_vectorizer):
+        """First pass: document frequencies of candidate n-grams, pruned to --max-candidates."""
+        args = self.args
+        document_frequency = {}
+        pruned_below = 0
+        with self.pool(analyzer_vectorizer) as pool:
+            for counts, labels in in_order(pool, _count_terms, self.chunks(), args.workers * 2):
+                for term, count in counts.items():
+                    document_frequency[term] = document_frequency.get(term, 0) + count
+                self.n_documents += len(labels)
+                self.classes.update(labels)
+
+                if len(document_frequency) > args.max_candidates:
+                    # Drop the rarest candidates until half the budget is free
+                    while len(document_frequency) > args.max_candidates // 2:
+                        pruned_below += 1
+                        document_frequency = {t: c for t, c in document_frequency.items() if c > pruned_below}
+                    print(f"Pruned candidates seen in {pruned_below} documents or fewer", flush=True)
+                self.progress('Counted', self.n_documents)
+        return document_frequency, pruned_below
+
+    def select_vocabulary(self, document_frequency):
+        args = self.args
+        terms = [t for t, c in document_frequency.items() if c >= args.min_df]
+        if args.max_features and len(terms) > args.max_features:
+            # Most frequent first, ties broken by term so the result is deterministic
+            terms.sort(key=lambda t: (-document_frequency[t], t))
+            terms = terms[:args.max_features]
+        terms.sort()
+        return {term: index for index, term in enumerate(terms)}
+
+    def vocabulary_model(self):
+        args = self.args
+        vectorizer_class = CountVectorizer if args.counts else TfidfVectorizer
+        params = dict(ngram_range=tuple(args.ngram_range), lowercase=not args.no_lowercase)
+
+        start = time.perf_counter()
+        document_frequency, pruned_below = self.count_vocabulary(vectorizer_class(**params))
+        vocabulary = self.select_vocabulary(document_frequency)
+        self.timings['pass 1'] = time.perf_counter() - start
+        print(f"Vocabulary: {len(vocabulary):,} of {len(document_frequency):,} candidate n-grams"
+              + (f" (pruned below {pruned_below + 1} documents)" if pruned_below else ""))
+
+        vectorizer = vectorizer_class(vocabulary=vocabulary, **params).fit([""])
+        if not args.counts:
+            df = np.zeros(len(vocabulary), dtype=np.int64)
+            for term, index in vocabulary.items():
+                df[index] = document_frequency[term]
+            vectorizer.idf_ = smooth_idf(df, self.n_documents)
+        del document_frequency
+
+        classifier = self.train(vectorizer)
+        return Pipeline([('vectorizer', vectorizer), ('classifier', classifier)])
+
+    def hashed_model(self):
+        args = self.args
+        vectorizer = HashingVectorizer(n_features=args.n_features, ngram_range=tuple(args.ngram_range),
+                                       lowercase=not args.no_lowercase, alternate_sign=False, norm=None)
+        steps = [('vectorizer', vectorizer)]
+        if not args.counts:
+            start = time.perf_counter()
+            df = np.zeros(args.n_features, dtype=np.int64)
+            with self.pool(vectorizer) as pool:
+                for chunk_df, labels in in_order(pool, _hashed_document_frequency, self.chunks(), args.workers * 2):
+                    df += chunk_df
+                    self.n_documents += len(labels)
+                    self.classes.update(labels)
+                    self.progress('Counted', self.n_documents)
+            self.timings['pass 1'] = time.perf_counter() - start
+
+            tfidf = TfidfTransformer().fit(sp.csr_matrix((1, args.n_features)))
+            tfidf.idf_ = smooth_idf(df, self.n_documents)
+            steps.append(('tfidf', tfidf))
+        elif args.classes:
+            self.classes.update(parse_label(c) for c in args.classes)
+        else:
+            raise SystemExit("--features hashed --counts trains in one pass, so it needs --classes")
+
+        classifier = self.train(Pipeline(steps) if len(steps) > 1 else vectorizer)
+        return Pipeline(steps + [('classifier', classifier)])
+
+    def train(self, vectorizer):
+        """Last pass: vectorize chunks in parallel and update the classifier with each, in order."""
+        start = time.perf_counter()
+        classes = np.array(sorted(self.classes))
+        classifier = MultinomialNB(alpha=self.args.alpha)
+        trained = 0
+        with self.pool(vectorizer) as pool:
+            for X, labels in in_order(pool, _transform, self.chunks(), self.args.workers * 2):
+                classifier.partial_fit(X, labels, classes=classes)
+                trained += len(labels)
+                self.progress('Trained', trained)
+        self.n_documents = trained
+        self.timings['train'] = time.perf_counter() - start
+        return classifier
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the sentiment model from a large corpus in chunks')
+    parser.add_argument('--input', type=str, required=True, help='Corpus .jsonl, .csv or .parquet (optionally .gz)')
+    parser.add_argument('--output', type=str, default='sentiment-model-v3', help='Output model directory')
+    parser.add_argument('--text-field', type=str, default='text')
+    parser.add_argument('--label-field', type=str, default='label')
+    parser.add_argument('--features', choices=['vocabulary', 'hashed'], default='vocabulary')
+    parser.add_argument('--ngram-range', nargs=2, type=int, default=[1, 2], metavar=('MIN', 'MAX'))
+    parser.add_argument('--counts', action='store_true', help='Raw term counts instead of TF-IDF (as in v1)')
+    parser.add_argument('--no-lowercase', action='store_true')
+    parser.add_argument('--min-df', type=int, default=1, help='Keep n-grams seen in at least this many documents')
+    parser.add_argument('--max-features', type=int, default=None, help='Keep at most this many n-grams')
+    parser.add_argument('--max-candidates', type=int, default=5_000_000,
+                        help='n-grams counted at once in the first pass before the rarest are pruned')
+    parser.add_argument('--n-features', type=int, default=2 ** 20, help='Hashed feature space size')
+    parser.add_argument('--classes', nargs='+', default=None, help='Labels, needed by one-pass hashed training')
+    parser.add_argument('--alpha', type=float, default=1.0, help='MultinomialNB smoothing')
+    parser.add_argument('--chunk-size', type=int, default=20000, help='Documents per chunk')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Vectorizer processes')
+    parser.add_argument('--serving-artifact', action='store_true',
+                        help='Also export a memory-mappable serving artifact (vocabulary features only)')
+    args = parser.parse_args()
+
+    if args.serving_artifact and args.features == 'hashed':
+        raise SystemExit("Serving artifacts need a vocabulary; hashed models are served from model.joblib")
+
+    started = time.perf_counter()
+    trainer = Trainer(args)
+    model = trainer.vocabulary_model() if args.features == 'vocabulary' else trainer.hashed_model()
+
+    os.makedirs(args.output, exist_ok=True)
+    model_path = os.path.join(args.output, 'model.joblib')
+    joblib.dump(model, model_path)
+    print(f"Model saved to '{model_path}'")
+
+    if args.serving_artifact:
+        from artifact import export_serving_artifact
+
+        artifact_path = os.path.join(args.output, 'serving')
+        export_serving_artifact(model, artifact_path)
+        print(f"Serving artifact saved to '{artifact_path}'")
+
+    own, workers = peak_rss_mb()
+    stages = ', '.join(f"{name} {seconds:.1f}s" for name, seconds in trainer.timings.items())
+    print(f"Trained on {trainer.n_documents:,} documents in {time.perf_counter() - started:.1f}s ({stages}); "
+          f"peak RSS {own:.0f}MB, largest worker {workers:.0f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+"""
+Open-loop load generator for the sentiment model.
+
+Unlike load_generator.py, requests are sent on a fixed arrival schedule that
+does not wait for earlier responses, so a slow server cannot slow the client
+down and hide its own queueing (coordinated omission). Latency is measured
+from the time each request was *scheduled* to be sent, and recorded in an
+HDR-style histogram.
+
+Arrival profiles:
+    constant  - evenly spaced requests at --rate
+    poisson   - exponential inter-arrival times with mean rate --rate
+    step      - piecewise-constant rates from --steps, e.g. "50x10,200x10,50x10"
+                (requests/second x seconds)
+    ramp      - rate grows linearly from --rate to --ramp-to over --duration
+
+With --protocol grpc, the same schedule is sent to the KServe v2 gRPC endpoint
+(server/grpc_server.py) as unary ModelInfer calls over --grpc-channels HTTP/2
+connections, or with --grpc-stream, pipelined over one ModelStreamInfer stream
+per channel.
+
+--deadline-ms sends the client's deadline to the server (X-Request-Timeout-Ms)
+so it can drop requests the client has already given up on; gRPC calls carry
+--timeout as their deadline. --priority sets the request's priority class.
+
+Payloads are random mixes of the sample texts by default. With --trace, they
+are streamed from a JSONL workload trace (see workload_trace.py) instead:
+traces with timestamps are replayed at their original pacing, scaled by
+--replay-speed; traces without timestamps (or --replay-speed 0) are paced by
+the arrival profile.
+
+Usage:
+    $ python scripts/async_load_generator.py --hostname localhost --port 8080 \\
+        --profile poisson --rate 200 --duration 60 --output-json results.json
+    $ python scripts/async_load_generator.py --trace traffic.jsonl.gz --replay-speed 2
+    $ python scripts/async_load_generator.py --protocol grpc --grpc-port 8081 --grpc-stream --rate 500
+"""
+
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+
+import aiohttp
+
+from latency_histogram import LatencyHistogram
+from workload_trace import has_timestamps, read_trace, replay_schedule
+
+# Sample texts for prediction
+sample_texts = [
+    "I love this product, it's amazing",
+    "Great service and fast delivery",
+    "This is terrible, doesn't work at all",
+    "Awful experience, never buying again",
+    "Fantastic customer support",
+    "Disappointed with the quality",
+    "Best purchase I've made this year",
+    "Would recommend to everyone",
+    "Complete waste of money",
+    "Exceeded all my expectations"
+]
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def parse_steps(spec):
+    steps = []
+    for part in spec.split(','):
+        rate, _, seconds = part.partition('x')
+        steps.append((float(rate), float(seconds)))
+    return steps
+
+
+def arrival_times(profile, rate, duration, steps=None, ramp_to=None, seed=None):
+    """Yield intended send times, in seconds from the start of the test."""
+    rng = random.Random(seed)
+
+    if profile == 'constant':
+        n = int(rate * duration)
+        for i in range(n):
+            yield i / rate
+
+    elif profile == 'poisson':
+        t = rng.expovariate(rate)
+        while t < duration:
+            yield t
+            t += rng.expovariate(rate)
+
+    elif profile == 'step':
+        offset = 0.0
+        for step_rate, step_seconds in steps:
+            if step_rate > 0:
+                for i in range(int(step_rate * step_seconds)):
+                    yield offset + i / step_rate
+            offset += step_seconds
+
+    elif profile == 'ramp':
+        # The n-th arrival is where the integral of the rate reaches n
+        slope = (ramp_to - rate) / duration
+        n = 0
+        while True:
+            if slope == 0:
+                t = n / rate
+            else:
+                t = (-rate + (rate * rate + 2 * slope * n) ** 0.5) / slope
+            if t >= duration:
+                return
+            yield t
+            n += 1
+
+    else:
+        raise ValueError(f"Unknown profile: {profile}")
+
+
+def make_payload(rng):
+    num_instances = rng.randint(1, 5)
+    return {"instances": [{"text": rng.choice(sample_texts)} for _ in range(num_instances)]}
+
+
+class LoadStats:
+    def __init__(self):
+        self.latency = LatencyHistogram()        # from intended send time
+        self.service_time = LatencyHistogram()   # from actual send time
+        self.timeline = {}                       # second -> counters and histogram
+        self.sent = 0
+        self.ok = 0
+        self.errors = 0
+        self.dropped = 0
+        self.status_codes = {}
+
+    def _second(self, intended):
+        second = int(intended)
+        if second not in self.timeline:
+            self.timeline[second] = {
+                "sent": 0, "ok": 0, "errors": 0, "dropped": 0,
+                "latency": LatencyHistogram(significant_figures=2),
+            }
+        return self.timeline[second]
+
+    def record(self, intended, sent_at, finished_at, ok, status=None):
+        bucket = self._second(intended)
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+        if ok:
+            self.ok += 1
+            bucket["ok"] += 1
+            self.latency.record_seconds(finished_at - intended)
+            self.service_time.record_seconds(finished_at - sent_at)
+            bucket["latency"].record_seconds(finished_at - intended)
+        else:
+            self.errors += 1
+            bucket["errors"] += 1
+
+    def record_sent(self, intended):
+        self.sent += 1
+        self._second(intended)["sent"] += 1
+
+    def record_dropped(self, intended):
+        self.dropped += 1
+        self._second(intended)["dropped"] += 1
+
+    def timeline_rows(self):
+        rows = []
+        for second in sorted(self.timeline):
+            bucket = self.timeline[second]
+            row = {"second": second, "sent": bucket["sent"], "ok": bucket["ok"],
+                   "errors": bucket["errors"], "dropped": bucket["dropped"]}
+            for p in PERCENTILES:
+                row[f"p{p:g}_ms"] = bucket["latency"].percentile(p) / 1000.0
+            row["max_ms"] = bucket["latency"].max_value / 1000.0
+            rows.append(row)
+        return rows
+
+
+async def send_request(session, url, payload, intended, start, stats, timeout, headers=None):
+    sent_at = time.perf_counter() - start
+    stats.record_sent(intended)
+    try:
+        async with session.post(url, json=payload, headers=headers,
+                                timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            await response.read()
+            stats.record(intended, sent_at, time.perf_counter() - start, response.status == 200, response.status)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        stats.record(intended, sent_at, time.perf_counter() - start, False, type(e).__name__)
+
+
+@asynccontextmanager
+async def http_sender(args, stats):
+    connector = aiohttp.TCPConnector(limit=args.connections, keepalive_timeout=60)
+    headers = {}
+    if args.deadline_ms:
+        headers['X-Request-Timeout-Ms'] = str(args.deadline_ms)
+    if args.priority:
+        headers['X-Request-Priority'] = args.priority
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def send(payload, intended, start):
+            await send_request(session, args.url, payload, intended, start, stats, args.timeout, headers)
+        yield send
+
+
+def load_grpc_protos():
+    import grpc
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+    return grpc.protos_and_services('grpc_predict_v2.proto')
+
+
+@asynccontextmanager
+async def grpc_sender(args, stats):
+    import grpc
+    protos, services = load_grpc_protos()
+    ids = itertools.count()
+
+    def infer_request(payload):
+        texts = [instance.get('text', '') for instance in payload.get('instances', [])]
+        request = protos.ModelInferRequest(model_name=args.model_name, id=str(next(ids)))
+        tensor = request.inputs.add(name='text', datatype='BYTES', shape=[len(texts)])
+        tensor.contents.bytes_contents.extend(text.encode('utf-8') for text in texts)
+        return request
+
+    # A local subchannel pool gives every channel its own HTTP/2 connection
+    channels = [grpc.aio.insecure_channel(args.grpc_target, options=[('grpc.use_local_subchannel_pool', 1)])
+                for _ in range(args.grpc_channels)]
+    stubs = itertools.cycle([services.GRPCInferenceServiceStub(channel) for channel in channels])
+    metadata = (('x-request-priority', args.priority),) if args.priority else None
+
+    if not args.grpc_stream:
+        async def send(payload, intended, start):
+            request = infer_request(payload)
+            sent_at = time.perf_counter() - start
+            stats.record_sent(intended)
+            try:
+                await next(stubs).ModelInfer(request, timeout=args.timeout, metadata=metadata)
+                stats.record(intended, sent_at, time.perf_counter() - start, True, 'OK')
+            except grpc.aio.AioRpcError as e:
+                stats.record(intended, sent_at, time.perf_counter() - start, False, e.code().name)
+
+        try:
+            yield send
+        finally:
+            for channel in channels:
+                await channel.close()
+        return
+
+    # Streaming: responses arrive in completion order and are matched by id
+    pending = {}
+
+    async def read_responses(call):
+        async for response in call:
+            future = pending.pop(response.infer_response.id, None)
+            if future is not None and not future.done():
+                future.set_result(response.error_message)
+
+    calls = [next(stubs).ModelStreamInfer(metadata=metadata) for _ in channels]
+    readers = [asyncio.ensure_future(read_responses(call)) for call in calls]
+    streams = itertools.cycle(calls)
+
+    async def send(payload, intended, start):
+        request = infer_request(payload)
+        future = asyncio.get_running_loop().create_future()
+        pending[request.id] = future
+        sent_at = time.perf_counter() - start
+        stats.record_sent(intended)
+        try:
+            await next(streams).write(request)
+            error = await asyncio.wait_for(future, args.timeout)
+            stats.record(intended, sent_at, time.perf_counter() - start, not error, 'ERROR' if error else 'OK')
+        except (grpc.aio.AioRpcError, asyncio.TimeoutError) as e:
+            pending.pop(request.id, None)
+            stats.record(intended, sent_at, time.perf_counter() - start, False, type(e).__name__)
+
+    try:
+        yield send
+    finally:
+        for call in calls:
+            await call.done_writing()
+        await asyncio.gather(*readers, return_exceptions=True)
+        for channel in channels:
+            await channel.close()
+
+
+async def run(args, schedule):
+    stats = LoadStats()
+    outstanding = set()
+    sender = grpc_sender if args.protocol == 'grpc' else http_sender
+
+    async with sender(args, stats) as send:
+        start = time.perf_counter()
+        for intended, payload in schedule:
+            if args.duration is not None and intended >= args.duration:
+                break
+            delay = intended - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if len(outstanding) >= args.max_outstanding:
+                # The client itself is saturated; count it instead of silently waiting
+                stats.record_dropped(intended)
+                continue
+
+            task = asyncio.ensure_future(send(payload, intended, start))
+            outstanding.add(task)
+            task.add_done_callback(outstanding.discard)
+
+        if outstanding:
+            await asyncio.wait(outstanding)
+        elapsed = time.perf_counter() - start
+
+    return stats, elapsed
+
+
+def report(stats, elapsed):
+    print("\nLoad Test Results:")
+    print(f"Requests scheduled: {stats.sent + stats.dropped}")
+    print(f"Successful requests: {stats.ok}")
+    print(f"Failed requests: {stats.errors}")
+    print(f"Dropped by client (too many outstanding): {stats.dropped}")
+    print(f"Total time: {elapsed:.2f} seconds")
+    print(f"Throughput: {stats.ok / elapsed:.2f} requests/second")
+    print("Responses: " + ", ".join(f"{status}: {count}" for status, count in
+                                    sorted(stats.status_codes.items(), key=lambda item: str(item[0]))))
+    print("Latency from intended send time:")
+    summary = stats.latency.summary_ms(PERCENTILES)
+    for p in PERCENTILES:
+        print(f"  p{p:<5g} {summary[f'p{p:g}_ms']:10.2f} ms")
+    print(f"  max    {summary['max_ms']:10.2f} ms")
+    print(f"Service time p50/p99: {stats.service_time.percentile(50) / 1000.0:.2f} / "
+          f"{stats.service_time.percentile(99) / 1000.0:.2f} ms")
+
+
+def save_results(stats, elapsed, args):
+    rows = stats.timeline_rows()
+    if args.output_json:
+        with open(args.output_json, 'w') as f:
+            json.dump({
+                "config": {k: v for k, v in vars(args).items() if not k.startswith('output')},
+                "elapsed_seconds": elapsed,
+                "ok": stats.ok,
+                "errors": stats.errors,
+                "dropped": stats.dropped,
+                "status_codes": {str(k): v for k, v in stats.status_codes.items()},
+                "latency": stats.latency.summary_ms(PERCENTILES),
+                "service_time": stats.service_time.summary_ms(PERCENTILES),
+                "timeline": rows,
+            }, f, indent=2)
+        print(f"Results saved to {args.output_json}")
+    if args.output_csv and rows:
+        with open(args.output_csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Timeline saved to {args.output_csv}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Open-loop load generator for the KServe model')
+    parser.add_argument('--hostname', type=str, default='localhost', help='Service hostname')
+    parser.add_argument('--port', type=int, default=8080, help='Service port')
+    parser.add_argument('--path', type=str, default='/v1/models/sentiment-classifier:predict')
+    parser.add_argument('--protocol', choices=['http', 'grpc'], default='http')
+    parser.add_argument('--grpc-port', type=int, default=8081, help='Service gRPC port')
+    parser.add_argument('--grpc-channels', type=int, default=4, help='HTTP/2 connections in gRPC mode')
+    parser.add_argument('--grpc-stream', action='store_true',
+                        help='Pipeline requests over ModelStreamInfer instead of unary calls')
+    parser.add_argument('--model-name', type=str, default='sentiment-classifier', help='Model name in gRPC mode')
+    parser.add_argument('--profile', choices=['constant', 'poisson', 'step', 'ramp'], default='constant')
+    parser.add_argument('--rate', type=float, default=50.0, help='Requests per second (start rate for ramp)')
+    parser.add_argument('--duration', type=float, default=None,
+                        help='Test duration in seconds (default: 30, or the whole trace when replaying)')
+    parser.add_argument('--steps', type=str, default='50x10,200x10,50x10',
+                        help='Rates for the step profile as RATExSECONDS,...')
+    parser.add_argument('--ramp-to', type=float, default=500.0, help='Final rate for the ramp profile')
+    parser.add_argument('--connections', type=int, default=64, help='Keep-alive connection pool size')
+    parser.add_argument('--max-outstanding', type=int, default=10000,
+                        help='Requests in flight before the client starts dropping')
+    parser.add_argument('--timeout', type=float, default=10.0, help='Request timeout in seconds')
+    parser.add_argument('--deadline-ms', type=float, default=None,
+                        help='Send this deadline in X-Request-Timeout-Ms; gRPC calls carry --timeout as theirs')
+    parser.add_argument('--priority', choices=['high', 'normal', 'best-effort'], default=None,
+                        help='Send this priority class in X-Request-Priority (x-request-priority for gRPC)')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--trace', type=str, help='JSONL workload trace to take payloads from')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='Replay speed for timestamped traces; 0 paces the trace with --profile')
+    parser.add_argument('--output-json', type=str, help='Save summary and per-second timeline as JSON')
+    parser.add_argument('--output-csv', type=str, help='Save the per-second timeline as CSV')
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    args.url = f"http://{args.hostname}:{args.port}{args.path}"
+    args.grpc_target = f"{args.hostname}:{args.grpc_port}"
+
+    if args.protocol == 'grpc':
+        mode = 'ModelStreamInfer' if args.grpc_stream else 'ModelInfer'
+        print(f"Starting open-loop load test against grpc://{args.grpc_target} ({mode})")
+    else:
+        print(f"Starting open-loop load test against {args.url}")
+
+    if args.trace and args.replay_speed > 0 and has_timestamps(args.trace):
+        schedule = replay_schedule(read_trace(args.trace), args.replay_speed)
+        print(f"Replaying {args.trace} at {args.replay_speed}x, connections: {args.connections}")
+    else:
+        steps = parse_steps(args.steps) if args.profile == 'step' else None
+        if steps:
+            args.duration = sum(seconds for _, seconds in steps)
+        elif args.duration is None:
+            args.duration = 30.0
+        times = arrival_times(args.profile, args.rate, args.duration, steps, args.ramp_to, args.seed)
+
+        if args.trace:
+            payloads = (payload for _, payload in read_trace(args.trace))
+        else:
+            rng = random.Random(args.seed)
+            payloads = iter(lambda: make_payload(rng), None)
+        schedule = zip(times, payloads)
+        print(f"Profile: {args.profile}, rate: {args.rate}/s, duration: {args.duration}s, "
+              f"connections: {args.connections}")
+
+    try:
+        stats, elapsed = asyncio.run(run(args, schedule))
+    except KeyboardInterrupt:
+        sys.exit(1)
+
+    report(stats, elapsed)
+    save_results(stats, elapsed, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Offline bulk scoring for large review dumps.
+
+Reads JSONL, CSV or Parquet input as a stream, scores it in large chunks on a
+pool of worker processes, and writes predictions to JSONL or CSV in input
+order. Each worker loads the model once, from the same MODEL_PATH the model
+server uses (a joblib pipeline or a serving artifact directory). At most
+`--workers * 2` chunks are in flight, so memory stays bounded regardless of
+input size.
+
+Progress is checkpointed to `<output>.progress` after every chunk. After a
+crash, rerun the same command with --resume: the output is truncated to the
+last completed chunk and scoring continues from the next input row.
+
+Usage:
+    $ python scripts/bulk_score.py --model sentiment-model-v2/model.joblib \\
+        --input reviews.jsonl --output predictions.jsonl --workers 8
+    $ python scripts/bulk_score.py --model sentiment-model-v2/serving \\
+        --input reviews.parquet --output predictions.csv --text-field body --resume
+"""
+
+import argparse
+import collections
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+from artifact import load_model  # noqa: E402
+from fast_scorer import FastScorer  # noqa: E402
+from feature_extractor import compile_features  # noqa: E402
+from inference import predict_with_confidence  # noqa: E402
+
+
+def input_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    for ext, fmt in (('.jsonl', 'jsonl'), ('.ndjson', 'jsonl'), ('.csv', 'csv'), ('.parquet', 'parquet')):
+        if name.endswith(ext):
+            return fmt
+    raise ValueError(f"Cannot tell the format of {path}; use .jsonl, .csv or .parquet")
+
+
+def _open_text(path):
+    if path.endswith('.gz'):
+        import gzip
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_columns(path, fields):
+    """Lazily yield, for every input row, a list with the value of each of `fields` (None if missing)."""
+    fmt = input_format(path)
+
+    if fmt == 'jsonl':
+        with _open_text(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                yield [record.get(field) for field in fields]
+
+    elif fmt == 'csv':
+        with _open_text(path) as f:
+            for record in csv.DictReader(f):
+                yield [record.get(field) for field in fields]
+
+    else:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Reading Parquet needs pyarrow: pip install pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(columns=list(fields)):
+            columns = [batch.column(field).to_pylist() for field in fields]
+            for values in zip(*columns):
+                yield list(values)
+
+
+def read_rows(path, text_field, id_field=None):
+    """Lazily yield (id, text) for every input row; the id is the row number without `id_field`."""
+    fields = [text_field, id_field] if id_field else [text_field]
+    for row, values in enumerate(read_columns(path, fields)):
+        yield (values[1] if id_field else row), values[0] or ''
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Per-process model, loaded once by the pool initializer
+_model = None
+
+
+def _init_worker(model_path, fast_scorer):
+    global _model
+    _model = load_model(model_path)
+    if fast_scorer:
+        try:
+            _model = FastScorer.from_model(_model)
+            return
+        except ValueError as e:
+            print(f"Fast scorer unavailable, using the pipeline: {e}", file=sys.stderr)
+    try:
+        _model = compile_features(_model)
+    except ValueError:
+        pass  # score with the vectorizer itself
+
+
+def _score_chunk(texts):
+    labels, confidences = predict_with_confidence(_model, texts)
+    return labels.tolist(), confidences.tolist()
+
+
+class PredictionWriter:
+    def __init__(self, path, resume_offset=None):
+        self.format = 'csv' if path.endswith('.csv') else 'jsonl'
+        if resume_offset is not None:
+            self.file = open(path, 'r+', encoding='utf-8', newline='')
+            self.file.seek(resume_offset)
+            self.file.truncate()
+        else:
+            self.file = open(path, 'w', encoding='utf-8', newline='')
+            if self.format == 'csv':
+                self.file.write('id,prediction,confidence\r\n')
+        self.csv = csv.writer(self.file) if self.format == 'csv' else None
+
+    def write(self, ids, labels, confidences):
+        if self.csv:
+            self.csv.writerows(zip(ids, labels, confidences))
+        else:
+            self.file.write(''.join(
+                json.dumps({"id": id_, "prediction": label, "confidence": confidence}) + '\n'
+                for id_, label, confidence in zip(ids, labels, confidences)
+            ))
+        self.file.flush()
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def load_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, rows, offset):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({"rows": rows, "output_offset": offset}, f)
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a large review file offline')
+    parser.add_argument('--model', type=str, default=os.environ.get('MODEL_PATH', 'sentiment-model-v1/model.joblib'),
+                        help='Model file or serving artifact directory (default: $MODEL_PATH)')
+    parser.add_argument('--input', type=str, required=True, help='Input .jsonl, .csv or .parquet (optionally .gz)')
+    parser.add_argument('--output', type=str, required=True, help='Output .jsonl or .csv')
+    parser.add_argument('--text-field', type=str, default='text')
+    parser.add_argument('--id-field', type=str, default=None, help='Copy this field to the output (default: row number)')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per scoring task')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--fast-scorer', action='store_true', help='Score with the NumPy fast path')
+    parser.add_argument('--resume', action='store_true', help='Continue from the last checkpoint')
+    parser.add_argument('--progress-interval', type=float, default=10.0, help='Seconds between progress lines')
+    args = parser.parse_args()
+
+    checkpoint_path = args.output + '.progress'
+    checkpoint = load_checkpoint(checkpoint_path) if args.resume else None
+    start_row = checkpoint["rows"] if checkpoint else 0
+    writer = PredictionWriter(args.output, checkpoint["output_offset"] if checkpoint else None)
+    if checkpoint:
+        print(f"Resuming after row {start_row}")
+
+    rows = itertools.islice(read_rows(args.input, args.text_field, args.id_field), start_row, None)
+    chunks = chunked(rows, args.chunk_size)
+
+    done = start_row
+    started = last_report = time.time()
+    pending = collections.deque()
+
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker,
+                             initargs=(args.model, args.fast_scorer)) as pool:
+        while True:
+            # Keep a bounded window of chunks in flight
+            while len(pending) < args.workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                ids = [id_ for id_, _ in chunk]
+                pending.append((ids, pool.submit(_score_chunk, [text for _, text in chunk])))
+            if not pending:
+                break
+
+            # Write results strictly in input order
+            ids, future = pending.popleft()
+            labels, confidences = future.result()
+            offset = writer.write(ids, labels, confidences)
+            done += len(ids)
+            save_checkpoint(checkpoint_path, done, offset)
+
+            now = time.time()
+            if now - last_report >= args.progress_interval:
+                rate = (done - start_row) / (now - started)
+                print(f"Scored {done} rows ({rate:,.0f} rows/s)", flush=True)
+                last_report = now
+
+    writer.close()
+    elapsed = time.time() - started
+    print(f"Finished: {done} rows in {elapsed:.1f}s ({(done - start_row) / max(elapsed, 1e-9):,.0f} rows/s)")
+    print(f"Predictions written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
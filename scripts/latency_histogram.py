@@ -0,0 +1,89 @@
+"""
+HDR-style latency histogram.
+
+Values are recorded as integers (microseconds) into log-linear buckets: every
+power-of-two range is split into the same number of linear sub-buckets, so
+any recorded value is reproduced within a fixed relative error (0.1% with the
+default 3 significant figures) while the histogram itself stays a few
+thousand counters regardless of how many values are recorded.
+"""
+
+import math
+
+
+class LatencyHistogram:
+    def __init__(self, highest_value=3600 * 1000000, significant_figures=3):
+        self.sub_bucket_count = 2 ** math.ceil(math.log2(2 * 10 ** significant_figures))
+        self.sub_bucket_half_count = self.sub_bucket_count // 2
+        self.sub_bucket_bits = int(math.log2(self.sub_bucket_count))
+        self.highest_value = highest_value
+
+        self.counts = [0] * (self._index(highest_value) + 1)
+        self.total_count = 0
+        self.min_value = None
+        self.max_value = 0
+        self.total = 0
+
+    def _index(self, value):
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        sub_bucket = value >> shift  # in [half_count, sub_bucket_count)
+        return self.sub_bucket_count + (shift - 1) * self.sub_bucket_half_count \
+            + (sub_bucket - self.sub_bucket_half_count)
+
+    def _value(self, index):
+        """Highest value that maps to bucket `index`."""
+        if index < self.sub_bucket_count:
+            return index
+        offset = index - self.sub_bucket_count
+        shift = offset // self.sub_bucket_half_count + 1
+        sub_bucket = offset % self.sub_bucket_half_count + self.sub_bucket_half_count
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value, count=1):
+        value = min(max(int(value), 0), self.highest_value)
+        self.counts[self._index(value)] += count
+        self.total_count += count
+        self.total += value * count
+        self.min_value = value if self.min_value is None else min(self.min_value, value)
+        self.max_value = max(self.max_value, value)
+
+    def record_seconds(self, seconds):
+        self.record(seconds * 1000000)
+
+    def percentile(self, percentile):
+        """Value (in microseconds) at the given percentile, 0-100."""
+        if self.total_count == 0:
+            return 0
+        target = max(1, math.ceil(self.total_count * percentile / 100.0))
+        running = 0
+        for index, count in enumerate(self.counts):
+            running += count
+            if running >= target:
+                return min(self._value(index), self.max_value)
+        return self.max_value
+
+    def mean(self):
+        return self.total / self.total_count if self.total_count else 0
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.total_count += other.total_count
+        self.total += other.total
+        if other.min_value is not None:
+            self.min_value = other.min_value if self.min_value is None else min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+
+    def summary_ms(self, percentiles=(50, 90, 99, 99.9)):
+        result = {
+            "count": self.total_count,
+            "min_ms": (self.min_value or 0) / 1000.0,
+            "mean_ms": self.mean() / 1000.0,
+            "max_ms": self.max_value / 1000.0,
+        }
+        for p in percentiles:
+            result[f"p{p:g}_ms"] = self.percentile(p) / 1000.0
+        return result
@@ -0,0 +1,94 @@
+"""
+Client for the streaming (NDJSON) predict mode of the model server.
+
+Uploads an NDJSON file, one {"text": ...} instance per line, as a chunked
+request, and writes the NDJSON predictions to the output as they come back.
+The upload and the download run concurrently: the server starts answering
+before it has read the whole request, so a client that finishes sending
+before it starts reading can deadlock once both socket buffers are full.
+
+Usage:
+    $ python scripts/stream_predict.py --input reviews.ndjson --output predictions.ndjson
+    $ python scripts/stream_predict.py --generate 1000000 --output /dev/null
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import aiohttp
+
+from async_load_generator import sample_texts
+
+BLOCK_BYTES = 64 * 1024
+
+
+async def file_blocks(path):
+    with (sys.stdin.buffer if path == '-' else open(path, 'rb')) as f:
+        while True:
+            block = f.read(BLOCK_BYTES)
+            if not block:
+                return
+            yield block
+
+
+async def generated_blocks(count, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count):
+        lines.append(json.dumps({"text": rng.choice(sample_texts)}))
+        if len(lines) == 1000 or i == count - 1:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+
+
+async def stream_predict(url, blocks, output, timeout):
+    lines = errors = 0
+    client_timeout = aiohttp.ClientTimeout(total=None, sock_read=timeout)
+    async with aiohttp.ClientSession(timeout=client_timeout) as session:
+        headers = {'Content-Type': 'application/x-ndjson'}
+        async with session.post(url, data=blocks, headers=headers) as response:
+            if response.status != 200:
+                raise SystemExit(f"Server returned {response.status}: {await response.text()}")
+            async for line in response.content:
+                if line.startswith(b'{"error"'):
+                    errors += 1
+                    print(f"Server stopped the stream: {line.decode('utf-8').strip()}", file=sys.stderr)
+                else:
+                    lines += 1
+                output.write(line)
+    return lines, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream NDJSON instances to the model server')
+    parser.add_argument('--url', type=str, default='http://localhost:8080/v1/models/sentiment-classifier:predict')
+    parser.add_argument('--input', type=str, help="NDJSON file of {\"text\": ...} lines, or - for stdin")
+    parser.add_argument('--generate', type=int, help='Send this many generated instances instead of --input')
+    parser.add_argument('--output', type=str, default='-', help='Where to write the predictions (default: stdout)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Seconds to wait for the next response chunk')
+    args = parser.parse_args()
+
+    if (args.input is None) == (args.generate is None):
+        parser.error('give exactly one of --input or --generate')
+    blocks = file_blocks(args.input) if args.input else generated_blocks(args.generate)
+
+    output = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    start = time.perf_counter()
+    try:
+        lines, errors = asyncio.run(stream_predict(args.url, blocks, output, args.timeout))
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"Received {lines} predictions in {elapsed:.2f}s ({lines / elapsed:,.0f}/s)", file=sys.stderr)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
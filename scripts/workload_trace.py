@@ -0,0 +1,62 @@
+"""
+Workload traces for the load generators.
+
+A trace is a JSONL file (optionally gzip-compressed) with one request per line:
+
+    {"timestamp": 1718000000.125, "payload": {"instances": [{"text": "..."}]}}
+
+`timestamp` is optional and in seconds. Only differences between lines
+matter, and a line stamped earlier than its predecessor is sent immediately.
+A line may also be a bare v1 payload ({"instances": [...]}) with no
+timestamp. The model server writes this format when TRACE_RECORD_PATH is set
+(see server/trace_recorder.py).
+
+Traces are read one line at a time, so multi-GB files are never held in memory.
+"""
+
+import gzip
+import json
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def read_trace(path):
+    """Lazily yield (timestamp or None, payload) for each line of the trace."""
+    with _open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON: {e}")
+
+            if 'payload' in record:
+                yield record.get('timestamp'), record['payload']
+            else:
+                yield None, record
+
+
+def replay_schedule(records, speed=1.0):
+    """
+    Yield (intended offset in seconds, payload) following the trace's own
+    pacing, compressed or stretched by `speed` (2.0 replays twice as fast).
+    """
+    first = None
+    for timestamp, payload in records:
+        if timestamp is None:
+            raise ValueError("Trace line has no timestamp; pace it with an arrival profile instead")
+        if first is None:
+            first = timestamp
+        yield (timestamp - first) / speed, payload
+
+
+def has_timestamps(path):
+    for timestamp, _ in read_trace(path):
+        return timestamp is not None
+    return False
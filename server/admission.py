@@ -0,0 +1,285 @@
+"""
+Admission control for prediction requests.
+
+Each worker process lets at most `max_in_flight` requests score at once.
+Requests beyond that wait in a bounded queue, ordered by priority class and
+then by arrival, and are admitted one by one as running requests finish.
+Excess load is turned away quickly instead of piling up until every request
+is slower than its client's timeout:
+
+    429  the queue is full when the request arrives
+    503  the request was queued but could not be admitted in time: it waited
+         longer than `max_queue_wait`, or a higher-priority request pushed it
+         out of a full queue
+    504  the client's deadline passed while the request was queued, or before
+         its micro-batch was scored
+
+429 and 503 responses carry a Retry-After estimated from the queue length and
+recent service times.
+
+Priority classes, from the `X-Request-Priority` header:
+
+    high         admitted ahead of everything else
+    normal       the default
+    best-effort  admitted only when no higher class is waiting, and the first
+                 to be dropped from a full queue
+
+Clients give their deadline as `X-Request-Timeout-Ms`, the time they will
+wait for a response, counted from when the server starts handling the request.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from metrics import counter, function_metric
+from request_trace import current_trace
+
+PRIORITY_HEADER = 'X-Request-Priority'
+TIMEOUT_HEADER = 'X-Request-Timeout-Ms'
+
+PRIORITIES = {'high': 0, 'normal': 1, 'best-effort': 2}
+NORMAL = PRIORITIES['normal']
+
+SHED_REASONS = ('queue_full', 'displaced', 'queue_timeout', 'deadline')
+
+
+class Overloaded(Exception):
+    """The request was not admitted; reported with `status` and a Retry-After header."""
+
+    def __init__(self, status, message, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """The client's deadline passed before the request was scored; reported as a 504."""
+
+
+def parse_priority(value):
+    """Priority class for a header value; unknown or missing values are `normal`."""
+    return PRIORITIES.get((value or '').strip().lower(), NORMAL)
+
+
+def parse_deadline(timeout_ms, now=None):
+    """`time.monotonic()` deadline for a relative timeout header value, or None."""
+    try:
+        timeout = float(timeout_ms) / 1000.0
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(timeout) or timeout <= 0:
+        return None
+    return (time.monotonic() if now is None else now) + timeout
+
+
+def check_deadline(deadline):
+    if deadline is not None and time.monotonic() >= deadline:
+        raise DeadlineExceeded("Request deadline exceeded before it was scored")
+
+
+class _Waiter:
+    __slots__ = ('priority', 'seq', 'deadline', 'enqueued_at', 'state', 'wake')
+
+    def __init__(self, priority, seq, deadline, wake):
+        self.priority = priority
+        self.seq = seq
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.state = 'waiting'   # -> 'admitted', 'displaced' or 'abandoned'
+        self.wake = wake
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """
+    Bounds concurrent and queued requests in one process.
+
+    `acquire()` blocks a handler thread until the request is admitted, and
+    `acquire_async()` does the same for a coroutine; both raise Overloaded or
+    DeadlineExceeded instead. Every successful acquire must be paired with a
+    `release()`, which hands the slot to the next queued request. `slot()` and
+    `slot_async()` do both around a block and count the requests in it that
+    miss their deadline.
+    """
+
+    def __init__(self, max_in_flight, max_queue_depth, max_queue_wait_ms=1000.0, metrics_prefix='model_server'):
+        self.max_in_flight = max_in_flight
+        self.max_queue_depth = max_queue_depth
+        self.max_queue_wait = max_queue_wait_ms / 1000.0
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queued = 0
+        self._queue = []   # heap of _Waiter, abandoned entries are skipped lazily
+        self._seq = itertools.count()
+        # Smoothed time a request holds its slot, for Retry-After
+        self._service_seconds = 0.05
+
+        self.shed_total = {
+            reason: counter(f'{metrics_prefix}_requests_shed_total', 'Prediction requests turned away',
+                            {"reason": reason})
+            for reason in SHED_REASONS
+        }
+        self.admitted_total = counter(f'{metrics_prefix}_requests_admitted_total', 'Prediction requests admitted')
+        function_metric(f'{metrics_prefix}_admission_queue_depth', 'Prediction requests waiting for admission',
+                        lambda: self._queued)
+
+    def retry_after(self):
+        """Whole seconds until a request is likely to be admitted, for the Retry-After header."""
+        backlog = (self._queued + 1) * self._service_seconds / max(1, self.max_in_flight)
+        return max(1, min(60, math.ceil(backlog)))
+
+    def _reject(self, reason, status, message):
+        self.shed_total[reason].inc()
+        return Overloaded(status, message, self.retry_after())
+
+    def _enter(self, priority, deadline, wake):
+        """Admit now (returns None), queue (returns the waiter) or raise."""
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._queued:
+                self._in_flight += 1
+                self.admitted_total.inc()
+                return None
+
+            if self._queued >= self.max_queue_depth:
+                # Make room by dropping the newest waiter of a lower class, if there is one
+                victim = max((w for w in self._queue if w.state == 'waiting'), default=None)
+                if victim is None or victim.priority <= priority:
+                    raise self._reject('queue_full', 429, "Server is at capacity, retry later")
+                victim.state = 'displaced'
+                self._queued -= 1
+                victim.wake()
+
+            waiter = _Waiter(priority, next(self._seq), deadline, wake)
+            heapq.heappush(self._queue, waiter)
+            self._queued += 1
+            return waiter
+
+    def _wait_timeout(self, waiter):
+        timeout = waiter.enqueued_at + self.max_queue_wait - time.monotonic()
+        if waiter.deadline is not None:
+            timeout = min(timeout, waiter.deadline - time.monotonic())
+        return max(0.0, timeout)
+
+    def _leave(self, waiter):
+        """Called when a queued request wakes up or times out; returns if it was admitted, else raises."""
+        with self._lock:
+            if waiter.state == 'admitted':
+                return
+            if waiter.state == 'waiting':
+                waiter.state = 'abandoned'
+                self._queued -= 1
+            state = waiter.state
+
+        if state == 'displaced':
+            raise self._reject('displaced', 503, "Request was displaced by higher-priority traffic, retry later")
+        if waiter.deadline is not None and time.monotonic() >= waiter.deadline:
+            raise DeadlineExceeded("Request deadline exceeded while queued for admission")
+        raise self._reject('queue_timeout', 503, "Server is overloaded, retry later")
+
+    def acquire(self, priority=NORMAL, deadline=None):
+        event = threading.Event()
+        waiter = self._enter(priority, deadline, event.set)
+        if waiter is None:
+            return
+        event.wait(self._wait_timeout(waiter))
+        self._leave(waiter)
+
+    async def acquire_async(self, priority=NORMAL, deadline=None):
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = self._enter(priority, deadline, lambda: loop.call_soon_threadsafe(event.set))
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(event.wait(), self._wait_timeout(waiter))
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            # Cancelled, e.g. the client went away: give up the place in the queue, or the slot just handed over
+            self._cancel(waiter)
+            raise
+        self._leave(waiter)
+
+    def _cancel(self, waiter):
+        with self._lock:
+            state = waiter.state
+            if state == 'waiting':
+                waiter.state = 'abandoned'
+                self._queued -= 1
+        if state == 'admitted':
+            self.release()
+
+    def release(self, held_seconds=None):
+        """Free a slot and admit the next queued request, if any."""
+        with self._lock:
+            if held_seconds is not None:
+                self._service_seconds += 0.1 * (held_seconds - self._service_seconds)
+            while self._queue:
+                waiter = heapq.heappop(self._queue)
+                if waiter.state != 'waiting':
+                    continue
+                waiter.state = 'admitted'
+                self._queued -= 1
+                self.admitted_total.inc()
+                waiter.wake()
+                return
+            self._in_flight -= 1
+
+    @staticmethod
+    def _trace_wait(start, admitted):
+        trace = current_trace()
+        if trace is not None:
+            trace.span('admission', start, admitted)
+
+    @contextmanager
+    def slot(self, priority=NORMAL, deadline=None):
+        try:
+            start = time.perf_counter()
+            self.acquire(priority, deadline)
+            admitted = time.perf_counter()
+            self._trace_wait(start, admitted)
+            try:
+                yield
+            finally:
+                self.release(time.perf_counter() - admitted)
+        except DeadlineExceeded:
+            self.record_expired()
+            raise
+
+    @asynccontextmanager
+    async def slot_async(self, priority=NORMAL, deadline=None):
+        try:
+            start = time.perf_counter()
+            await self.acquire_async(priority, deadline)
+            admitted = time.perf_counter()
+            self._trace_wait(start, admitted)
+            try:
+                yield
+            finally:
+                self.release(time.perf_counter() - admitted)
+        except DeadlineExceeded:
+            self.record_expired()
+            raise
+
+    def record_expired(self):
+        """Count a request dropped because its deadline passed."""
+        self.shed_total['deadline'].inc()
+
+    def stats(self):
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue_depth": self.max_queue_depth,
+            "max_queue_wait_ms": self.max_queue_wait * 1000.0,
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "admitted": self.admitted_total.value,
+            "shed": {reason: metric.value for reason, metric in self.shed_total.items()},
+        }
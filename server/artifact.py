@@ -0,0 +1,443 @@
+"""
+Memory-mappable serving artifact for vectorizer + MultinomialNB pipelines.
+
+A serving artifact is a directory holding:
+
+    manifest.json           vectorizer settings, TF-IDF settings and classes
+    vocabulary.bin          UTF-8 terms concatenated in feature-index order
+    vocabulary_offsets.npy  int64 offsets of each term in vocabulary.bin
+    idf.npy                 IDF weights (TF-IDF pipelines only)
+    feature_log_prob.npy    NB log-probabilities, shape (n_features, n_classes)
+    class_log_prior.npy     NB class log-priors, shape (n_classes,)
+
+The arrays are plain uncompressed .npy files opened with `mmap_mode='r'`, so
+loading does not unpickle the pipeline and replicas on one node share the
+page cache for the model weights. Only the term -> index dict is rebuilt in
+process memory, because the vectorizer needs it for lookups.
+
+Compact artifacts (format version 2) trade a little accuracy for size:
+
+    --min-df N          drop features seen in fewer than N training documents
+    --max-features K    keep the K features whose NB log-probabilities differ
+                        most between classes
+    --dtype float32     store the log-probabilities and IDF as float32
+    --dtype int8        store the log-probabilities as int8 codes with a scale
+                        and offset per class (feature_log_prob_scale.npy,
+                        feature_log_prob_offset.npy), and the IDF as float32
+    --sorted-vocabulary store the terms in sorted order, a term's feature index
+                        being its position, and look them up by binary search
+                        over the memory-mapped file instead of building a dict
+
+Features are pruned before export, so the vectorizer never produces them;
+with TF-IDF the remaining features of a document are normalised without them.
+
+Export an existing model with:
+
+    $ python server/artifact.py sentiment-model-v1/model.joblib sentiment-model-v1/serving
+    $ python server/artifact.py sentiment-model-v2/model.joblib sentiment-model-v2/compact \\
+        --min-df 2 --max-features 200000 --dtype int8 --sorted-vocabulary
+"""
+
+import argparse
+import itertools
+import json
+import mmap
+import os
+import shutil
+from collections.abc import ItemsView, Mapping
+
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.preprocessing import normalize
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+# Adds pruning, float32/int8 parameters and sorted vocabularies
+COMPACT_FORMAT_VERSION = 2
+PARAMETER_DTYPES = ('float64', 'float32', 'int8')
+
+# CountVectorizer settings that affect how text is turned into features
+COUNT_PARAMS = [
+    'input', 'encoding', 'decode_error', 'strip_accents', 'lowercase',
+    'stop_words', 'token_pattern', 'ngram_range', 'analyzer', 'binary',
+]
+TFIDF_PARAMS = ['norm', 'use_idf', 'smooth_idf', 'sublinear_tf']
+
+
+def document_frequency(vectorizer, classifier):
+    """
+    Number of training documents each feature appeared in. A fitted pipeline
+    does not keep it, but it can be recovered from the IDF weights and the
+    number of documents the classifier was trained on, or from the feature
+    counts of a binary vectorizer.
+    """
+    if isinstance(vectorizer, TfidfVectorizer) and vectorizer.use_idf:
+        smooth = int(vectorizer.smooth_idf)
+        n_documents = classifier.class_count_.sum()
+        return np.rint((n_documents + smooth) / np.exp(vectorizer.idf_ - 1) - smooth)
+    if type(vectorizer) is CountVectorizer and vectorizer.binary:
+        return classifier.feature_count_.sum(axis=0)
+    raise ValueError("Pruning by document frequency needs a TF-IDF vectorizer with use_idf or a binary "
+                     "CountVectorizer; other vectorizers do not keep document frequencies")
+
+
+def select_features(vectorizer, classifier, min_df=None, max_features=None):
+    """Indices of the features to keep, in ascending order."""
+    features = np.arange(len(vectorizer.vocabulary_))
+    if min_df:
+        features = features[document_frequency(vectorizer, classifier) >= min_df]
+    if max_features and len(features) > max_features:
+        # A feature with the same log-probability in every class cannot change the prediction
+        log_prob = classifier.feature_log_prob_[:, features]
+        spread = log_prob.max(axis=0) - log_prob.min(axis=0)
+        features = np.sort(features[np.argsort(-spread, kind='stable')[:max_features]])
+    if not len(features):
+        raise ValueError("No features left after pruning")
+    return features
+
+
+def quantize(values):
+    """int8 codes and per-column scale and offset, with values ~= codes * scale + offset."""
+    low, high = values.min(axis=0), values.max(axis=0)
+    scale = np.where(high > low, (high - low) / 255, 1.0)
+    offset = low + 128 * scale
+    codes = np.clip(np.rint((values - offset) / scale), -128, 127).astype(np.int8)
+    return codes, scale, offset
+
+
+def export_serving_artifact(pipeline, directory, min_df=None, max_features=None, dtype='float64',
+                            sorted_vocabulary=False):
+    """
+    Write `pipeline` (vectorizer followed by MultinomialNB) as a serving
+    artifact. With the defaults the parameters are written unchanged; the
+    other arguments write a compact artifact (see the module docstring).
+
+    The artifact is written to a sibling directory and renamed into place,
+    so a server that has an earlier export of `directory` memory-mapped keeps
+    its files until it reloads.
+    """
+    vectorizer, classifier = pipeline[0], pipeline[-1]
+    if not isinstance(vectorizer, CountVectorizer):
+        raise ValueError(f"Unsupported vectorizer: {type(vectorizer).__name__}")
+    if not isinstance(classifier, MultinomialNB):
+        raise ValueError(f"Unsupported classifier: {type(classifier).__name__}")
+    for name in ('preprocessor', 'tokenizer'):
+        if getattr(vectorizer, name) is not None:
+            raise ValueError(f"Custom {name} functions cannot be exported")
+    if callable(vectorizer.analyzer):
+        raise ValueError("Custom analyzer functions cannot be exported")
+    if dtype not in PARAMETER_DTYPES:
+        raise ValueError(f"Unsupported parameter dtype {dtype!r}; choose from {list(PARAMETER_DTYPES)}")
+    compact = bool(min_df or max_features or sorted_vocabulary or dtype != 'float64')
+
+    # Terms in feature-index order
+    terms = [None] * len(vectorizer.vocabulary_)
+    for term, index in vectorizer.vocabulary_.items():
+        terms[index] = term.encode('utf-8')
+
+    # Features to write, in their new index order
+    features = select_features(vectorizer, classifier, min_df, max_features)
+    if sorted_vocabulary:
+        features = np.array(sorted(features.tolist(), key=terms.__getitem__), dtype=np.int64)
+    terms = [terms[i] for i in features.tolist()]
+
+    target = os.path.normpath(directory)
+    directory = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    try:
+        _write_artifact(directory, vectorizer, classifier, terms, features, min_df, max_features, dtype,
+                        sorted_vocabulary, compact)
+        _replace_directory(directory, target)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+
+def _replace_directory(source, target):
+    """Rename `source` to `target`, moving an existing `target` out of the way first."""
+    if not os.path.exists(target):
+        os.rename(source, target)
+        return
+    # A directory cannot be renamed over a non-empty one; files still mapped
+    # from the old one stay readable after it is removed
+    old = f"{target}.old-{os.getpid()}"
+    shutil.rmtree(old, ignore_errors=True)
+    os.rename(target, old)
+    os.rename(source, target)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _write_artifact(directory, vectorizer, classifier, terms, features, min_df, max_features, dtype,
+                    sorted_vocabulary, compact):
+    """Write the artifact files of `terms` and `features` into `directory`, the manifest last."""
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in terms], out=offsets[1:])
+    with open(os.path.join(directory, 'vocabulary.bin'), 'wb') as f:
+        f.write(b''.join(terms))
+    np.save(os.path.join(directory, 'vocabulary_offsets.npy'), offsets)
+
+    feature_log_prob = classifier.feature_log_prob_.T[features].astype(np.float64)
+    if dtype == 'int8':
+        codes, scale, offset = quantize(feature_log_prob)
+        np.save(os.path.join(directory, 'feature_log_prob.npy'), codes)
+        np.save(os.path.join(directory, 'feature_log_prob_scale.npy'), scale)
+        np.save(os.path.join(directory, 'feature_log_prob_offset.npy'), offset)
+    else:
+        np.save(os.path.join(directory, 'feature_log_prob.npy'), feature_log_prob.astype(dtype))
+    np.save(os.path.join(directory, 'class_log_prior.npy'), classifier.class_log_prior_.astype(np.float64))
+
+    count_params = vectorizer.get_params()
+    manifest = {
+        "format_version": COMPACT_FORMAT_VERSION if compact else FORMAT_VERSION,
+        "vectorizer": {name: count_params[name] for name in COUNT_PARAMS},
+        "tfidf": None,
+        "classes": classifier.classes_.tolist(),
+    }
+    stop_words = manifest["vectorizer"]["stop_words"]
+    if stop_words is not None and not isinstance(stop_words, str):
+        manifest["vectorizer"]["stop_words"] = sorted(stop_words)
+    if compact:
+        manifest["vocabulary"] = "sorted" if sorted_vocabulary else "indexed"
+        manifest["parameters"] = dtype
+        manifest["pruning"] = {"min_df": min_df, "max_features": max_features,
+                               "features": len(features), "original_features": len(vectorizer.vocabulary_)}
+
+    if isinstance(vectorizer, TfidfVectorizer):
+        manifest["tfidf"] = {name: count_params[name] for name in TFIDF_PARAMS}
+        if vectorizer.use_idf:
+            idf_dtype = np.float64 if dtype == 'float64' else np.float32
+            np.save(os.path.join(directory, 'idf.npy'), vectorizer.idf_[features].astype(idf_dtype))
+
+    # Written last so a partially exported directory is never loadable
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+class SortedVocabulary(Mapping):
+    """
+    Read-only term -> feature index mapping over the terms of a sorted
+    vocabulary.bin, where a term's index is its position. Looking a term up
+    is a binary search over the memory-mapped file, so no per-term objects
+    are kept in memory. The compiled feature extractor iterates it once at
+    load; the plain vectorizer looks up every token this way, which is slow.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def term(self, index):
+        """UTF-8 bytes of the term with feature index `index`."""
+        return self.blob[int(self.offsets[index]):int(self.offsets[index + 1])]
+
+    def __getitem__(self, term):
+        if not isinstance(term, str):
+            raise KeyError(term)
+        key = term.encode('utf-8')
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self.term(low) == key:
+            return low
+        raise KeyError(term)
+
+    def __iter__(self, chunk_size=65536):
+        # Terms in index order, decoding a chunk of the file at a time
+        for start in range(0, len(self), chunk_size):
+            bounds = self.offsets[start:start + chunk_size + 1].tolist()
+            base = bounds[0]
+            chunk = self.blob[base:bounds[-1]]
+            for begin, end in zip(bounds[:-1], bounds[1:]):
+                yield chunk[begin - base:end - base].decode('utf-8')
+
+    def items(self):
+        return SortedVocabularyItems(self)
+
+    def values(self):
+        return range(len(self))
+
+
+class SortedVocabularyItems(ItemsView):
+    def __iter__(self):
+        # Indices follow from the order, without a lookup per term
+        return zip(self._mapping, itertools.count())
+
+
+class QuantizedMatrix:
+    """
+    A matrix stored as int8 codes with a scale and offset per column.
+    Indexing it with row numbers returns those rows as float64, so scoring
+    converts only the rows of the features a batch contains.
+    """
+
+    def __init__(self, codes, scale, offset):
+        self.codes = codes
+        self.scale = scale
+        self.offset = offset
+        self.shape = codes.shape
+        self.dtype = codes.dtype
+
+    def __getitem__(self, rows):
+        return self.codes[rows] * self.scale + self.offset
+
+
+class ArtifactModel:
+    """
+    Scores texts from a serving artifact with the same maths as the pipeline.
+
+    Exposes the parts of the `Pipeline` API the server uses: `predict_proba`,
+    `classes_` and `named_steps['vectorizer']`, plus `transform` and
+    `predict_proba_features` to run the two stages separately.
+    """
+
+    def __init__(self, vectorizer, feature_log_prob, class_log_prior, classes, tfidf=None, idf=None):
+        self.vectorizer = vectorizer
+        self.named_steps = {'vectorizer': vectorizer}
+        self.feature_log_prob = feature_log_prob
+        self.class_log_prior = class_log_prior
+        self.classes_ = classes
+        self.tfidf = tfidf
+        self.idf = idf
+
+    def transform(self, texts):
+        X = self.vectorizer.transform(texts)
+        if self.tfidf is None:
+            return X
+
+        X = X.astype(np.float64)
+        if self.tfidf['sublinear_tf']:
+            np.log(X.data, X.data)
+            X.data += 1.0
+        if self.idf is not None:
+            X.data *= self.idf[X.indices]
+        if self.tfidf['norm'] is not None:
+            X = normalize(X, norm=self.tfidf['norm'], copy=False)
+        return X
+
+    def joint_log_likelihood(self, X):
+        if self.feature_log_prob.dtype == np.float64:
+            return X @ self.feature_log_prob + self.class_log_prior
+
+        # `X @` would convert the whole float32 or int8 matrix on every call;
+        # gather and convert only the rows of the features in the batch
+        n_samples = X.shape[0]
+        docs = np.repeat(np.arange(n_samples), np.diff(X.indptr))
+        contributions = self.feature_log_prob[X.indices] * X.data[:, None]
+        jll = np.empty((n_samples, len(self.class_log_prior)), dtype=np.float64)
+        for c in range(jll.shape[1]):
+            jll[:, c] = np.bincount(docs, weights=contributions[:, c], minlength=n_samples)
+        return jll + self.class_log_prior
+
+    def predict_log_proba_features(self, X):
+        jll = self.joint_log_likelihood(X)
+        # Normalise with log-sum-exp, as MultinomialNB does
+        top = jll.max(axis=1, keepdims=True)
+        return jll - (top + np.log(np.exp(jll - top).sum(axis=1, keepdims=True)))
+
+    def predict_proba_features(self, X):
+        return np.exp(self.predict_log_proba_features(X))
+
+    def predict_proba(self, texts):
+        return self.predict_proba_features(self.transform(texts))
+
+    def predict(self, texts):
+        return self.classes_[self.predict_log_proba_features(self.transform(texts)).argmax(axis=1)]
+
+
+def load_serving_artifact(directory):
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") not in (FORMAT_VERSION, COMPACT_FORMAT_VERSION):
+        raise ValueError(f"Unsupported serving artifact format: {manifest.get('format_version')}")
+
+    def array(name):
+        return np.load(os.path.join(directory, name), mmap_mode='r')
+
+    offsets = array('vocabulary_offsets.npy')
+    params = dict(manifest["vectorizer"])
+    params['ngram_range'] = tuple(params['ngram_range'])
+
+    if manifest.get("vocabulary") == "sorted":
+        with open(os.path.join(directory, 'vocabulary.bin'), 'rb') as f:
+            blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        vocabulary = SortedVocabulary(blob, offsets)
+        vectorizer = CountVectorizer(vocabulary=vocabulary, **params)
+        # _validate_vocabulary() would copy it into a dict
+        vectorizer.vocabulary_ = vocabulary
+        vectorizer.fixed_vocabulary_ = True
+    else:
+        with open(os.path.join(directory, 'vocabulary.bin'), 'rb') as f:
+            blob = f.read()
+        vocabulary = {
+            blob[start:end].decode('utf-8'): index
+            for index, (start, end) in enumerate(zip(offsets[:-1].tolist(), offsets[1:].tolist()))
+        }
+        vectorizer = CountVectorizer(vocabulary=vocabulary, **params)
+        vectorizer._validate_vocabulary()
+
+    tfidf = manifest["tfidf"]
+    idf = array('idf.npy') if tfidf and tfidf['use_idf'] else None
+
+    if manifest.get("parameters") == "int8":
+        feature_log_prob = QuantizedMatrix(array('feature_log_prob.npy'), array('feature_log_prob_scale.npy'),
+                                           array('feature_log_prob_offset.npy'))
+    else:
+        feature_log_prob = array('feature_log_prob.npy')
+
+    return ArtifactModel(
+        vectorizer,
+        feature_log_prob=feature_log_prob,
+        class_log_prior=array('class_log_prior.npy'),
+        classes=np.asarray(manifest["classes"]),
+        tfidf=tfidf,
+        idf=idf,
+    )
+
+
+def is_serving_artifact(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, MANIFEST))
+
+
+def load_model(path):
+    """Load either a serving artifact directory or a joblib-pickled pipeline."""
+    if is_serving_artifact(path):
+        return load_serving_artifact(path)
+    return joblib.load(path)
+
+
+def model_file(path):
+    """The file whose size and mtime identify the model at `path`."""
+    return os.path.join(path, MANIFEST) if is_serving_artifact(path) else path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export a vectorizer + MultinomialNB pipeline as a serving artifact')
+    parser.add_argument('model', help='model.joblib to export')
+    parser.add_argument('output', help='Artifact directory')
+    parser.add_argument('--min-df', type=int, default=None,
+                        help='Drop features seen in fewer training documents')
+    parser.add_argument('--max-features', type=int, default=None,
+                        help='Keep the features whose log-probabilities differ most between classes')
+    parser.add_argument('--dtype', choices=PARAMETER_DTYPES, default='float64',
+                        help='Storage type of the NB log-probabilities')
+    parser.add_argument('--sorted-vocabulary', action='store_true',
+                        help='Look terms up by binary search over the file instead of a dict')
+    args = parser.parse_args()
+
+    try:
+        export_serving_artifact(joblib.load(args.model), args.output, min_df=args.min_df,
+                                max_features=args.max_features, dtype=args.dtype,
+                                sorted_vocabulary=args.sorted_vocabulary)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Serving artifact written to '{args.output}'")
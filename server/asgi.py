@@ -0,0 +1,352 @@
+"""
+Asyncio (ASGI) variant of the model server.
+
+Serves the same routes as model_server.py, but the event loop only handles
+I/O: every CPU-bound scoring call runs in a thread pool so slow clients and
+keep-alive connections never block inference. Run it with uvicorn workers
+under gunicorn to keep preloading and graceful shutdown:
+
+    $ gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import parse_qs
+
+import model_server
+from admission import PRIORITY_HEADER, TIMEOUT_HEADER, DeadlineExceeded, Overloaded, parse_deadline, parse_priority
+
+EXECUTOR_THREADS = int(os.environ.get('ASGI_EXECUTOR_THREADS', '8'))
+
+V2_ROUTE = re.compile(r'^/v2/models/(?P<name>[^/]+)(?:/versions/(?P<version>[^/]+))?(?P<action>/ready|/infer)?$')
+MODEL_ROUTE = re.compile(r'^/v1/models/(?P<name>[^/:]+)(?:/versions/(?P<version>[^/:]+))?(?P<action>:predict|:reload|/stats)?$')
+
+# Created lazily so that each forked worker gets its own threads
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=EXECUTOR_THREADS, thread_name_prefix='inference')
+    return _executor
+
+
+def _run_inference(fn, *args):
+    """Run `fn` in the inference pool with a copy of the current context, so a request trace follows it."""
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(_get_executor(), contextvars.copy_context().run, fn, *args)
+
+
+def _header(scope, name):
+    name = name.lower().encode('latin-1')
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _content_type(scope):
+    value = _header(scope, 'content-type')
+    return value.split(';')[0].strip().lower() if value is not None else None
+
+
+def _request_admission(scope):
+    return parse_priority(_header(scope, PRIORITY_HEADER)), parse_deadline(_header(scope, TIMEOUT_HEADER))
+
+
+def _admitted(priority, deadline):
+    admission = model_server.admission
+    return admission.slot_async(priority, deadline) if admission else nullcontext()
+
+
+async def _send_overloaded(send, e):
+    await _send(send, e.status, _json_body({"error": str(e)}),
+                headers=[(b'retry-after', str(e.retry_after).encode('ascii'))])
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def _send(send, status, body, content_type=b'application/json', headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type),
+            (b'content-length', str(len(body)).encode('ascii')),
+            *headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _json_body(payload):
+    # The bytes Flask's jsonify produces, so both servers answer alike
+    return (json.dumps(payload, separators=(',', ':'), sort_keys=True) + '\n').encode('utf-8')
+
+
+async def _send_json(send, status, payload):
+    await _send(send, status, _json_body(payload))
+
+
+async def _resolve(name, version=None):
+    # Resolving can load a model from disk, so keep it off the event loop
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), model_server.resolve, name, version)
+
+
+async def _predict(served, scope, receive, send):
+    priority, deadline = _request_admission(scope)
+    try:
+        with model_server.utilization.request(), model_server.traced('v1.predict', served):
+            # Read before taking a slot, so slow uploads do not hold one
+            body = await _read_body(receive)
+            async with _admitted(priority, deadline):
+                body = await _run_inference(model_server.predict_v1, served, body, deadline)
+    except Overloaded as e:
+        await _send_overloaded(send, e)
+        return
+    except DeadlineExceeded as e:
+        await _send_json(send, 504, {"error": str(e)})
+        return
+    except model_server.RequestValidationError as e:
+        model_server.request_errors.inc()
+        await _send_json(send, 400, {"error": str(e)})
+        return
+    except Exception:
+        model_server.request_errors.inc()
+        raise
+
+    await _send(send, 200, body, headers=[(b'x-model-version', served.version.encode('utf-8'))])
+
+
+async def _read_lines(receive):
+    """Yield the lines of the request body as they arrive, holding at most one partial line."""
+    pending = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        more_body = message.get('more_body', False)
+        lines = (pending + message.get('body', b'')).split(b'\n')
+        pending = lines.pop()
+        if len(pending) > model_server.STREAM_MAX_LINE_BYTES:
+            raise model_server.RequestValidationError(
+                f"Line is longer than {model_server.STREAM_MAX_LINE_BYTES} bytes")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+async def _predict_stream(served, scope, receive, send):
+    priority, deadline = _request_admission(scope)
+    admission = model_server.admission
+    if admission:
+        # Held until the whole stream has been sent
+        try:
+            await admission.acquire_async(priority, deadline)
+        except Overloaded as e:
+            await _send_overloaded(send, e)
+            return
+        except DeadlineExceeded as e:
+            admission.record_expired()
+            await _send_json(send, 504, {"error": str(e)})
+            return
+    try:
+        with model_server.utilization.request():
+            await _stream_predictions(served, receive, send, deadline)
+    finally:
+        if admission:
+            admission.release()
+
+
+async def _stream_predictions(served, receive, send, deadline):
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'application/x-ndjson'),
+            (b'x-model-version', served.version.encode('utf-8')),
+        ],
+    })
+
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    chunk, first_line = [], 1
+    try:
+        async for line in _read_lines(receive):
+            chunk.append(line)
+            if len(chunk) >= model_server.STREAM_CHUNK_SIZE:
+                body, ok = await loop.run_in_executor(
+                    executor, model_server.predict_stream_chunk, served, chunk, first_line, deadline)
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+                if not ok:
+                    return
+                first_line += len(chunk)
+                chunk = []
+        if chunk:
+            body, _ = await loop.run_in_executor(
+                executor, model_server.predict_stream_chunk, served, chunk, first_line, deadline)
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    except model_server.RequestValidationError as e:
+        model_server.request_errors.inc()
+        await send({'type': 'http.response.body', 'body': model_server.stream_error_line(str(e)), 'more_body': True})
+    except DeadlineExceeded as e:
+        if model_server.admission:
+            model_server.admission.record_expired()
+        await send({'type': 'http.response.body', 'body': model_server.stream_error_line(str(e)), 'more_body': True})
+    except Exception:
+        model_server.request_errors.inc()
+        raise
+    finally:
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _infer_v2(served, scope, receive, send):
+    header_length = _header(scope, model_server.HEADER_LENGTH)
+    priority, deadline = _request_admission(scope)
+
+    try:
+        with model_server.utilization.request(), model_server.traced('v2.infer', served):
+            body = await _read_body(receive)
+            async with _admitted(priority, deadline):
+                body, header_length = await _run_inference(model_server.infer_v2, served, body, header_length,
+                                                           deadline)
+    except Overloaded as e:
+        await _send_overloaded(send, e)
+        return
+    except DeadlineExceeded as e:
+        await _send_json(send, 504, {"error": str(e)})
+        return
+    except model_server.InferenceRequestError as e:
+        model_server.request_errors.inc()
+        await _send_json(send, 400, {"error": str(e)})
+        return
+    except Exception:
+        model_server.request_errors.inc()
+        raise
+
+    if header_length is None:
+        await _send(send, 200, body)
+    else:
+        await _send(send, 200, body, model_server.BINARY_CONTENT_TYPE.encode('ascii'),
+                    headers=[(b'inference-header-content-length', str(header_length).encode('ascii'))])
+
+
+async def _v2(scope, receive, send, name, version, action):
+    method = scope['method']
+    served = await _resolve(name, version)
+    if served is None:
+        await _send_json(send, 404, model_server.model_not_found(name, version))
+    elif action is None and method == 'GET':
+        versions = sorted(model_server.repository.versions(name)) if version is None else [version]
+        await _send_json(send, 200, model_server.model_metadata(name, versions, served.model.classes_.dtype))
+    elif action == '/ready' and method == 'GET':
+        ready = model_server.is_ready()
+        await _send_json(send, 200 if ready else 400, {"name": name, "ready": ready})
+    elif action == '/infer' and method == 'POST':
+        model_server.requests_in_flight.inc()
+        try:
+            await _infer_v2(served, scope, receive, send)
+        finally:
+            model_server.requests_in_flight.dec()
+            model_server.requests_total.inc()
+    else:
+        await _send_json(send, 404, {"error": "Not found"})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            model_server.start_warm_up()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _executor is not None:
+                _executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+
+    path, method = scope['path'], scope['method']
+    route = MODEL_ROUTE.match(path)
+    name, version, action = route.group('name', 'version', 'action') if route else (None, None, None)
+
+    if path == '/metrics' and method == 'GET':
+        body = model_server.render_prometheus().encode('utf-8')
+        await _send(send, 200, body, b'text/plain; version=0.0.4')
+    elif path.startswith('/v2'):
+        v2_route = V2_ROUTE.match(path)
+        if path == '/v2' and method == 'GET':
+            await _send_json(send, 200, {"name": "sentiment-model-server", "version": "2",
+                                         "extensions": ["binary_tensor_data"]})
+        elif path == '/v2/health/live' and method == 'GET':
+            alive = model_server.is_live()
+            await _send_json(send, 200 if alive else 400, {"live": alive})
+        elif path == '/v2/health/ready' and method == 'GET':
+            ready = model_server.is_ready()
+            await _send_json(send, 200 if ready else 400, {"ready": ready})
+        elif v2_route:
+            await _v2(scope, receive, send, *v2_route.group('name', 'version', 'action'))
+        else:
+            await _send_json(send, 404, {"error": "Not found"})
+    elif path == '/admin/profile' and method == 'GET':
+        args = {key: values[-1] for key, values in parse_qs(scope['query_string'].decode('latin-1')).items()}
+        # Sampled from the default pool, so the inference threads stay free to be profiled
+        loop = asyncio.get_running_loop()
+        body, status = await loop.run_in_executor(None, model_server.profile, args.get('seconds'),
+                                                  args.get('interval_ms'), args.get('idle'))
+        await _send(send, status, body.encode('utf-8'), b'text/plain',
+                    headers=[(b'x-worker-pid', str(os.getpid()).encode('ascii'))])
+    elif path == '/v1/models' and method == 'GET':
+        await _send_json(send, 200, {"models": model_server.repository.model_names()})
+    elif route and action is None and version is None and method == 'GET':
+        if not model_server.repository.versions(name):
+            await _send_json(send, 404, model_server.model_not_found(name))
+        elif not model_server.is_ready():
+            await _send_json(send, 503, {"status": "warming up"})
+        else:
+            await _send_json(send, 200, {"status": "ready"})
+    elif route and action == '/stats' and version is None and method == 'GET':
+        served = await _resolve(name)
+        if served is None:
+            await _send_json(send, 404, model_server.model_not_found(name))
+        else:
+            await _send_json(send, 200, model_server.server_stats(served))
+    elif route and action == ':reload' and method == 'POST':
+        loop = asyncio.get_running_loop()
+        body, status = await loop.run_in_executor(_get_executor(), model_server.reload_models, name, version)
+        await _send_json(send, status, body)
+    elif route and action == ':predict' and method == 'POST':
+        served = await _resolve(name, version)
+        if served is None:
+            await _send_json(send, 404, model_server.model_not_found(name, version))
+            return
+        model_server.requests_in_flight.inc()
+        try:
+            if _content_type(scope) in model_server.NDJSON_MIMETYPES:
+                await _predict_stream(served, scope, receive, send)
+            else:
+                await _predict(served, scope, receive, send)
+        finally:
+            model_server.requests_in_flight.dec()
+            model_server.requests_total.inc()
+    else:
+        await _send_json(send, 404, {"error": "Not found"})
@@ -0,0 +1,207 @@
+import os
+import queue
+import threading
+import time
+
+from admission import DeadlineExceeded, check_deadline
+from metrics import Histogram, histogram
+from request_trace import TraceGroup, current_trace, using_trace
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+QUEUE_WAIT_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25]
+
+
+class _PendingRequest:
+    __slots__ = ('texts', 'deadline', 'trace', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, texts, deadline=None, trace=None):
+        self.texts = texts
+        self.deadline = deadline
+        self.trace = trace
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Collects instances from concurrent requests into one model call.
+
+    A single worker thread takes the first queued request, then keeps pulling
+    requests until either `max_batch_size` instances are gathered or
+    `max_wait_ms` has passed since the batch was opened. Whatever arrives while
+    the model is busy is picked up by the next batch, so batches grow with load
+    and a lone request is only ever delayed by `max_wait_ms`.
+
+    `predict_fn` takes a list of texts and returns a tuple of arrays whose first
+    dimension matches the input; each caller gets back its own rows.
+
+    A request submitted with a `deadline` (a `time.monotonic()` value) that
+    has passed by the time its batch is scored is dropped from the batch and
+    raises DeadlineExceeded, so expired work never reaches the model.
+
+    Requests that are being traced (request_trace.py) get a `batch_wait` span,
+    and the stages recorded while their batch is scored are added to each of
+    their traces.
+
+    The worker thread is started lazily in the process that first submits, so a
+    batcher created before gunicorn forks its workers still works in each child.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=2.0, metrics_prefix=None, metrics_labels=None):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        # Registered for /metrics when a prefix is given
+        if metrics_prefix:
+            self.batch_size_histogram = histogram(
+                f'{metrics_prefix}_batch_size', 'Instances per model call',
+                BATCH_SIZE_BUCKETS, metrics_labels)
+            self.queue_wait_histogram = histogram(
+                f'{metrics_prefix}_batch_queue_wait_seconds', 'Time requests wait in the batching queue',
+                QUEUE_WAIT_BUCKETS, metrics_labels)
+        else:
+            self.batch_size_histogram = Histogram(BATCH_SIZE_BUCKETS)
+            self.queue_wait_histogram = Histogram(QUEUE_WAIT_BUCKETS)
+
+        self._closed = False
+        self._queue = None
+        self._worker = None
+        self._worker_pid = None
+        self._scoring_since = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, args=(self._queue,), name='micro-batcher',
+                                                daemon=True)
+                self._worker.start()
+                self._worker_pid = os.getpid()
+
+    def submit(self, texts, deadline=None):
+        """Queue `texts` for the next batch and block until its rows are ready."""
+        self._ensure_worker()
+        pending = _PendingRequest(texts, deadline, current_trace())
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._queue.put(pending)
+
+        if closed:
+            # The model is being unloaded; finish stragglers without batching
+            check_deadline(deadline)
+            return self.predict_fn(texts)
+        pending.done.wait()
+
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def close(self):
+        """Stop the worker once the requests already queued have been scored."""
+        with self._lock:
+            self._closed = True
+            if self._queue is not None and self._worker_pid == os.getpid():
+                self._queue.put(None)
+
+    def healthy(self, stall_seconds):
+        """False if the worker thread of this process died, or has been scoring one batch for `stall_seconds`."""
+        if self._closed or self._worker_pid != os.getpid():
+            return True
+        scoring_since = self._scoring_since
+        if scoring_since is not None and time.perf_counter() - scoring_since > stall_seconds:
+            return False
+        return self._worker.is_alive()
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_seconds": self.queue_wait_histogram.snapshot(),
+        }
+
+    def _collect(self, pending_queue):
+        first = pending_queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        size = len(first.texts)
+        deadline = time.perf_counter() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    pending = pending_queue.get(timeout=remaining)
+                else:
+                    pending = pending_queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is None:
+                # Closing: score what we have, then stop on the next call
+                pending_queue.put(None)
+                break
+            batch.append(pending)
+            size += len(pending.texts)
+
+        return batch
+
+    def _run(self, pending_queue):
+        while True:
+            batch = self._collect(pending_queue)
+            if batch is None:
+                return
+            started = time.perf_counter()
+
+            now = time.monotonic()
+            expired = [p for p in batch if p.deadline is not None and p.deadline <= now]
+            if expired:
+                for pending in expired:
+                    pending.error = DeadlineExceeded("Request deadline exceeded while queued for batching")
+                    pending.done.set()
+                batch = [p for p in batch if p.deadline is None or p.deadline > now]
+                if not batch:
+                    continue
+
+            texts = []
+            for pending in batch:
+                self.queue_wait_histogram.observe(started - pending.enqueued_at)
+                texts.extend(pending.texts)
+            self.batch_size_histogram.observe(len(texts))
+
+            traces = []
+            for pending in batch:
+                if pending.trace is not None:
+                    pending.trace.span('batch_wait', pending.enqueued_at, started, batch_size=len(texts))
+                    traces.append(pending.trace)
+
+            self._scoring_since = started
+            try:
+                if traces:
+                    with using_trace(TraceGroup(traces)):
+                        outputs = self.predict_fn(texts)
+                else:
+                    outputs = self.predict_fn(texts)
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+                    pending.done.set()
+                continue
+            finally:
+                self._scoring_since = None
+
+            # Hand each caller its slice of the batched result
+            offset = 0
+            for pending in batch:
+                n = len(pending.texts)
+                pending.result = tuple(output[offset:offset + n] for output in outputs)
+                offset += n
+                pending.done.set()
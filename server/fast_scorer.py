@@ -0,0 +1,134 @@
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+
+from artifact import ArtifactModel
+from feature_extractor import FeatureExtractor
+
+
+class FastScorer:
+    """
+    Scores a batch for a vectorizer + MultinomialNB model without going
+    through sklearn's sparse-matrix machinery.
+
+    Texts are tokenized with a FeatureExtractor compiled from the vectorizer
+    (or with its own analyzer when the extractor doesn't support it, or
+    `compiled_features` is off), and the (document, feature, weight) triples are
+    accumulated straight into a dense `(n_samples, n_classes)` array of joint
+    log-likelihoods. Counts, TF-IDF weighting and normalisation follow the
+    same rules as the fitted vectorizer.
+
+    Exposes the same surface as the pipeline for the server: `predict_proba`,
+    `predict`, `classes_` and `named_steps['vectorizer']`, plus `transform`
+    and `predict_proba_features` to run the two stages separately.
+    """
+
+    def __init__(self, vectorizer, feature_log_prob, class_log_prior, classes,
+                 idf=None, norm=None, sublinear_tf=False, compiled_features=True):
+        self.vectorizer = vectorizer
+        self.named_steps = {'vectorizer': vectorizer}
+        self.analyzer = vectorizer.build_analyzer()
+        self.extractor = None
+        if compiled_features:
+            try:
+                self.extractor = FeatureExtractor(vectorizer)
+            except ValueError:
+                pass
+        self.vocabulary = vectorizer.vocabulary_
+        self.binary = vectorizer.binary
+
+        # (n_features, n_classes), so each token gathers one contiguous row;
+        # a QuantizedMatrix from an int8 artifact converts the rows it gathers
+        if isinstance(feature_log_prob, np.ndarray):
+            feature_log_prob = np.ascontiguousarray(feature_log_prob)
+        self.feature_log_prob = feature_log_prob
+        self.class_log_prior = np.asarray(class_log_prior)
+        self.classes_ = classes
+        self.idf = idf
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+
+    @classmethod
+    def from_model(cls, model, compiled_features=True):
+        """Build a scorer from a fitted `Pipeline` or a loaded `ArtifactModel`."""
+        if isinstance(model, ArtifactModel):
+            tfidf = model.tfidf or {}
+            return cls(model.vectorizer, model.feature_log_prob, model.class_log_prior, model.classes_,
+                       idf=model.idf, norm=tfidf.get('norm'), sublinear_tf=tfidf.get('sublinear_tf', False),
+                       compiled_features=compiled_features)
+
+        vectorizer, classifier = model[0], model[-1]
+        if type(vectorizer) not in (CountVectorizer, TfidfVectorizer):
+            raise ValueError(f"Unsupported vectorizer: {type(vectorizer).__name__}")
+        if not isinstance(classifier, MultinomialNB):
+            raise ValueError(f"Unsupported classifier: {type(classifier).__name__}")
+
+        idf, norm, sublinear_tf = None, None, False
+        if isinstance(vectorizer, TfidfVectorizer):
+            idf = vectorizer.idf_ if vectorizer.use_idf else None
+            norm, sublinear_tf = vectorizer.norm, vectorizer.sublinear_tf
+
+        return cls(vectorizer, classifier.feature_log_prob_.T, classifier.class_log_prior_, classifier.classes_,
+                   idf=idf, norm=norm, sublinear_tf=sublinear_tf, compiled_features=compiled_features)
+
+    def transform(self, texts):
+        """
+        Flat (document, feature, weight) arrays for the batch, one entry per
+        distinct feature, plus the number of documents.
+        """
+        if self.extractor is not None:
+            docs, features, counts = self.extractor.count_features(texts)
+        else:
+            docs, features, counts = self._count_features(texts)
+
+        values = counts.astype(np.float64)
+        if self.binary:
+            values[:] = 1.0
+        if self.sublinear_tf:
+            values = np.log(values) + 1.0
+        if self.idf is not None:
+            values *= self.idf[features]
+
+        if self.norm == 'l2':
+            lengths = np.sqrt(np.bincount(docs, weights=values * values, minlength=len(texts)))
+            values /= lengths[docs]
+        elif self.norm == 'l1':
+            lengths = np.bincount(docs, weights=np.abs(values), minlength=len(texts))
+            values /= lengths[docs]
+
+        return docs, features, values, len(texts)
+
+    def _count_features(self, texts):
+        analyzer, get = self.analyzer, self.vocabulary.get
+        docs, features = [], []
+        for doc, text in enumerate(texts):
+            ids = [i for i in map(get, analyzer(text)) if i is not None]
+            features.extend(ids)
+            docs.extend([doc] * len(ids))
+
+        n_features = len(self.vocabulary)
+        keys = np.asarray(docs, dtype=np.int64) * n_features + np.asarray(features, dtype=np.int64)
+        keys, counts = np.unique(keys, return_counts=True)
+        docs, features = np.divmod(keys, n_features)
+        return docs, features, counts
+
+    def joint_log_likelihood(self, X):
+        docs, features, values, n_samples = X
+        contributions = self.feature_log_prob[features] * values[:, None]
+
+        jll = np.empty((n_samples, len(self.class_log_prior)), dtype=np.float64)
+        for c in range(jll.shape[1]):
+            jll[:, c] = np.bincount(docs, weights=contributions[:, c], minlength=n_samples)
+        jll += self.class_log_prior
+        return jll
+
+    def predict_proba_features(self, X):
+        jll = self.joint_log_likelihood(X)
+        top = jll.max(axis=1, keepdims=True)
+        return np.exp(jll - (top + np.log(np.exp(jll - top).sum(axis=1, keepdims=True))))
+
+    def predict_proba(self, texts):
+        return self.predict_proba_features(self.transform(texts))
+
+    def predict(self, texts):
+        return self.classes_[self.joint_log_likelihood(self.transform(texts)).argmax(axis=1)]
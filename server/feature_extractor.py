@@ -0,0 +1,256 @@
+"""
+Serving-time feature extraction for fitted CountVectorizer / TfidfVectorizer
+word models.
+
+`vectorizer.transform` runs the analyzer per document in pure Python. It
+preprocesses, tokenizes, joins every n-gram into a new string, and looks each
+one up in the vocabulary, only to throw most bigrams away. `FeatureExtractor`
+does the per-document work once per token and moves the rest to NumPy:
+
+  * The vocabulary is split at load time into its component tokens. Each
+    token gets a dense id, and each n-gram term gets an integer key built
+    from its token ids: `id_1 * K**(n-1) + ... + id_n`, with K the number of
+    component tokens.
+  * Per document, the compiled token pattern runs on the lowercased text and
+    each token is mapped to its id with a single dict lookup (-1 when the
+    token appears in no vocabulary term).
+  * For the whole batch, n-gram keys are computed with array arithmetic and
+    matched against the sorted term keys with `searchsorted`. An n-gram with
+    any unknown token can't be in the vocabulary, so it is dropped without
+    ever being built as a string.
+  * The CSR matrix is assembled directly from the (document, feature) counts.
+
+The result is identical to `vectorizer.transform`: same values, same sorted
+indices, same dtypes. TF-IDF weighting and normalization follow the fitted
+transformer step for step, using the same normalization kernels.
+
+Vectorizers with custom analyzers, tokenizers or preprocessors, or a non-word
+analyzer, are not supported and raise ValueError, so the caller can keep
+using the vectorizer itself.
+"""
+
+from itertools import chain, repeat
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.pipeline import Pipeline
+
+from sklearn.utils.sparsefuncs_fast import inplace_csr_row_normalize_l1, inplace_csr_row_normalize_l2
+
+from artifact import ArtifactModel
+
+DEFAULT_TOKEN_PATTERN = CountVectorizer().token_pattern
+
+# The kernels sklearn.preprocessing.normalize runs for CSR input
+NORMALIZERS = {'l1': inplace_csr_row_normalize_l1, 'l2': inplace_csr_row_normalize_l2}
+
+
+class FeatureExtractor:
+    """
+    Drop-in replacement for a fitted vectorizer's `transform`.
+
+    Keeps the attributes the server reads from a vectorizer (`vocabulary_`,
+    `lowercase`) so it can stand in for it in a pipeline.
+    """
+
+    def __init__(self, vectorizer):
+        if type(vectorizer) not in (CountVectorizer, TfidfVectorizer):
+            raise ValueError(f"Unsupported vectorizer: {type(vectorizer).__name__}")
+        if vectorizer.analyzer != 'word':
+            raise ValueError(f"Unsupported analyzer: {vectorizer.analyzer!r}")
+        for name in ('preprocessor', 'tokenizer'):
+            if getattr(vectorizer, name) is not None:
+                raise ValueError(f"Custom {name} functions are not supported")
+        if vectorizer.input != 'content':
+            raise ValueError(f"Unsupported input type: {vectorizer.input!r}")
+
+        self.vectorizer = vectorizer
+        self.vocabulary_ = vectorizer.vocabulary_
+        self.lowercase = vectorizer.lowercase
+        self.binary = vectorizer.binary
+        self.dtype = vectorizer.dtype
+        self.n_features = len(vectorizer.vocabulary_)
+        self.min_n, self.max_n = vectorizer.ngram_range
+
+        # TF-IDF steps of the fitted transformer, applied in place without its input validation
+        self.tfidf = isinstance(vectorizer, TfidfVectorizer)
+        if self.tfidf:
+            self.sublinear_tf = vectorizer.sublinear_tf
+            self.idf = vectorizer.idf_ if vectorizer.use_idf else None
+            self.normalize = NORMALIZERS[vectorizer.norm] if vectorizer.norm else None
+
+        if vectorizer.strip_accents is None:
+            self.preprocess = str.lower if vectorizer.lowercase else None
+        else:
+            self.preprocess = vectorizer.build_preprocessor()
+        self.tokenize = vectorizer.build_tokenizer()
+        self.stop_words = vectorizer.get_stop_words()
+
+        # Terms are n-grams joined with single spaces; splitting them back is
+        # only unambiguous when tokens can't contain spaces themselves
+        if vectorizer.token_pattern != DEFAULT_TOKEN_PATTERN and self.max_n > 1:
+            if any(self.tokenize(term) != term.split(' ') for term in self.vocabulary_):
+                raise ValueError("Vocabulary terms cannot be split back into tokens")
+
+        self._build_tables()
+
+    def _build_tables(self):
+        # Two passes over the vocabulary instead of a list of split terms,
+        # which would briefly take more memory than the vocabulary itself
+        token_ids = {}
+        for term in self.vocabulary_:
+            for token in term.split(' '):
+                token_ids.setdefault(token, len(token_ids))
+        self.token_ids = token_ids
+        self._get_token_id = token_ids.get
+
+        n_tokens = max(1, len(token_ids))
+        if n_tokens ** self.max_n >= 2 ** 63:
+            raise ValueError(f"Vocabulary too large for {self.max_n}-gram keys")
+        self._radix = n_tokens
+
+        # Feature id of each token as a unigram term, -1 if it only occurs inside longer n-grams
+        self.unigram_features = np.full(n_tokens, -1, dtype=np.int64)
+        ngram_keys = {n: ([], []) for n in range(max(2, self.min_n), self.max_n + 1)}
+        for term, index in self.vocabulary_.items():
+            tokens = term.split(' ')
+            if len(tokens) == 1:
+                self.unigram_features[token_ids[tokens[0]]] = index
+            elif len(tokens) in ngram_keys:
+                key = 0
+                for token in tokens:
+                    key = key * n_tokens + token_ids[token]
+                keys, features = ngram_keys[len(tokens)]
+                keys.append(key)
+                features.append(index)
+
+        # Sorted keys per n-gram order, for searchsorted lookups
+        self.ngram_tables = {}
+        for n, (keys, features) in ngram_keys.items():
+            keys = np.asarray(keys, dtype=np.int64)
+            order = np.argsort(keys, kind='stable')
+            self.ngram_tables[n] = (keys[order], np.asarray(features, dtype=np.int64)[order])
+
+    def tokens(self, text):
+        """The tokens of one document, before n-grams are formed."""
+        if self.preprocess is not None:
+            text = self.preprocess(text)
+        tokens = self.tokenize(text)
+        if self.stop_words is not None:
+            tokens = [token for token in tokens if token not in self.stop_words]
+        return tokens
+
+    def features(self, texts):
+        """
+        (document, feature) arrays for every vocabulary n-gram in `texts`,
+        one entry per occurrence.
+        """
+        if self.preprocess is str.lower and self.stop_words is None:
+            tokenize = self.tokenize
+            per_doc = [tokenize(text.lower()) for text in texts]
+        else:
+            per_doc = [self.tokens(text) for text in texts]
+        lengths = np.fromiter(map(len, per_doc), dtype=np.int64, count=len(per_doc))
+        # Token ids for the whole batch in one pass, -1 for tokens in no vocabulary term
+        ids = np.fromiter(map(self._get_token_id, chain.from_iterable(per_doc), repeat(-1)),
+                          dtype=np.int64, count=int(lengths.sum()))
+        docs = np.repeat(np.arange(len(per_doc), dtype=np.int64), lengths)
+
+        doc_parts, feature_parts = [], []
+        if self.min_n == 1:
+            known = ids >= 0
+            features = self.unigram_features[ids[known]]
+            found = features >= 0
+            doc_parts.append(docs[known][found])
+            feature_parts.append(features[found])
+
+        for n, (table_keys, table_features) in self.ngram_tables.items():
+            if len(ids) < n or not len(table_keys):
+                continue
+            starts = len(ids) - n + 1
+            # An n-gram must stay inside one document and have only known tokens
+            valid = docs[:starts] == docs[n - 1:]
+            key = np.zeros(starts, dtype=np.int64)
+            for offset in range(n):
+                window = ids[offset:offset + starts]
+                valid &= window >= 0
+                key = key * self._radix + window
+            key, ngram_docs = key[valid], docs[:starts][valid]
+            positions = np.minimum(np.searchsorted(table_keys, key), len(table_keys) - 1)
+            found = table_keys[positions] == key
+            doc_parts.append(ngram_docs[found])
+            feature_parts.append(table_features[positions[found]])
+
+        if not doc_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(doc_parts), np.concatenate(feature_parts)
+
+    def count_features(self, texts):
+        """Distinct (document, feature) pairs in sorted order and their counts."""
+        docs, features = self.features(texts)
+        keys = docs * self.n_features + features
+        keys, counts = np.unique(keys, return_counts=True)
+        docs, features = np.divmod(keys, self.n_features)
+        return docs, features, counts
+
+    def transform(self, texts):
+        """The same matrix as `vectorizer.transform(texts)`."""
+        if isinstance(texts, str):
+            raise ValueError("Iterable over raw text documents expected, string object received.")
+        texts = list(texts)
+        docs, features, counts = self.count_features(texts)
+
+        index_dtype = np.int64 if len(docs) > np.iinfo(np.int32).max else np.int32
+        indptr = np.zeros(len(texts) + 1, dtype=index_dtype)
+        np.cumsum(np.bincount(docs, minlength=len(texts)), out=indptr[1:])
+        X = sp.csr_matrix((counts.astype(self.dtype), features.astype(index_dtype), indptr),
+                          shape=(len(texts), self.n_features))
+        X.has_sorted_indices = True
+        if self.binary:
+            X.data.fill(1)
+        if self.tfidf:
+            if self.sublinear_tf:
+                np.log(X.data, X.data)
+                X.data += 1.0
+            if self.idf is not None:
+                X.data *= self.idf[X.indices]
+            if self.normalize is not None:
+                self.normalize(X)
+        return X
+
+
+def compiled_features_faster(model):
+    """
+    Whether a FeatureExtractor is expected to beat the vectorizer of `model`
+    on small batches: for n-gram and TF-IDF vectorizers and sorted
+    vocabularies. On unigram counts sklearn is as fast up to batches of ~8
+    texts, and the extractor only pays off on large batches.
+    """
+    if isinstance(model, ArtifactModel):
+        vectorizer, tfidf = model.vectorizer, model.tfidf is not None
+    elif isinstance(model, Pipeline):
+        vectorizer = model.steps[0][1]
+        tfidf = isinstance(vectorizer, TfidfVectorizer)
+    else:
+        return False
+    if not isinstance(getattr(vectorizer, 'vocabulary_', None), dict):
+        # A sorted vocabulary would be binary-searched for every token
+        return True
+    return tfidf or getattr(vectorizer, 'ngram_range', (1, 1))[1] > 1
+
+
+def compile_features(model):
+    """
+    `model` with its vectorizer replaced by a FeatureExtractor, for a fitted
+    `Pipeline` or a loaded `ArtifactModel`. Raises ValueError if the
+    vectorizer is not supported.
+    """
+    if isinstance(model, ArtifactModel):
+        extractor = FeatureExtractor(model.vectorizer)
+        return ArtifactModel(extractor, model.feature_log_prob, model.class_log_prior, model.classes_,
+                             tfidf=model.tfidf, idf=model.idf)
+    if isinstance(model, Pipeline):
+        name, vectorizer = model.steps[0]
+        return Pipeline([(name, FeatureExtractor(vectorizer))] + model.steps[1:])
+    raise ValueError(f"Unsupported model: {type(model).__name__}")
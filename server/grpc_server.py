@@ -0,0 +1,253 @@
+"""
+gRPC (KServe v2 GRPCInferenceService) front end for the model server.
+
+Runs inside each gunicorn worker next to the REST app (started from the
+`post_fork` hook in gunicorn.conf.py on GRPC_PORT) and uses the same model
+repository, so gRPC and REST requests share the loaded models, batchers and
+metrics. Workers share the port through SO_REUSEPORT.
+
+Texts come in as a BYTES input named `text`, either in `contents.bytes_contents`
+or as a binary BYTES tensor in `raw_input_contents`. Outputs are returned in
+the same form the inputs came in: typed `contents`, or `raw_output_contents`.
+
+ModelStreamInfer accepts many requests over one stream and scores up to
+GRPC_STREAM_WINDOW of them concurrently, so a single connection can keep the
+batcher busy. Responses carry the request id and are sent as they complete.
+
+Requests go through the same admission control as REST. The priority class
+comes from the `x-request-priority` metadata and the deadline from the call's
+own gRPC deadline. Shed requests fail with RESOURCE_EXHAUSTED (REST's 429),
+UNAVAILABLE (503) or DEADLINE_EXCEEDED (504), with a `retry-after` trailer.
+
+To serve gRPC only, e.g. during development:
+
+    $ python grpc_server.py
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+
+import model_server
+from admission import NORMAL, PRIORITY_HEADER, DeadlineExceeded, Overloaded, parse_priority
+from v2_protocol import (INPUT_NAME, InferenceRequestError, datatype, decode_bytes_tensor, encode_tensor,
+                         model_metadata, output_arrays, requested_outputs)
+
+protos, services = grpc.protos_and_services('grpc_predict_v2.proto')
+
+GRPC_PORT = int(os.environ.get('GRPC_PORT', '8081'))
+GRPC_THREADS = int(os.environ.get('GRPC_THREADS', '16'))
+GRPC_STREAM_WINDOW = int(os.environ.get('GRPC_STREAM_WINDOW', '64'))
+GRPC_MAX_MESSAGE_MB = int(os.environ.get('GRPC_MAX_MESSAGE_MB', '64'))
+
+_CONTENTS_FIELDS = {
+    'BOOL': 'bool_contents',
+    'INT8': 'int_contents',
+    'INT16': 'int_contents',
+    'INT32': 'int_contents',
+    'INT64': 'int64_contents',
+    'UINT8': 'uint_contents',
+    'FP32': 'fp32_contents',
+    'FP64': 'fp64_contents',
+    'BYTES': 'bytes_contents',
+}
+
+
+OVERLOADED_CODES = {429: grpc.StatusCode.RESOURCE_EXHAUSTED, 503: grpc.StatusCode.UNAVAILABLE}
+
+
+class ModelNotFound(Exception):
+    pass
+
+
+def call_admission(context):
+    """Priority class and deadline of a call, from its metadata and gRPC deadline."""
+    metadata = dict(context.invocation_metadata())
+    remaining = context.time_remaining()
+    deadline = time.monotonic() + remaining if remaining is not None else None
+    return parse_priority(metadata.get(PRIORITY_HEADER.lower())), deadline
+
+
+def decode_texts(request):
+    """The texts of a ModelInferRequest."""
+    for index, tensor in enumerate(request.inputs):
+        if tensor.name == INPUT_NAME or len(request.inputs) == 1:
+            break
+    else:
+        raise InferenceRequestError(f"Request has no `{INPUT_NAME}` input")
+    if tensor.datatype != 'BYTES':
+        raise InferenceRequestError(f"Input `{tensor.name}` must have datatype BYTES")
+
+    if request.raw_input_contents:
+        if index >= len(request.raw_input_contents):
+            raise InferenceRequestError(f"raw_input_contents has no entry for input `{tensor.name}`")
+        return decode_bytes_tensor(memoryview(request.raw_input_contents[index]))
+    try:
+        return [value.decode('utf-8') for value in tensor.contents.bytes_contents]
+    except UnicodeDecodeError:
+        raise InferenceRequestError("BYTES tensor element is not valid UTF-8")
+
+
+def encode_response(served, request, labels, confidences):
+    arrays = output_arrays(labels, confidences)
+    response = protos.ModelInferResponse(model_name=served.name, model_version=served.version, id=request.id)
+    raw = bool(request.raw_input_contents)
+
+    for name in requested_outputs([output.name for output in request.outputs]):
+        array = arrays[name]
+        output = response.outputs.add(name=name, shape=[len(array)])
+        if raw:
+            output.datatype, data = encode_tensor(array)
+            response.raw_output_contents.append(data)
+        else:
+            output.datatype = datatype(array.dtype)
+            values = array.tolist()
+            if output.datatype == 'BYTES':
+                values = [str(value).encode('utf-8') for value in values]
+            getattr(output.contents, _CONTENTS_FIELDS[output.datatype]).extend(values)
+    return response
+
+
+class InferenceServicer(services.GRPCInferenceServiceServicer):
+    def __init__(self, stream_executor):
+        self.stream_executor = stream_executor
+
+    def ServerLive(self, request, context):
+        return protos.ServerLiveResponse(live=model_server.is_live())
+
+    def ServerReady(self, request, context):
+        return protos.ServerReadyResponse(ready=model_server.is_ready())
+
+    def ServerMetadata(self, request, context):
+        return protos.ServerMetadataResponse(name='sentiment-model-server', version='2',
+                                             extensions=['model_stream_infer'])
+
+    def ModelReady(self, request, context):
+        found = model_server.resolve(request.name, request.version or None) is not None
+        return protos.ModelReadyResponse(ready=found and model_server.is_ready())
+
+    def ModelMetadata(self, request, context):
+        served = model_server.resolve(request.name, request.version or None)
+        if served is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, model_server.model_not_found(request.name)['error'])
+        if request.version:
+            versions = [request.version]
+        else:
+            versions = sorted(model_server.repository.versions(request.name))
+        return protos.ModelMetadataResponse(**model_metadata(request.name, versions, served.model.classes_.dtype))
+
+    def infer(self, request, priority=NORMAL, deadline=None):
+        """
+        Score one ModelInferRequest; raises ModelNotFound for unknown models,
+        and Overloaded or DeadlineExceeded when it is not admitted in time.
+        """
+        version = request.model_version or None
+        served = model_server.resolve(request.model_name, version)
+        if served is None:
+            raise ModelNotFound(model_server.model_not_found(request.model_name, version)['error'])
+
+        model_server.requests_in_flight.inc()
+        try:
+            with model_server.utilization.request(), model_server.traced('grpc.infer', served), \
+                    model_server.admitted(priority, deadline):
+                start = time.perf_counter()
+                texts = decode_texts(request)
+                served.observe_stage('parse', start)
+                if model_server.trace_recorder:
+                    model_server.trace_recorder.record(texts)
+
+                labels, confidences = model_server.score_texts(served, texts, deadline)
+
+                start = time.perf_counter()
+                response = encode_response(served, request, labels, confidences)
+                served.observe_stage('serialize', start)
+                return response
+        except (Overloaded, DeadlineExceeded):
+            raise
+        except Exception:
+            model_server.request_errors.inc()
+            raise
+        finally:
+            model_server.requests_in_flight.dec()
+            model_server.requests_total.inc()
+
+    def ModelInfer(self, request, context):
+        try:
+            return self.infer(request, *call_admission(context))
+        except Overloaded as e:
+            context.set_trailing_metadata([('retry-after', str(e.retry_after))])
+            context.abort(OVERLOADED_CODES[e.status], str(e))
+        except DeadlineExceeded as e:
+            context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(e))
+        except ModelNotFound as e:
+            context.abort(grpc.StatusCode.NOT_FOUND, str(e))
+        except InferenceRequestError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+    def _stream_response(self, request, priority, deadline):
+        try:
+            return protos.ModelStreamInferResponse(infer_response=self.infer(request, priority, deadline))
+        except Exception as e:
+            return protos.ModelStreamInferResponse(error_message=str(e),
+                                                   infer_response=protos.ModelInferResponse(id=request.id))
+
+    def ModelStreamInfer(self, request_iterator, context):
+        priority, deadline = call_admission(context)
+        completed = queue.Queue()
+        window = threading.BoundedSemaphore(GRPC_STREAM_WINDOW)
+        submitted = [0]
+        done = object()
+
+        def finish(future):
+            window.release()
+            completed.put(future.result())
+
+        def read_requests():
+            # Runs in its own thread so new requests are accepted while earlier ones are scored
+            try:
+                for request in request_iterator:
+                    window.acquire()
+                    submitted[0] += 1
+                    future = self.stream_executor.submit(self._stream_response, request, priority, deadline)
+                    future.add_done_callback(finish)
+            except grpc.RpcError:
+                pass  # the client went away
+            completed.put(done)
+
+        threading.Thread(target=read_requests, name='grpc-stream-reader', daemon=True).start()
+
+        sent, reading = 0, True
+        while reading or sent < submitted[0]:
+            item = completed.get()
+            if item is done:
+                reading = False
+                continue
+            sent += 1
+            yield item
+
+
+def serve(port=GRPC_PORT, threads=GRPC_THREADS):
+    """Start the gRPC server in the background and return it."""
+    max_message = GRPC_MAX_MESSAGE_MB * 1024 * 1024
+    server = grpc.server(
+        ThreadPoolExecutor(max_workers=threads, thread_name_prefix='grpc'),
+        options=[
+            ('grpc.so_reuseport', 1),
+            ('grpc.max_receive_message_length', max_message),
+            ('grpc.max_send_message_length', max_message),
+        ],
+    )
+    stream_executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='grpc-stream')
+    services.add_GRPCInferenceServiceServicer_to_server(InferenceServicer(stream_executor), server)
+    server.add_insecure_port(f'[::]:{port}')
+    server.start()
+    return server
+
+
+if __name__ == '__main__':
+    print(f"Serving gRPC on port {GRPC_PORT}")
+    serve().wait_for_termination()
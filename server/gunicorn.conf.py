@@ -0,0 +1,98 @@
+"""
+Gunicorn settings for the production model server.
+
+    $ gunicorn -c gunicorn.conf.py model_server:app
+
+The model is loaded once in the master (`preload_app`) and shared with the
+workers copy-on-write. Inference is CPU bound, so by default there is one
+worker per CPU in the container limit (`resources.limits.cpu` in
+kubernetes/kserve_autoscaling.yaml) and a few threads per worker so the
+micro-batcher has concurrent requests to group.
+
+Every setting can be overridden through the environment.
+"""
+
+import gc
+import math
+import os
+
+
+def container_cpu_limit():
+    """CPUs available to this container, from the cgroup quota if one is set."""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+
+    try:
+        # cgroup v1
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota > 0:
+            return max(1, math.ceil(quota / period))
+    except (OSError, ValueError):
+        pass
+
+    return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+
+workers = int(os.environ.get('WEB_CONCURRENCY', container_cpu_limit()))
+worker_class = os.environ.get('WORKER_CLASS', 'gthread')
+
+# With admission control on (model_server.py), each worker needs a thread for
+# every running and queued request, plus a few spare ones so excess requests
+# reach the app and are rejected at once instead of waiting for a thread
+max_in_flight = int(os.environ.get('MAX_IN_FLIGHT', '4'))
+max_queue_depth = int(os.environ.get('MAX_QUEUE_DEPTH', '16'))
+default_threads = max_in_flight + max_queue_depth + 4 if max_in_flight > 0 else 4
+threads = int(os.environ.get('WORKER_THREADS', default_threads))
+
+# Load the model before forking so workers share its pages
+preload_app = True
+
+# Keep connections from the Knative queue-proxy open between requests
+keepalive = int(os.environ.get('KEEPALIVE_SECONDS', '75'))
+backlog = int(os.environ.get('BACKLOG', '2048'))
+
+# On SIGTERM stop accepting and let in-flight requests finish
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT_SECONDS', '30'))
+timeout = int(os.environ.get('WORKER_TIMEOUT_SECONDS', '60'))
+
+accesslog = os.environ.get('ACCESS_LOG') or None
+errorlog = '-'
+
+# gRPC (KServe v2) port served by every worker next to HTTP; 0 disables it
+grpc_port = int(os.environ.get('GRPC_PORT', '8081'))
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far (the model included) out of the GC's
+    # reach, otherwise collections in the workers touch those objects and
+    # break copy-on-write sharing
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import model_server
+    # Each worker warms up in the background; readiness probes pass once all of them have
+    model_server.readiness.expected_workers = server.cfg.workers
+    model_server.start_warm_up()
+
+    # gRPC is not fork-safe, so each worker starts its own server after the
+    # fork; the workers share the port through SO_REUSEPORT
+    if grpc_port:
+        import grpc_server
+        worker.grpc_server = grpc_server.serve(grpc_port)
+
+
+def worker_exit(server, worker):
+    if getattr(worker, 'grpc_server', None) is not None:
+        worker.grpc_server.stop(graceful_timeout).wait()
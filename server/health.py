@@ -0,0 +1,249 @@
+"""
+Readiness, liveness and a utilization signal for autoscaling.
+
+Readiness. A server that has just started has loaded its models (in MODEL_DIR
+mode not even that) but scored nothing, so the first requests it is sent pay
+for lazy initialisation. Each worker process therefore warms up in the
+background as soon as it starts: it loads every model version that receives
+traffic and scores `batches` batches of `batch_size` texts with each, through
+the same micro-batcher as live requests. Readiness probes fail until every
+worker has warmed up; the workers share a counter created before gunicorn
+forks them. Prediction requests are still served while warming up, so an
+autoscaler or load balancer that ignores readiness sees the old behaviour.
+
+Liveness. A worker is live while it can answer and none of its models'
+micro-batchers has stopped or spent more than `stall_seconds` on one batch,
+i.e. while restarting it would not help.
+
+Utilization. Each worker counts the prediction requests that arrive and the
+time it is busy, i.e. has at least one request in flight. Its capacity is
+the requests it completes per busy second, and
+
+    utilization = arrival rate / capacity
+
+over the last `window_seconds`. While the worker keeps up this is the
+fraction of time it is busy; when it does not, it grows past 1 with the
+factor of overload (requests turned away by admission control count as
+arrivals), where busy time and concurrency both stop growing. An autoscaler
+can target it (e.g. 0.7) the same way for any model size or machine.
+"""
+
+import gzip
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import function_metric
+
+
+def load_warmup_texts(path, limit):
+    """
+    Up to `limit` texts from a JSONL file (optionally gzip-compressed) of
+    {"text": ...} lines, or of requests as recorded with TRACE_RECORD_PATH.
+    """
+    texts = []
+    with (gzip.open(path, 'rt', encoding='utf-8') if path.endswith('.gz') else open(path, encoding='utf-8')) as f:
+        for line in f:
+            if len(texts) >= limit:
+                break
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 'text' in record:
+                texts.append(record['text'])
+            else:
+                instances = record.get('payload', record).get('instances', [])
+                texts.extend(i['text'] if isinstance(i, dict) else i for i in instances[:limit - len(texts)])
+    if not texts:
+        raise ValueError(f"{path}: no warm-up texts")
+    return texts
+
+
+class Readiness:
+    """
+    Per-process warm-up and the readiness it gates. `start(targets)` warms up
+    in a background thread, once per process; `targets` is a callable
+    returning the ServedModels to warm up.
+    """
+
+    def __init__(self, batches=3, batch_size=64, texts=None, metrics_prefix='model_server'):
+        self.batches = batches
+        self.batch_size = batch_size
+        self.texts = texts or []
+        # Worker processes that will warm up; set by gunicorn's post_fork
+        self.expected_workers = 1
+
+        # Created before the fork, so every worker adds to the same counter
+        self._warmed_workers = multiprocessing.Value('i', 0)
+        self._started_pid = None
+        self._warm_pid = None
+        self._start_lock = threading.Lock()
+        self.warmup_seconds = None
+
+        function_metric(f'{metrics_prefix}_ready', 'Whether the server has warmed up and takes traffic',
+                        lambda: int(self.ready))
+
+    def warmup_batch(self):
+        """`batch_size` warm-up texts, cycling through `texts`."""
+        return [self.texts[i % len(self.texts)] for i in range(self.batch_size)]
+
+    def start(self, targets):
+        if self._started_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            if self.batches <= 0:
+                self._mark_warm(0.0)
+                return
+            threading.Thread(target=self._warm_up, args=(targets,), name='warm-up', daemon=True).start()
+
+    def _warm_up(self, targets):
+        start = time.perf_counter()
+        batch = self.warmup_batch()
+        for served in targets():
+            try:
+                for _ in range(self.batches):
+                    served.score(batch)
+            except Exception as e:
+                # A broken model answers its own requests with errors; it should not keep the others out of service
+                print(f"Warm-up of {served.name}/{served.version} failed: {e!r}")
+        self._mark_warm(time.perf_counter() - start)
+
+    def _mark_warm(self, seconds):
+        self.warmup_seconds = seconds
+        self._warm_pid = os.getpid()
+        with self._warmed_workers.get_lock():
+            self._warmed_workers.value += 1
+
+    @property
+    def warm(self):
+        """Whether this process has warmed up."""
+        return self._warm_pid == os.getpid()
+
+    @property
+    def ready(self):
+        return self.warm and self._warmed_workers.value >= self.expected_workers
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "warm": self.warm,
+            "warmed_workers": self._warmed_workers.value,
+            "expected_workers": self.expected_workers,
+            "warmup_batches": self.batches,
+            "warmup_batch_size": self.batch_size,
+            "warmup_seconds": self.warmup_seconds if self.warm else None,
+        }
+
+
+def live(models, stall_seconds=30.0):
+    """Whether every micro-batcher of `models` (ServedModels) is running and not stuck."""
+    return all(served.batcher is None or served.batcher.healthy(stall_seconds) for served in models)
+
+
+class UtilizationTracker:
+    """
+    Arrival rate relative to measured capacity for one process. Wrap every
+    prediction request in `request()`; a request that raises counts as an
+    arrival but not as completed work.
+    """
+
+    def __init__(self, window_seconds=10.0, metrics_prefix='model_server'):
+        self.window = window_seconds
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._busy_since = None
+        self._arrivals = 0
+        self._completed = 0
+        self._busy_seconds = 0.0
+        # (time, arrivals, completed, busy seconds) at most once a second, covering the window
+        self._samples = deque()
+        self._capacity = None
+
+        function_metric(f'{metrics_prefix}_utilization', 'Prediction request arrival rate relative to capacity',
+                        self.utilization)
+        function_metric(f'{metrics_prefix}_capacity_requests_per_second',
+                        'Prediction requests completed per second busy', lambda: self.capacity() or 0.0)
+        function_metric(f'{metrics_prefix}_busy_seconds_total', 'Time with prediction requests in flight',
+                        self.busy_seconds, kind='counter')
+
+    def _totals(self, now):
+        busy = self._busy_seconds
+        if self._busy_since is not None:
+            busy += now - self._busy_since
+        return now, self._arrivals, self._completed, busy
+
+    def _sample(self, now):
+        """Record the totals once a second and drop samples older than the window. Called under the lock."""
+        if not self._samples or now - self._samples[-1][0] >= 1.0:
+            self._samples.append(self._totals(now))
+        while len(self._samples) > 1 and now - self._samples[1][0] >= self.window:
+            self._samples.popleft()
+
+    @contextmanager
+    def request(self):
+        now = time.monotonic()
+        with self._lock:
+            self._sample(now)
+            self._arrivals += 1
+            if self._in_flight == 0:
+                self._busy_since = now
+            self._in_flight += 1
+        completed = False
+        try:
+            yield
+            completed = True
+        finally:
+            now = time.monotonic()
+            with self._lock:
+                self._in_flight -= 1
+                if completed:
+                    self._completed += 1
+                if self._in_flight == 0:
+                    self._busy_seconds += now - self._busy_since
+                    self._busy_since = None
+
+    def busy_seconds(self):
+        with self._lock:
+            return self._totals(time.monotonic())[3]
+
+    def window_rates(self):
+        """(arrivals per second, completions per busy second or None, busy fraction) over the window."""
+        with self._lock:
+            now = time.monotonic()
+            self._sample(now)
+            then, arrivals, completed, busy = self._samples[0]
+            _, arrivals_now, completed_now, busy_now = self._totals(now)
+            # At least a second, so a window that has just started does not divide by ~0
+            elapsed = max(now - then, 1.0)
+            busy = busy_now - busy
+            if busy >= 0.1 * elapsed:
+                # Enough busy time to measure; otherwise keep the last measurement
+                self._capacity = (completed_now - completed) / busy
+            return (arrivals_now - arrivals) / elapsed, self._capacity, busy / elapsed
+
+    def capacity(self):
+        return self.window_rates()[1]
+
+    def utilization(self):
+        arrival_rate, capacity, busy_fraction = self.window_rates()
+        if not capacity:
+            return busy_fraction
+        return arrival_rate / capacity
+
+    def stats(self):
+        arrival_rate, capacity, busy_fraction = self.window_rates()
+        return {
+            "window_seconds": self.window,
+            "in_flight": self._in_flight,
+            "arrival_rate": arrival_rate,
+            "capacity_requests_per_second": capacity,
+            "busy_fraction": busy_fraction,
+            "utilization": arrival_rate / capacity if capacity else busy_fraction,
+        }
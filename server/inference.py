@@ -0,0 +1,51 @@
+import time
+
+import numpy as np
+from sklearn.pipeline import Pipeline
+
+
+def vectorize(model, texts):
+    if isinstance(model, Pipeline):
+        X = texts
+        for _, step in model.steps[:-1]:
+            X = step.transform(X)
+        return X
+    return model.transform(texts)
+
+
+def classify(model, X):
+    if isinstance(model, Pipeline):
+        return model.steps[-1][1].predict_proba(X)
+    return model.predict_proba_features(X)
+
+
+def predict_with_confidence(model, texts, observe_stages=None):
+    """
+    Score `texts` with a single pass through the pipeline.
+
+    The vectorizer and classifier run once to produce the probability matrix;
+    labels are its row-wise argmax mapped through `classes_` and confidences
+    are the winning probabilities, so there is no separate `model.predict` call.
+
+    If given, `observe_stages(vectorize_seconds, classify_seconds)` is called
+    with the time spent in each stage.
+    """
+    start = time.perf_counter()
+    X = vectorize(model, texts)
+    vectorized = time.perf_counter()
+    probabilities = classify(model, X)
+    if observe_stages is not None:
+        observe_stages(vectorized - start, time.perf_counter() - vectorized)
+
+    best = probabilities.argmax(axis=1)
+    labels = model.classes_[best]
+    confidences = probabilities[np.arange(len(best)), best]
+    return labels, confidences
+
+
+def format_predictions(labels, confidences):
+    # tolist() converts whole arrays to Python ints/floats in C
+    return [
+        {'prediction': label, 'confidence': confidence}
+        for label, confidence in zip(labels.tolist(), confidences.tolist())
+    ]
@@ -0,0 +1,178 @@
+"""
+JSON codecs for the v1 predict protocol.
+
+A codec decodes a request body straight to the list of texts, validating it
+against the request schema on the way:
+
+    {"instances": [{"text": <string>}, ...]}
+
+where both keys are optional (missing texts score as ""). It then encodes the
+labels and confidences arrays as the response body. The response bytes are
+the same as Flask's `jsonify` of {"predictions": [{"confidence": ...,
+"prediction": ...}]} with sorted keys, compact separators and a trailing
+newline, whichever codec is used, for numeric labels and finite confidences.
+
+    msgspec  - decodes into typed structs and encodes structs, no dicts at all
+    orjson   - fast decode and encode of plain dicts
+    json     - the standard library; always available
+
+JSON_CODEC picks one; the default, `auto`, uses the first that is installed.
+
+For streaming (NDJSON) requests, each line is one instance, {"text": ...},
+and each response line is one prediction, or {"error": ...} when the stream
+ends early.
+"""
+
+import json
+from typing import Any, List
+
+from inference import format_predictions
+
+
+class RequestValidationError(ValueError):
+    """The request body does not match the schema; reported to the client as a 400."""
+
+
+def _text(instance, where):
+    if not isinstance(instance, dict):
+        raise RequestValidationError(f"{where} must be an object")
+    text = instance.get('text', '')
+    if not isinstance(text, str):
+        raise RequestValidationError(f"{where}.text must be a string")
+    return text
+
+
+def _texts(data):
+    """Validate a decoded request and return its texts."""
+    if not isinstance(data, dict):
+        raise RequestValidationError("Request body must be a JSON object")
+    instances = data.get('instances', [])
+    if not isinstance(instances, list):
+        raise RequestValidationError("`instances` must be a list")
+    return [_text(instance, f"`instances[{i}]`") for i, instance in enumerate(instances)]
+
+
+class StdlibCodec:
+    name = 'json'
+
+    def decode_predict_request(self, body):
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            raise RequestValidationError(f"Request body is not valid JSON: {e}")
+        return _texts(data)
+
+    def encode_predictions(self, labels, confidences):
+        predictions = format_predictions(labels, confidences)
+        return (json.dumps({"predictions": predictions}, sort_keys=True, separators=(',', ':')) + '\n').encode()
+
+    def decode_instance(self, line):
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            raise RequestValidationError(f"Instance is not valid JSON: {e}")
+        return _text(data, "Instance")
+
+    def encode_prediction_lines(self, labels, confidences):
+        return ''.join(
+            json.dumps(prediction, sort_keys=True, separators=(',', ':')) + '\n'
+            for prediction in format_predictions(labels, confidences)
+        ).encode()
+
+    def encode_error_line(self, message):
+        # Rare, so every codec shares this one
+        return (json.dumps({"error": message}, separators=(',', ':')) + '\n').encode()
+
+
+class OrjsonCodec(StdlibCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        self._options = orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE
+
+    def decode_predict_request(self, body):
+        try:
+            data = self._orjson.loads(body)
+        except self._orjson.JSONDecodeError as e:
+            raise RequestValidationError(f"Request body is not valid JSON: {e}")
+        return _texts(data)
+
+    def encode_predictions(self, labels, confidences):
+        return self._orjson.dumps({"predictions": format_predictions(labels, confidences)}, option=self._options)
+
+    def decode_instance(self, line):
+        try:
+            data = self._orjson.loads(line)
+        except self._orjson.JSONDecodeError as e:
+            raise RequestValidationError(f"Instance is not valid JSON: {e}")
+        return _text(data, "Instance")
+
+    def encode_prediction_lines(self, labels, confidences):
+        dumps, options = self._orjson.dumps, self._options
+        return b''.join([dumps(prediction, option=options) for prediction in format_predictions(labels, confidences)])
+
+
+class MsgspecCodec(StdlibCodec):
+    name = 'msgspec'
+
+    def __init__(self):
+        import msgspec
+
+        class Instance(msgspec.Struct):
+            text: str = ''
+
+        class PredictRequest(msgspec.Struct):
+            instances: List[Instance] = []
+
+        # Fields in sorted order, so the output matches jsonify's sort_keys
+        class Prediction(msgspec.Struct):
+            confidence: float
+            prediction: Any
+
+        class PredictResponse(msgspec.Struct):
+            predictions: list
+
+        self._errors = (msgspec.DecodeError, msgspec.ValidationError)
+        self._decoder = msgspec.json.Decoder(PredictRequest)
+        self._instance_decoder = msgspec.json.Decoder(Instance)
+        self._encoder = msgspec.json.Encoder()
+        self._prediction = Prediction
+        self._response = PredictResponse
+
+    def decode_predict_request(self, body):
+        try:
+            request = self._decoder.decode(body)
+        except self._errors as e:
+            raise RequestValidationError(str(e))
+        return [instance.text for instance in request.instances]
+
+    def encode_predictions(self, labels, confidences):
+        predictions = list(map(self._prediction, confidences.tolist(), labels.tolist()))
+        return self._encoder.encode(self._response(predictions)) + b'\n'
+
+    def decode_instance(self, line):
+        try:
+            return self._instance_decoder.decode(line).text
+        except self._errors as e:
+            raise RequestValidationError(str(e))
+
+    def encode_prediction_lines(self, labels, confidences):
+        return self._encoder.encode_lines(list(map(self._prediction, confidences.tolist(), labels.tolist())))
+
+
+CODECS = {codec.name: codec for codec in (MsgspecCodec, OrjsonCodec, StdlibCodec)}
+
+
+def get_codec(name='auto'):
+    """The codec called `name`, or with 'auto' the fastest one installed."""
+    if name != 'auto':
+        if name not in CODECS:
+            raise ValueError(f"Unknown JSON codec {name!r}; choose from {['auto'] + list(CODECS)}")
+        return CODECS[name]()
+    for codec in CODECS.values():
+        try:
+            return codec()
+        except ImportError:
+            continue
@@ -0,0 +1,198 @@
+"""
+Minimal Prometheus-compatible metrics.
+
+Metrics are plain Python objects updated under a lock: incrementing a counter
+or observing a histogram allocates nothing, so they are cheap enough to leave
+on at full load. Metrics created with a `name` are added to REGISTRY and
+rendered in the Prometheus text format by `render_prometheus()`.
+
+`counter()`, `gauge()` and `histogram()` return the already registered metric
+for a name and label set, so a model that is unloaded and loaded again keeps
+adding to the same series. Function metrics read the state of an object, so
+they are unregistered with it (`unregister_function`).
+
+Each gunicorn worker keeps its own values, so with more than one worker a
+scrape reports the worker that answered it.
+"""
+
+import bisect
+import threading
+
+REGISTRY = []
+_REGISTERED = {}
+_registry_lock = threading.Lock()
+
+
+def _escape_label_value(value):
+    # Backslash, double quote and line feed must be escaped in the text format
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape_label_value(v)}"' for k, v in labels.items()) + '}'
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name=None, help='', labels=None):
+        self.name = name
+        self.help = help
+        self.labels = dict(labels or {})
+        self._lock = threading.Lock()
+        if name:
+            REGISTRY.append(self)
+
+
+class Counter(_Metric):
+    """Monotonic counter; by convention its name ends in `_total`."""
+
+    kind = 'counter'
+
+    def __init__(self, name=None, help='', labels=None):
+        super().__init__(name, help, labels)
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        return [(self.name, self.labels, self.value)]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name=None, help='', labels=None):
+        super().__init__(name, help, labels)
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        return [(self.name, self.labels, self.value)]
+
+
+class FunctionMetric(_Metric):
+    """Counter or gauge whose value is read from `fn` at scrape time."""
+
+    def __init__(self, name=None, help='', fn=None, kind='gauge', labels=None):
+        super().__init__(name, help, labels)
+        self.fn = fn
+        self.kind = kind
+
+    def samples(self):
+        return [(self.name, self.labels, self.fn())]
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram that is cheap to update from request threads."""
+
+    kind = 'histogram'
+
+    def __init__(self, buckets, name=None, help='', labels=None):
+        super().__init__(name, help, labels)
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def _cumulative(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        # Report cumulative counts, the same way Prometheus does
+        cumulative = []
+        running = 0
+        for bound, n in zip(self.buckets + [float('inf')], counts):
+            running += n
+            cumulative.append(('+Inf' if bound == float('inf') else str(bound), running))
+        return cumulative, total, count
+
+    def snapshot(self):
+        cumulative, total, count = self._cumulative()
+        return {"buckets": dict(cumulative), "sum": total, "count": count}
+
+    def samples(self):
+        cumulative, total, count = self._cumulative()
+        samples = [(self.name + '_bucket', dict(self.labels, le=le), n) for le, n in cumulative]
+        samples.append((self.name + '_sum', self.labels, total))
+        samples.append((self.name + '_count', self.labels, count))
+        return samples
+
+
+def _registered(cls, name, labels, *args, **kwargs):
+    key = (name, tuple(sorted((labels or {}).items())))
+    with _registry_lock:
+        if key not in _REGISTERED:
+            _REGISTERED[key] = cls(*args, name=name, labels=labels, **kwargs)
+        return _REGISTERED[key]
+
+
+def counter(name, help, labels=None):
+    return _registered(Counter, name, labels, help=help)
+
+
+def gauge(name, help, labels=None):
+    return _registered(Gauge, name, labels, help=help)
+
+
+def histogram(name, help, buckets, labels=None):
+    return _registered(Histogram, name, labels, buckets, help=help)
+
+
+def function_metric(name, help, fn, kind='gauge', labels=None):
+    metric = _registered(FunctionMetric, name, labels, help=help, fn=fn, kind=kind)
+    metric.fn = fn
+    return metric
+
+
+def unregister_function(metric, fn):
+    """
+    Stop rendering function metric `metric` if it still reads `fn`, dropping
+    its reference to the object `fn` reads. A metric that was registered
+    again since, with a new function, stays.
+    """
+    key = (metric.name, tuple(sorted(metric.labels.items())))
+    with _registry_lock:
+        if metric.fn is not fn or _REGISTERED.get(key) is not metric:
+            return
+        del _REGISTERED[key]
+        REGISTRY.remove(metric)
+
+
+def render_prometheus(registry=None):
+    """Render every registered metric in the Prometheus text exposition format."""
+    # Metrics sharing a name (e.g. one histogram per stage) form one family
+    families = {}
+    for metric in registry if registry is not None else REGISTRY:
+        families.setdefault(metric.name, []).append(metric)
+
+    lines = []
+    for name, metrics in families.items():
+        lines.append(f'# HELP {name} {metrics[0].help}')
+        lines.append(f'# TYPE {name} {metrics[0].kind}')
+        for metric in metrics:
+            for sample, labels, value in metric.samples():
+                lines.append(f'{sample}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
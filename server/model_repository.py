@@ -0,0 +1,448 @@
+"""
+Serves many models and versions from one process.
+
+Models live in a model directory laid out as:
+
+    <MODEL_DIR>/<name>/<version>/model.joblib   (or a serving artifact directory)
+    <MODEL_DIR>/<name>/traffic.json             optional weights, e.g. {"1": 90, "2": 10}
+
+Models are loaded on first use and kept in LRU order. When the estimated size
+of the loaded models exceeds the memory budget, the least recently used ones
+are unloaded. Requests keep a reference to the ServedModel they resolved, so
+an unloaded model still finishes the requests already using it.
+
+Requests that do not name a version are split across versions by the weights
+in traffic.json, or go to the highest version when there is none, so a canary
+can run in the same pod as the stable version.
+
+When a loaded model's file changes on disk, or `reload()` is called, the new
+file is loaded and warmed up in the background and then swapped in under the
+repository lock. Requests that already resolved the old ServedModel finish on
+it, so a reload never fails or stalls a request. A model that fails to load is
+logged and the old one keeps serving.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from admission import check_deadline
+from artifact import is_serving_artifact, load_model, model_file
+from batcher import MicroBatcher
+from fast_scorer import FastScorer
+from feature_extractor import compile_features, compiled_features_faster
+from inference import predict_with_confidence
+from metrics import counter, function_metric, histogram, unregister_function
+from prediction_cache import PredictionCache
+from request_trace import current_trace
+
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+STAGES = ('parse', 'vectorize', 'classify', 'serialize')
+
+# Scored before a reloaded model takes traffic, so its first requests are not slow
+WARMUP_TEXTS = [
+    "I love this product, it's amazing",
+    "This is terrible, doesn't work at all",
+    "Would recommend to everyone",
+    "Complete waste of money",
+]
+
+
+class ServingOptions:
+    """Per-model serving settings shared by every model in the repository."""
+
+    def __init__(self, fast_scorer=False, compiled_features='auto', batching=True, max_batch_size=64,
+                 max_batch_wait_ms=2.0, cache=False, cache_max_entries=100000, cache_max_bytes=None,
+                 cache_ttl_seconds=None):
+        self.fast_scorer = fast_scorer
+        self.compiled_features = compiled_features
+        self.batching = batching
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait_ms = max_batch_wait_ms
+        self.cache = cache
+        self.cache_max_entries = cache_max_entries
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_ttl_seconds = cache_ttl_seconds
+
+
+def path_size(path):
+    """Bytes on disk for a model file or artifact directory, used as its memory estimate."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+class ServedModel:
+    """A loaded model version with its own batcher, cache and metrics."""
+
+    def __init__(self, name, version, path, options):
+        self.name = name
+        self.version = version
+        self.path = path
+        self.size_bytes = path_size(path)
+        self.loaded_at = time.time()
+
+        # Taken before loading, so a file replaced while we load is noticed on the next check
+        stat = os.stat(model_file(path))
+        self.file_stat = (stat.st_size, stat.st_mtime_ns)
+
+        model = load_model(path)
+        compiled_features = options.compiled_features
+        if compiled_features == 'auto':
+            compiled_features = compiled_features_faster(model)
+        if options.fast_scorer:
+            try:
+                model = FastScorer.from_model(model, compiled_features=compiled_features)
+            except ValueError as e:
+                print(f"Fast scorer unavailable for {name}/{version}, using the pipeline: {e}")
+        if compiled_features and not isinstance(model, FastScorer):
+            try:
+                model = compile_features(model)
+            except ValueError as e:
+                print(f"Compiled features unavailable for {name}/{version}, using the vectorizer: {e}")
+        self.model = model
+
+        # Changes whenever the file on disk does, so cached predictions never outlive the model
+        self.version_key = f"{name}:{version}:{stat.st_size}-{int(stat.st_mtime)}"
+
+        self.labels = {"model": name, "model_version": version}
+        self.instances_total = counter('model_server_instances_total', 'Instances scored', self.labels)
+        self.stage_seconds = {
+            stage: histogram('model_server_stage_seconds', 'Time spent in each request stage',
+                             LATENCY_BUCKETS, dict(self.labels, stage=stage))
+            for stage in STAGES
+        }
+
+        self.batcher = MicroBatcher(
+            self.run_model, options.max_batch_size, options.max_batch_wait_ms,
+            metrics_prefix='model_server', metrics_labels=self.labels,
+        ) if options.batching else None
+
+        self.cache = PredictionCache(
+            self.version_key,
+            max_entries=options.cache_max_entries,
+            max_bytes=options.cache_max_bytes,
+            ttl_seconds=options.cache_ttl_seconds,
+            lowercase=getattr(model.named_steps['vectorizer'], 'lowercase', True),
+        ) if options.cache else None
+
+        # (metric, fn) pairs, unregistered on close so an unloaded model's cache can be freed
+        self._function_metrics = []
+        if self.cache:
+            for stat in ('hits', 'misses', 'evictions'):
+                fn = lambda cache=self.cache, stat=stat: getattr(cache, stat)  # noqa: E731
+                metric = function_metric(f'model_server_cache_{stat}_total', f'Prediction cache {stat}', fn,
+                                         kind='counter', labels=self.labels)
+                self._function_metrics.append((metric, fn))
+
+    def observe_stage(self, stage, start):
+        """Record the time spent in `stage` since `start` (a `time.perf_counter()` value)."""
+        end = time.perf_counter()
+        self.stage_seconds[stage].observe(end - start)
+        trace = current_trace()
+        if trace is not None:
+            trace.span(stage, start, end)
+
+    def _observe_model_stages(self, vectorize_seconds, classify_seconds):
+        self.stage_seconds['vectorize'].observe(vectorize_seconds)
+        self.stage_seconds['classify'].observe(classify_seconds)
+        trace = current_trace()
+        if trace is not None:
+            end = time.perf_counter()
+            trace.span('vectorize', end - classify_seconds - vectorize_seconds, end - classify_seconds)
+            trace.span('classify', end - classify_seconds, end)
+
+    def run_model(self, texts):
+        return predict_with_confidence(self.model, texts, self._observe_model_stages)
+
+    def score(self, texts, deadline=None):
+        if self.batcher:
+            return self.batcher.submit(texts, deadline)
+        check_deadline(deadline)
+        return self.run_model(texts)
+
+    def score_with_cache(self, texts, deadline=None):
+        """Serve cached rows directly and send only the distinct misses to the model."""
+        cache = self.cache
+        keys = [cache.key(text) for text in texts]
+        cached = cache.get_many(keys)
+
+        miss_index = {}
+        for key, text, hit in zip(keys, texts, cached):
+            if hit is None and key not in miss_index:
+                miss_index[key] = (len(miss_index), text)
+
+        if miss_index:
+            miss_keys = list(miss_index)
+            miss_labels, miss_confidences = self.score([text for _, text in miss_index.values()], deadline)
+            miss_labels, miss_confidences = miss_labels.tolist(), miss_confidences.tolist()
+            cache.put_many(miss_keys, miss_labels, miss_confidences)
+
+        labels = np.empty(len(texts), dtype=self.model.classes_.dtype)
+        confidences = np.empty(len(texts), dtype=np.float64)
+        for i, (key, hit) in enumerate(zip(keys, cached)):
+            if hit is None:
+                j = miss_index[key][0]
+                labels[i], confidences[i] = miss_labels[j], miss_confidences[j]
+            else:
+                labels[i], confidences[i] = hit
+        return labels, confidences
+
+    def predict(self, texts, deadline=None):
+        """
+        Labels and confidences for `texts`, through the cache and batcher when
+        enabled. Raises DeadlineExceeded if `deadline` passes before scoring.
+        """
+        self.instances_total.inc(len(texts))
+        if self.cache:
+            return self.score_with_cache(texts, deadline)
+        return self.score(texts, deadline)
+
+    def warm_up(self, rounds=3):
+        """Score a few batches directly, so pages and lazy state are loaded before traffic arrives."""
+        for _ in range(rounds):
+            predict_with_confidence(self.model, WARMUP_TEXTS)
+
+    def file_changed(self):
+        try:
+            stat = os.stat(model_file(self.path))
+        except OSError:
+            # Mid-replace or removed; keep serving what we have
+            return False
+        return (stat.st_size, stat.st_mtime_ns) != self.file_stat
+
+    def close(self):
+        if self.batcher:
+            self.batcher.close()
+        for metric, fn in self._function_metrics:
+            unregister_function(metric, fn)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "size_bytes": self.size_bytes,
+            "loaded_at": self.loaded_at,
+            "batching": self.batcher.stats() if self.batcher else None,
+            "cache": self.cache.stats() if self.cache else None,
+        }
+
+
+def _version_sort_key(version):
+    return (0, int(version), '') if version.isdigit() else (1, 0, version)
+
+
+class ModelRepository:
+    def __init__(self, options, model_dir=None, memory_budget_bytes=None, rescan_seconds=10.0,
+                 watch_seconds=None):
+        self.options = options
+        self.model_dir = model_dir
+        self.memory_budget_bytes = memory_budget_bytes
+        self.rescan_seconds = rescan_seconds
+        self.watch_seconds = watch_seconds
+
+        self._registered = {}             # name -> {version: path}, added with add_model
+        self._scanned = {}                # name -> (scanned_at, {version: path}, weights)
+        self._loaded = OrderedDict()      # (name, version) -> ServedModel, in LRU order
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self._watcher_pid = None
+        self.evictions = 0
+        self.reloads = counter('model_server_model_reloads_total', 'Models reloaded after a change')
+        self.reload_errors = counter('model_server_model_reload_errors_total', 'Model reloads that failed')
+
+    def add_model(self, name, version, path):
+        """Serve the model at `path` as `name`/`version` in addition to MODEL_DIR."""
+        self._registered.setdefault(name, {})[version] = path
+
+    def _scan(self, name):
+        """Versions and traffic weights for `name`, re-reading MODEL_DIR at most every rescan_seconds."""
+        now = time.monotonic()
+        entry = self._scanned.get(name)
+        if entry is not None and now - entry[0] < self.rescan_seconds:
+            return entry[1], entry[2]
+
+        model_root = self._model_root(name)
+        if model_root is None:
+            # Not cached, so requests for unknown names cannot grow the scan cache
+            self._scanned.pop(name, None)
+            return {}, None
+
+        versions, weights = {}, None
+        for version in os.listdir(model_root):
+            version_dir = os.path.join(model_root, version)
+            if is_serving_artifact(version_dir):
+                versions[version] = version_dir
+            elif os.path.exists(os.path.join(version_dir, 'model.joblib')):
+                versions[version] = os.path.join(version_dir, 'model.joblib')
+
+        traffic_path = os.path.join(model_root, 'traffic.json')
+        if os.path.exists(traffic_path):
+            with open(traffic_path) as f:
+                weights = {str(v): float(w) for v, w in json.load(f).items()}
+
+        self._scanned[name] = (now, versions, weights)
+        return versions, weights
+
+    def _model_root(self, name):
+        """MODEL_DIR/<name>, or None unless `name` is a plain directory entry of MODEL_DIR."""
+        if not self.model_dir or name in ('', '.', '..') or os.path.basename(name) != name:
+            return None
+        if os.path.altsep and os.path.altsep in name:
+            return None
+        model_root = os.path.join(self.model_dir, name)
+        return model_root if os.path.isdir(model_root) else None
+
+    def versions(self, name):
+        versions, _ = self._scan(name)
+        return {**versions, **self._registered.get(name, {})}
+
+    def model_names(self):
+        names = set(self._registered)
+        if self.model_dir and os.path.isdir(self.model_dir):
+            names.update(d for d in os.listdir(self.model_dir) if os.path.isdir(os.path.join(self.model_dir, d)))
+        return sorted(names)
+
+    def traffic(self, name):
+        """List of (version, weight) that unversioned requests for `name` are split across."""
+        versions = self.versions(name)
+        _, weights = self._scan(name)
+        if weights:
+            split = [(v, w) for v, w in weights.items() if v in versions and w > 0]
+            if split:
+                return split
+        if not versions:
+            return []
+        return [(max(versions, key=_version_sort_key), 1.0)]
+
+    def choose_version(self, name):
+        split = self.traffic(name)
+        if not split:
+            raise KeyError(name)
+        if len(split) == 1:
+            return split[0][0]
+        versions, weights = zip(*split)
+        return random.choices(versions, weights)[0]
+
+    def get(self, name, version=None):
+        """The loaded ServedModel for `name` (and `version`), loading it if needed."""
+        if self.watch_seconds:
+            self._ensure_watcher()
+        if version is None:
+            version = self.choose_version(name)
+        key = (name, version)
+
+        with self._lock:
+            served = self._loaded.get(key)
+            if served is not None:
+                self._loaded.move_to_end(key)
+                return served
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the repository lock so other models keep serving
+        with load_lock:
+            with self._lock:
+                served = self._loaded.get(key)
+            if served is None:
+                path = self.versions(name).get(version)
+                if path is None:
+                    raise KeyError(f"{name}/{version}")
+                served = ServedModel(name, version, path, self.options)
+                with self._lock:
+                    self._loaded[key] = served
+                    self._evict(keep=key)
+        return served
+
+    def reload(self, name, version):
+        """
+        Load `name`/`version` again from disk, warm it up and swap it in.
+
+        Returns the new ServedModel, or raises if loading fails, in which case
+        the old model keeps serving.
+        """
+        key = (name, version)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            path = self.versions(name).get(version)
+            if path is None:
+                raise KeyError(f"{name}/{version}")
+            try:
+                served = ServedModel(name, version, path, self.options)
+                served.warm_up()
+            except Exception:
+                self.reload_errors.inc()
+                raise
+
+            with self._lock:
+                old = self._loaded.get(key)
+                self._loaded[key] = served
+                self._evict(keep=key)
+
+        # Requests holding the old model finish on it; its batcher drains and stops
+        if old is not None:
+            old.close()
+        self.reloads.inc()
+        return served
+
+    def reload_changed(self):
+        """Reload every loaded model whose file changed on disk. Returns the reloaded models."""
+        reloaded = []
+        for served in self.loaded():
+            if not served.file_changed():
+                continue
+            try:
+                reloaded.append(self.reload(served.name, served.version))
+            except Exception as e:
+                print(f"Reloading {served.name}/{served.version} failed, keeping the loaded model: {e!r}")
+        return reloaded
+
+    def _ensure_watcher(self):
+        # One watcher per process, started lazily so that each forked worker gets its own
+        if self._watcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watcher_pid != os.getpid():
+                watcher = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+                watcher.start()
+                self._watcher_pid = os.getpid()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.watch_seconds)
+            for served in self.reload_changed():
+                print(f"Reloaded {served.name}/{served.version} from {served.path}")
+
+    def _evict(self, keep):
+        if not self.memory_budget_bytes:
+            return
+        total = sum(served.size_bytes for served in self._loaded.values())
+        for key in list(self._loaded):
+            if total <= self.memory_budget_bytes:
+                break
+            if key == keep:
+                continue
+            served = self._loaded.pop(key)
+            served.close()
+            total -= served.size_bytes
+            self.evictions += 1
+
+    def loaded(self):
+        with self._lock:
+            return list(self._loaded.values())
+
+    def stats(self):
+        loaded = self.loaded()
+        return {
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "loaded_bytes": sum(served.size_bytes for served in loaded),
+            "evictions": self.evictions,
+            "reloads": self.reloads.value,
+            "loaded": [f"{served.name}/{served.version}" for served in loaded],
+        }
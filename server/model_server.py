@@ -1,40 +1,573 @@
-import joblib
-import json
 import numpy as np
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import os
+import threading
+import time
+from contextlib import nullcontext
+
+from admission import (PRIORITY_HEADER, TIMEOUT_HEADER, AdmissionController, DeadlineExceeded, Overloaded,
+                       parse_deadline, parse_priority)
+from artifact import model_file
+from health import Readiness, UtilizationTracker, live, load_warmup_texts
+from json_codec import RequestValidationError, get_codec
+from metrics import Counter, Gauge, render_prometheus
+from model_repository import WARMUP_TEXTS, ModelRepository, ServedModel, ServingOptions
+from profiler import ProfilerBusy, collapsed, sample_stacks
+from request_trace import RequestTracer
+from shadow import ShadowScorer
+from trace_recorder import TraceRecorder
+from v2_protocol import (BINARY_CONTENT_TYPE, HEADER_LENGTH, InferenceRequestError, decode_infer_request,
+                         encode_infer_response, model_metadata)
 
 app = Flask(__name__)
 
-# Load the model
+# The single model served when MODEL_DIR is not set
+# (a joblib pipeline or a memory-mapped serving artifact directory)
+MODEL_NAME = os.environ.get('MODEL_NAME', 'sentiment-classifier')
 model_path = os.environ.get('MODEL_PATH', '/app/model.joblib')
-model = joblib.load(model_path)
 
-@app.route('/v1/models/sentiment-classifier', methods=['GET'])
-def health():
+# Serve every model under MODEL_DIR/<name>/<version>/, loaded on first use
+MODEL_DIR = os.environ.get('MODEL_DIR')
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get('MODEL_MEMORY_BUDGET_MB', '0'))
+
+# Reload a model in the background when its file changes; 0 disables watching
+MODEL_WATCH_SECONDS = float(os.environ.get('MODEL_WATCH_SECONDS', '5'))
+
+# Score with the NumPy fast path instead of the sklearn pipeline
+FAST_SCORER = os.environ.get('FAST_SCORER', 'false').lower() == 'true'
+
+# Extract features with a tokenizer compiled from the fitted vectorizer (same output): true, false, or
+# auto to compile only n-gram and TF-IDF vectorizers, where it is faster on small batches too
+COMPILED_FEATURES = os.environ.get('COMPILED_FEATURES', 'auto').lower()
+COMPILED_FEATURES = 'auto' if COMPILED_FEATURES == 'auto' else COMPILED_FEATURES == 'true'
+
+# Dynamic batching across concurrent requests
+BATCHING_ENABLED = os.environ.get('BATCHING_ENABLED', 'true').lower() == 'true'
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '64'))
+MAX_BATCH_WAIT_MS = float(os.environ.get('MAX_BATCH_WAIT_MS', '2'))
+
+# Prediction cache for repeated inputs
+CACHE_ENABLED = os.environ.get('CACHE_ENABLED', 'false').lower() == 'true'
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '100000'))
+CACHE_MAX_MB = float(os.environ.get('CACHE_MAX_MB', '0'))
+CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', '0'))
+
+# Admission control for prediction requests, per worker process; MAX_IN_FLIGHT=0 disables it
+MAX_IN_FLIGHT = int(os.environ.get('MAX_IN_FLIGHT', '4'))
+MAX_QUEUE_DEPTH = int(os.environ.get('MAX_QUEUE_DEPTH', '16'))
+MAX_QUEUE_WAIT_MS = float(os.environ.get('MAX_QUEUE_WAIT_MS', '1000'))
+
+# Readiness probes pass once each worker has scored WARMUP_BATCHES batches of WARMUP_BATCH_SIZE texts
+# with every model that takes traffic; 0 reports ready at once. WARMUP_DATA is a JSONL file of
+# {"text": ...} lines or a recorded trace to warm up with instead of built-in examples
+WARMUP_BATCHES = int(os.environ.get('WARMUP_BATCHES', '3'))
+WARMUP_BATCH_SIZE = int(os.environ.get('WARMUP_BATCH_SIZE', str(MAX_BATCH_SIZE)))
+WARMUP_DATA = os.environ.get('WARMUP_DATA')
+
+# Liveness fails when a micro-batcher has been scoring one batch for this long
+LIVENESS_STALL_SECONDS = float(os.environ.get('LIVENESS_STALL_SECONDS', '30'))
+
+# Window of the utilization signal (arrival rate relative to measured capacity)
+UTILIZATION_WINDOW_SECONDS = float(os.environ.get('UTILIZATION_WINDOW_SECONDS', '10'))
+
+# JSON codec for v1 requests and responses: auto, msgspec, orjson or json
+codec = get_codec(os.environ.get('JSON_CODEC', 'auto'))
+
+# Streaming predict requests (NDJSON, one instance per line) are scored in chunks of this many lines
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', '1000'))
+STREAM_MAX_LINE_BYTES = int(os.environ.get('STREAM_MAX_LINE_KB', '1024')) * 1024
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl')
+
+# Record live requests as a replayable workload trace
+TRACE_RECORD_PATH = os.environ.get('TRACE_RECORD_PATH')
+TRACE_RECORD_SAMPLE = float(os.environ.get('TRACE_RECORD_SAMPLE', '1.0'))
+
+# Mirror a sample of requests for SHADOW_TARGET to a second model, off the response path, and compare them
+SHADOW_MODEL_PATH = os.environ.get('SHADOW_MODEL_PATH')
+SHADOW_TARGET = os.environ.get('SHADOW_TARGET', MODEL_NAME)
+SHADOW_SAMPLE_RATE = float(os.environ.get('SHADOW_SAMPLE_RATE', '0.1'))
+SHADOW_QUEUE_SIZE = int(os.environ.get('SHADOW_QUEUE_SIZE', '1000'))
+
+# Sampled per-request stage traces: one request in every REQUEST_TRACE_EVERY, 0 disables
+REQUEST_TRACE_EVERY = int(os.environ.get('REQUEST_TRACE_EVERY', '0'))
+REQUEST_TRACE_OUTPUT = os.environ.get('REQUEST_TRACE_OUTPUT', 'log')
+
+# GET /admin/profile runs the sampling profiler in the worker that answers it
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILE_MAX_SECONDS = float(os.environ.get('PROFILE_MAX_SECONDS', '60'))
+
+repository = ModelRepository(
+    ServingOptions(
+        fast_scorer=FAST_SCORER,
+        compiled_features=COMPILED_FEATURES,
+        batching=BATCHING_ENABLED,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_batch_wait_ms=MAX_BATCH_WAIT_MS,
+        cache=CACHE_ENABLED,
+        cache_max_entries=CACHE_MAX_ENTRIES,
+        cache_max_bytes=int(CACHE_MAX_MB * 1024 * 1024) or None,
+        cache_ttl_seconds=CACHE_TTL_SECONDS or None,
+    ),
+    model_dir=MODEL_DIR,
+    memory_budget_bytes=int(MODEL_MEMORY_BUDGET_MB * 1024 * 1024) or None,
+    watch_seconds=MODEL_WATCH_SECONDS or None,
+)
+
+if not MODEL_DIR:
+    # Load it now, so gunicorn workers share the model pages after the fork
+    model_stat = os.stat(model_file(model_path))
+    MODEL_VERSION = os.environ.get('MODEL_VERSION', f"{model_stat.st_size}-{int(model_stat.st_mtime)}")
+    repository.add_model(MODEL_NAME, MODEL_VERSION, model_path)
+    repository.get(MODEL_NAME, MODEL_VERSION)
+
+trace_recorder = TraceRecorder(TRACE_RECORD_PATH, TRACE_RECORD_SAMPLE) if TRACE_RECORD_PATH else None
+
+shadow = None
+if SHADOW_MODEL_PATH:
+    # Loaded before the fork like the serving model; scored one mirrored request at a time
+    shadow_stat = os.stat(model_file(SHADOW_MODEL_PATH))
+    shadow_model = ServedModel(
+        f"{SHADOW_TARGET}-shadow", f"{shadow_stat.st_size}-{int(shadow_stat.st_mtime)}", SHADOW_MODEL_PATH,
+        ServingOptions(fast_scorer=FAST_SCORER, compiled_features=COMPILED_FEATURES, batching=False),
+    )
+    shadow = ShadowScorer(shadow_model, SHADOW_TARGET, SHADOW_SAMPLE_RATE, SHADOW_QUEUE_SIZE)
+
+request_tracer = RequestTracer(REQUEST_TRACE_EVERY, REQUEST_TRACE_OUTPUT) if REQUEST_TRACE_EVERY > 0 else None
+
+admission = AdmissionController(MAX_IN_FLIGHT, MAX_QUEUE_DEPTH, MAX_QUEUE_WAIT_MS) if MAX_IN_FLIGHT > 0 else None
+
+readiness = Readiness(WARMUP_BATCHES, WARMUP_BATCH_SIZE,
+                      load_warmup_texts(WARMUP_DATA, WARMUP_BATCH_SIZE) if WARMUP_DATA else WARMUP_TEXTS)
+utilization = UtilizationTracker(UTILIZATION_WINDOW_SECONDS)
+
+# Prometheus metrics, served on /metrics; per-model metrics are kept by each ServedModel
+requests_total = Counter('model_server_requests_total', 'Prediction requests handled')
+request_errors = Counter('model_server_request_errors_total', 'Prediction requests that failed')
+requests_in_flight = Gauge('model_server_requests_in_flight', 'Prediction requests being handled')
+
+
+def resolve(name, version=None):
+    """The ServedModel a request for `name` (and `version`) goes to, or None if there is none."""
+    try:
+        return repository.get(name, version)
+    except KeyError:
+        return None
+
+
+def model_not_found(name, version=None):
+    model = f"{name}/versions/{version}" if version else name
+    return {"error": f"Model {model} not found"}
+
+
+def warm_up_targets():
+    """Every model version that takes traffic, loaded."""
+    for name in repository.model_names():
+        for version, _ in repository.traffic(name):
+            try:
+                yield repository.get(name, version)
+            except Exception as e:
+                print(f"Loading {name}/{version} for warm-up failed: {e!r}")
+
+
+def start_warm_up():
+    """Warm up this worker in the background, if it has not started already."""
+    readiness.start(warm_up_targets)
+
+
+def is_ready():
+    # Started here too, for servers run without the gunicorn or ASGI startup hooks
+    start_warm_up()
+    return readiness.ready
+
+
+def is_live():
+    return live(repository.loaded(), LIVENESS_STALL_SECONDS)
+
+
+def request_admission(headers):
+    """Priority class and deadline of a prediction request, from its headers."""
+    return parse_priority(headers.get(PRIORITY_HEADER)), parse_deadline(headers.get(TIMEOUT_HEADER))
+
+
+def admitted(priority, deadline):
+    """Context manager holding an admission slot, if admission control is on."""
+    return admission.slot(priority, deadline) if admission else nullcontext()
+
+
+def traced(name, served):
+    """Context manager tracing the request handled inside it, if request tracing samples it."""
+    if request_tracer is None:
+        return nullcontext()
+    return request_tracer.trace(name, model=served.name, model_version=served.version)
+
+
+def overloaded_response(e):
+    response = jsonify({"error": str(e)})
+    response.status_code = e.status
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+
+def deadline_response(e):
+    return jsonify({"error": str(e)}), 504
+
+
+@app.route('/v1/models', methods=['GET'])
+def list_models():
+    return jsonify({"models": repository.model_names()})
+
+
+@app.route('/v1/models/<name>', methods=['GET'])
+def health(name):
+    if not repository.versions(name):
+        return jsonify(model_not_found(name)), 404
+    if not is_ready():
+        return jsonify({"status": "warming up"}), 503
     return jsonify({"status": "ready"})
 
-@app.route('/v1/models/sentiment-classifier:predict', methods=['POST'])
-def predict():
-    data = request.json
-    
-    # Extract instances from the request
-    instances = data.get('instances', [])
-    texts = [instance.get('text', '') for instance in instances]
-    
+
+def server_stats(served):
+    return {
+        "model": served.stats(),
+        "repository": repository.stats(),
+        "admission": admission.stats() if admission else None,
+        "shadow": shadow.stats() if shadow and served.name == SHADOW_TARGET else None,
+        "readiness": readiness.stats(),
+        "utilization": utilization.stats(),
+    }
+
+
+@app.route('/v1/models/<name>/stats', methods=['GET'])
+def stats(name):
+    served = resolve(name)
+    if served is None:
+        return jsonify(model_not_found(name)), 404
+    return jsonify(server_stats(served))
+
+
+def reload_models(name, version=None):
+    """Reload `version`, or every loaded version of `name`, from disk. Returns (body, status)."""
+    if version is None:
+        versions = [served.version for served in repository.loaded() if served.name == name]
+    else:
+        versions = [version]
+    if not versions:
+        return model_not_found(name), 404
+
+    try:
+        reloaded = [repository.reload(name, v) for v in versions]
+    except KeyError:
+        return model_not_found(name, version), 404
+    except Exception as e:
+        return {"error": f"Reload failed, the loaded model keeps serving: {e!r}"}, 500
+    return {"reloaded": [served.version for served in reloaded]}, 200
+
+
+@app.route('/v1/models/<name>:reload', methods=['POST'])
+@app.route('/v1/models/<name>/versions/<version>:reload', methods=['POST'])
+def reload(name, version=None):
+    body, status = reload_models(name, version)
+    return jsonify(body), status
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+def profile(seconds, interval_ms, idle):
+    """Profile this worker; returns (collapsed stacks or error message, status)."""
+    if not PROFILING_ENABLED:
+        return "Profiling is disabled, set PROFILING_ENABLED=true\n", 404
+    try:
+        seconds = float(seconds if seconds is not None else 10)
+        interval = float(interval_ms if interval_ms is not None else 10) / 1000.0
+    except ValueError:
+        return "seconds and interval_ms must be numbers\n", 400
+    if not 0 < seconds <= PROFILE_MAX_SECONDS or not 0.001 <= interval <= 1:
+        return f"seconds must be in (0, {PROFILE_MAX_SECONDS:g}] and interval_ms in [1, 1000]\n", 400
+    try:
+        counts = sample_stacks(seconds, interval, include_idle=(idle or '').lower() == 'true')
+    except ProfilerBusy as e:
+        return f"{e}\n", 409
+    return collapsed(counts), 200
+
+
+@app.route('/admin/profile', methods=['GET'])
+def admin_profile():
+    body, status = profile(request.args.get('seconds'), request.args.get('interval_ms'), request.args.get('idle'))
+    response = Response(body, status=status, mimetype='text/plain')
+    response.headers['X-Worker-Pid'] = str(os.getpid())
+    return response
+
+
+def score_texts(served, texts, deadline=None):
+    if not texts:
+        return np.empty(0, dtype=served.model.classes_.dtype), np.empty(0)
+    labels, confidences = served.predict(texts, deadline)
+    if shadow and served.name == SHADOW_TARGET:
+        shadow.offer(texts, labels, confidences)
+    return labels, confidences
+
+
+def predict_v1(served, body, deadline=None):
+    """Score a v1 request body with `served` and return the response body."""
+    start = time.perf_counter()
+    # Decoding validates the request schema and yields the texts directly
+    texts = codec.decode_predict_request(body)
+    served.observe_stage('parse', start)
+    if trace_recorder:
+        trace_recorder.record(texts)
+
     # Make predictions
-    predictions = model.predict(texts)
-    probabilities = model.predict_proba(texts)
-    
-    # Format the response
-    results = []
-    for i, pred in enumerate(predictions):
-        results.append({
-            'prediction': int(pred),
-            'confidence': float(probabilities[i][pred])
-        })
-    
-    return jsonify({"predictions": results})
+    labels, confidences = score_texts(served, texts, deadline)
+
+    start = time.perf_counter()
+    body = codec.encode_predictions(labels, confidences)
+    served.observe_stage('serialize', start)
+    return body
+
+
+def stream_error_line(message):
+    return codec.encode_error_line(message)
+
+
+def predict_stream_chunk(served, lines, first_line, deadline=None):
+    """
+    Score a chunk of NDJSON instance lines, numbered from `first_line`, and
+    return the NDJSON prediction lines and whether the stream can go on. A bad
+    line ends the chunk with an {"error": ...} line after the predictions for
+    the lines before it.
+    """
+    start = time.perf_counter()
+    texts, error = [], None
+    for number, line in enumerate(lines, first_line):
+        if not line.strip():
+            continue
+        try:
+            texts.append(codec.decode_instance(line))
+        except RequestValidationError as e:
+            error = f"Line {number}: {e}"
+            break
+    served.observe_stage('parse', start)
+    if trace_recorder and texts:
+        trace_recorder.record(texts)
+
+    labels, confidences = score_texts(served, texts, deadline)
+
+    start = time.perf_counter()
+    body = codec.encode_prediction_lines(labels, confidences)
+    served.observe_stage('serialize', start)
+    if error is not None:
+        request_errors.inc()
+        body += stream_error_line(error)
+    return body, error is None
+
+
+def read_lines(stream):
+    """Yield the lines of a request body one at a time, never holding more than one line."""
+    while True:
+        line = stream.readline(STREAM_MAX_LINE_BYTES + 1)
+        if not line:
+            return
+        if len(line) > STREAM_MAX_LINE_BYTES:
+            raise RequestValidationError(f"Line is longer than {STREAM_MAX_LINE_BYTES} bytes")
+        yield line
+
+
+def release_once(release):
+    """`release`, made safe to call more than once."""
+    lock = threading.Lock()
+    released = False
+
+    def release_once():
+        nonlocal released
+        with lock:
+            if released:
+                return
+            released = True
+        release()
+    return release_once
+
+
+def predict_stream(served, lines, deadline=None, release=None):
+    """
+    Score NDJSON `lines` in chunks of STREAM_CHUNK_SIZE, yielding NDJSON
+    predictions as each chunk is done, so memory stays bounded by the chunk.
+    The status is sent before the body is read, so a bad line or a missed
+    deadline ends the stream with an {"error": ...} line. `release` is called
+    when the stream ends, however it ends.
+    """
+    requests_in_flight.inc()
+    try:
+        with utilization.request():
+            chunk, first_line = [], 1
+            for line in lines:
+                chunk.append(line)
+                if len(chunk) >= STREAM_CHUNK_SIZE:
+                    body, ok = predict_stream_chunk(served, chunk, first_line, deadline)
+                    yield body
+                    if not ok:
+                        return
+                    first_line += len(chunk)
+                    chunk = []
+            if chunk:
+                yield predict_stream_chunk(served, chunk, first_line, deadline)[0]
+    except RequestValidationError as e:
+        request_errors.inc()
+        yield stream_error_line(str(e))
+    except DeadlineExceeded as e:
+        if admission:
+            admission.record_expired()
+        yield stream_error_line(str(e))
+    except Exception:
+        request_errors.inc()
+        raise
+    finally:
+        requests_in_flight.dec()
+        requests_total.inc()
+        if release:
+            release()
+
+
+@app.route('/v1/models/<name>:predict', methods=['POST'])
+@app.route('/v1/models/<name>/versions/<version>:predict', methods=['POST'])
+def predict(name, version=None):
+    served = resolve(name, version)
+    if served is None:
+        return jsonify(model_not_found(name, version)), 404
+
+    priority, deadline = request_admission(request.headers)
+    if request.mimetype in NDJSON_MIMETYPES:
+        release = None
+        if admission:
+            # Held until the whole stream has been sent
+            try:
+                admission.acquire(priority, deadline)
+            except Overloaded as e:
+                return overloaded_response(e)
+            except DeadlineExceeded as e:
+                admission.record_expired()
+                return deadline_response(e)
+            release = release_once(admission.release)
+        response = Response(predict_stream(served, read_lines(request.stream), deadline, release),
+                            mimetype='application/x-ndjson')
+        response.headers['X-Model-Version'] = served.version
+        if release:
+            # Also when the stream ends before it started, e.g. the client disconnected
+            response.call_on_close(release)
+        return response
+
+    requests_in_flight.inc()
+    try:
+        with utilization.request(), traced('v1.predict', served), admitted(priority, deadline):
+            body = predict_v1(served, request.get_data(cache=False), deadline)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except DeadlineExceeded as e:
+        return deadline_response(e)
+    except RequestValidationError as e:
+        request_errors.inc()
+        return jsonify({"error": str(e)}), 400
+    except Exception:
+        request_errors.inc()
+        raise
+    finally:
+        requests_in_flight.dec()
+        requests_total.inc()
+
+    response = Response(body, mimetype='application/json')
+    response.headers['X-Model-Version'] = served.version
+    return response
+
+
+def infer_v2(served, body, header_length=None, deadline=None):
+    """Score a v2 inference request body with `served`. Returns (response body, header length)."""
+    start = time.perf_counter()
+    texts, v2_request = decode_infer_request(body, header_length)
+    served.observe_stage('parse', start)
+    if trace_recorder:
+        trace_recorder.record(texts)
+
+    labels, confidences = score_texts(served, texts, deadline)
+
+    start = time.perf_counter()
+    response = encode_infer_response(served.name, served.version, v2_request, labels, confidences)
+    served.observe_stage('serialize', start)
+    return response
+
+
+@app.route('/v2', methods=['GET'])
+def v2_server_metadata():
+    return jsonify({"name": "sentiment-model-server", "version": "2", "extensions": ["binary_tensor_data"]})
+
+
+# The v2 protocol reports false with a 4xx status
+@app.route('/v2/health/live', methods=['GET'])
+def v2_live():
+    alive = is_live()
+    return jsonify({"live": alive}), 200 if alive else 400
+
+
+@app.route('/v2/health/ready', methods=['GET'])
+def v2_ready():
+    ready = is_ready()
+    return jsonify({"ready": ready}), 200 if ready else 400
+
+
+@app.route('/v2/models/<name>', methods=['GET'])
+@app.route('/v2/models/<name>/versions/<version>', methods=['GET'])
+def v2_model_metadata(name, version=None):
+    served = resolve(name, version)
+    if served is None:
+        return jsonify(model_not_found(name, version)), 404
+    versions = sorted(repository.versions(name)) if version is None else [version]
+    return jsonify(model_metadata(name, versions, served.model.classes_.dtype))
+
+
+@app.route('/v2/models/<name>/ready', methods=['GET'])
+@app.route('/v2/models/<name>/versions/<version>/ready', methods=['GET'])
+def v2_model_ready(name, version=None):
+    if resolve(name, version) is None:
+        return jsonify(model_not_found(name, version)), 404
+    ready = is_ready()
+    return jsonify({"name": name, "ready": ready}), 200 if ready else 400
+
+
+@app.route('/v2/models/<name>/infer', methods=['POST'])
+@app.route('/v2/models/<name>/versions/<version>/infer', methods=['POST'])
+def v2_infer(name, version=None):
+    served = resolve(name, version)
+    if served is None:
+        return jsonify(model_not_found(name, version)), 404
+
+    priority, deadline = request_admission(request.headers)
+    requests_in_flight.inc()
+    try:
+        with utilization.request(), traced('v2.infer', served), admitted(priority, deadline):
+            body, header_length = infer_v2(served, request.get_data(cache=False), request.headers.get(HEADER_LENGTH),
+                                           deadline)
+    except Overloaded as e:
+        return overloaded_response(e)
+    except DeadlineExceeded as e:
+        return deadline_response(e)
+    except InferenceRequestError as e:
+        request_errors.inc()
+        return jsonify({"error": str(e)}), 400
+    except Exception:
+        request_errors.inc()
+        raise
+    finally:
+        requests_in_flight.dec()
+        requests_total.inc()
+
+    if header_length is None:
+        return Response(body, content_type='application/json')
+    response = Response(body, content_type=BINARY_CONTENT_TYPE)
+    response.headers[HEADER_LENGTH] = str(header_length)
+    return response
+
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080)
\ No newline at end of file
+    start_warm_up()
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', '8080')))
@@ -0,0 +1,91 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Rough size of one entry: 16-byte digest key, (label, confidence, expiry)
+# tuple and the OrderedDict node that holds them
+ENTRY_OVERHEAD_BYTES = 240
+
+
+def normalize_text(text, lowercase=True):
+    """Collapse whitespace (and case, if the vectorizer ignores it) so equivalent inputs share a key."""
+    text = ' '.join(text.split())
+    return text.lower() if lowercase else text
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache of (label, confidence) pairs.
+
+    Keys are a digest of the model version and the normalized text, so entries
+    from a previous model can never be served after the version changes. The
+    cache is bounded by `max_entries` and, when given, by an approximate
+    `max_bytes` budget; entries older than `ttl_seconds` are treated as misses.
+    """
+
+    def __init__(self, model_version, max_entries=100000, max_bytes=None, ttl_seconds=None, lowercase=True):
+        self.model_version = model_version.encode('utf-8')
+        self.max_entries = max_entries
+        if max_bytes:
+            self.max_entries = min(max_entries, max(1, max_bytes // ENTRY_OVERHEAD_BYTES))
+        self.ttl = ttl_seconds
+        self.lowercase = lowercase
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, text):
+        digest = hashlib.blake2b(self.model_version, digest_size=16)
+        digest.update(b'\0')
+        digest.update(normalize_text(text, self.lowercase).encode('utf-8'))
+        return digest.digest()
+
+    def get_many(self, keys):
+        """Return a list with the cached (label, confidence) for each key, or None on a miss."""
+        now = time.monotonic()
+        results = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl is not None and entry[2] < now:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    results.append((entry[0], entry[1]))
+        return results
+
+    def put_many(self, keys, labels, confidences):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            for key, label, confidence in zip(keys, labels, confidences):
+                self._entries[key] = (label, confidence, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
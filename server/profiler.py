@@ -0,0 +1,101 @@
+"""
+Sampling profiler for a running worker.
+
+`sample_stacks` wakes up every `interval` seconds, walks the Python stack of
+every other thread in the process with `sys._current_frames()`, and counts
+identical stacks. Nothing is instrumented, so the server runs at full speed
+between samples and costs nothing when no profile is being taken. The counts
+are written in the collapsed-stack format read by flamegraph.pl, speedscope
+and most other flame graph tools:
+
+    <thread>;<outermost frame>;...;<innermost frame> <samples>
+
+Threads waiting on a lock, queue or socket are idle rather than busy, so
+stacks ending in one of those waits are left out unless `include_idle` is
+set. Only Python frames are seen: time in C code (NumPy, SciPy) is counted
+against the Python function that called it.
+"""
+
+import collections
+import os
+import sys
+import threading
+import time
+
+# (file, function) of innermost frames that mean the thread is blocked waiting;
+# the server's own background loops are listed because they sleep in C
+IDLE_FRAMES = {
+    ('model_repository.py', '_watch'),
+    ('trace_recorder.py', '_run'),
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'),
+    ('selectors.py', 'select'),
+    ('socket.py', 'accept'),
+    ('socket.py', 'readinto'),
+    ('socketserver.py', 'serve_forever'),
+    ('thread.py', '_worker'),
+}
+
+
+class ProfilerBusy(Exception):
+    """Another profile is already being taken in this process."""
+
+
+_lock = threading.Lock()
+
+
+def _frame_label(code, labels):
+    label = labels.get(code)
+    if label is None:
+        label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+        labels[code] = label
+    return label
+
+
+def _is_idle(frame):
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+def sample_stacks(seconds, interval=0.01, include_idle=False):
+    """
+    Sample the stacks of all other threads for `seconds`, every `interval`
+    seconds. Returns a Counter of collapsed stacks; raises ProfilerBusy if a
+    profile is already running.
+    """
+    if not _lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already being taken in this worker")
+    try:
+        me = threading.get_ident()
+        counts = collections.Counter()
+        labels = {}
+        thread_names = {}
+        names_refreshed = 0.0
+        end = time.monotonic() + seconds
+        while True:
+            now = time.monotonic()
+            if now >= end:
+                return counts
+            if now - names_refreshed > 1.0:
+                thread_names = {t.ident: t.name.replace(';', ':') for t in threading.enumerate()}
+                names_refreshed = now
+
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (not include_idle and _is_idle(frame)):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code, labels))
+                    frame = frame.f_back
+                stack.append(thread_names.get(ident, f'thread-{ident}'))
+                counts[';'.join(reversed(stack))] += 1
+
+            time.sleep(interval)
+    finally:
+        _lock.release()
+
+
+def collapsed(counts):
+    """Collapsed-stack text for the counts from `sample_stacks`, most frequent first."""
+    return ''.join(f"{stack} {count}\n" for stack, count in counts.most_common())
@@ -0,0 +1,159 @@
+"""
+Sampled per-request traces.
+
+One request in every `every` gets a RequestTrace that collects a span for each
+stage it goes through: waiting for admission, parsing, waiting for its
+micro-batch, vectorizing, classifying and serializing. When the request is
+done the trace is emitted either as a JSON log line on the
+`model_server.request_trace` logger or, with output `otel`, as OpenTelemetry
+spans (the OpenTelemetry SDK and exporter are configured as usual, e.g. by
+running under `opentelemetry-instrument`).
+
+The trace of the request being handled lives in a context variable, so the
+code recording a stage does not need it passed in; `current_trace()` is None
+for unsampled requests and when tracing is off. The micro-batcher runs the
+model for several requests at once, so it records batch stages on all of
+their traces through a TraceGroup.
+"""
+
+import contextvars
+import itertools
+import json
+import logging
+import random
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+OUTPUTS = ('log', 'otel')
+
+_current = contextvars.ContextVar('request_trace', default=None)
+
+
+def current_trace():
+    """The trace of the request being handled, or None if it is not sampled."""
+    return _current.get()
+
+
+class RequestTrace:
+    __slots__ = ('name', 'attributes', 'trace_id', 'started_at', 'start', 'end', 'spans', 'error')
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = f'{random.getrandbits(128):032x}'
+        self.started_at = time.time_ns()
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans = []   # (name, start, end, attributes) with perf_counter times
+        self.error = None
+
+    def span(self, name, start, end, **attributes):
+        """Record a stage that ran from `start` to `end` (`time.perf_counter()` values)."""
+        self.spans.append((name, start, end, attributes))
+
+    def to_dict(self):
+        def ms(t):
+            return round((t - self.start) * 1000.0, 3)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            **self.attributes,
+            "timestamp": self.started_at / 1e9,
+            "duration_ms": ms(self.end),
+            "error": self.error,
+            "spans": [
+                {"name": name, "start_ms": ms(start), "duration_ms": round((end - start) * 1000.0, 3), **attributes}
+                for name, start, end, attributes in self.spans
+            ],
+        }
+
+
+class TraceGroup:
+    """Records each span on several traces, for work shared by their requests."""
+
+    __slots__ = ('traces',)
+
+    def __init__(self, traces):
+        self.traces = traces
+
+    def span(self, name, start, end, **attributes):
+        for trace in self.traces:
+            trace.span(name, start, end, **attributes)
+
+
+@contextmanager
+def using_trace(trace):
+    """Make `trace` the current trace inside the block."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+class LogExporter:
+    def __init__(self):
+        self.logger = logging.getLogger('model_server.request_trace')
+        if not self.logger.handlers:
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+            self.logger.propagate = False
+
+    def export(self, trace):
+        self.logger.info(json.dumps(trace.to_dict()))
+
+
+class OpenTelemetryExporter:
+    def __init__(self):
+        from opentelemetry import trace as otel_trace
+        self.otel_trace = otel_trace
+        self.tracer = otel_trace.get_tracer('model_server')
+
+    def export(self, trace):
+        def ns(t):
+            return trace.started_at + int((t - trace.start) * 1e9)
+
+        root = self.tracer.start_span(trace.name, start_time=trace.started_at, attributes=trace.attributes)
+        if trace.error is not None:
+            root.set_attribute('error.type', trace.error)
+            root.set_status(self.otel_trace.Status(self.otel_trace.StatusCode.ERROR))
+        context = self.otel_trace.set_span_in_context(root)
+        for name, start, end, attributes in trace.spans:
+            span = self.tracer.start_span(name, context=context, start_time=ns(start), attributes=attributes)
+            span.end(end_time=ns(end))
+        root.end(end_time=ns(trace.end))
+
+
+class RequestTracer:
+    """
+    Traces one request in every `every`. `output` is 'log' for JSON log lines
+    or 'otel' for OpenTelemetry spans (needs `opentelemetry-api`).
+    """
+
+    def __init__(self, every, output='log'):
+        if output not in OUTPUTS:
+            raise ValueError(f"Unknown request trace output {output!r}; choose from {list(OUTPUTS)}")
+        self.every = every
+        self.exporter = OpenTelemetryExporter() if output == 'otel' else LogExporter()
+        self._requests = itertools.count()
+
+    def trace(self, name, **attributes):
+        """Context manager tracing the request handled inside it, if it is sampled."""
+        if next(self._requests) % self.every:
+            return nullcontext()
+        return self._traced(RequestTrace(name, attributes))
+
+    @contextmanager
+    def _traced(self, trace):
+        try:
+            with using_trace(trace):
+                yield trace
+        except BaseException as e:
+            trace.error = type(e).__name__
+            raise
+        finally:
+            trace.end = time.perf_counter()
+            self.exporter.export(trace)
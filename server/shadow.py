@@ -0,0 +1,125 @@
+"""
+Shadow traffic: score a sample of live requests with a second model as well,
+to compare it with the serving model before it takes real traffic.
+
+A sampled fraction of scored requests is handed, together with the serving
+model's labels and confidences, to a background thread through a bounded
+queue. The thread scores the same texts with the shadow model and records:
+
+    model_server_shadow_requests_total{outcome}   scored, dropped (queue full) or failed
+    model_server_shadow_instances_total           instances compared
+    model_server_shadow_agreements_total          instances where both models chose the same label
+    model_server_shadow_confidence_delta          shadow minus serving confidence, per instance
+    model_server_shadow_latency_seconds           shadow model time per request
+
+so the agreement rate is agreements / instances. Handing a request over never
+blocks: when the queue is full the sample is dropped, and the response is sent
+without waiting for the shadow model. Shadow scoring still uses CPU in the
+same worker, so keep the sample rate low enough to leave headroom.
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+
+import numpy as np
+
+from metrics import counter, function_metric, histogram
+
+OUTCOMES = ('scored', 'dropped', 'failed')
+LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+DELTA_BUCKETS = [-0.5, -0.2, -0.1, -0.05, -0.01, 0.01, 0.05, 0.1, 0.2, 0.5]
+
+
+class ShadowScorer:
+    """
+    Mirrors requests for the model called `target` to `shadow`, a ServedModel
+    loaded without batching. Call `offer()` after scoring a request; it
+    returns immediately.
+    """
+
+    def __init__(self, shadow, target, sample_rate=0.1, max_queue=1000):
+        self.shadow = shadow
+        self.target = target
+        self.sample_rate = sample_rate
+        self.max_queue = max_queue
+
+        labels = {"model": target, "shadow_version": shadow.version}
+        self.requests_total = {
+            outcome: counter('model_server_shadow_requests_total', 'Requests mirrored to the shadow model',
+                             dict(labels, outcome=outcome))
+            for outcome in OUTCOMES
+        }
+        self.instances_total = counter('model_server_shadow_instances_total',
+                                       'Instances scored by both the serving and the shadow model', labels)
+        self.agreements_total = counter('model_server_shadow_agreements_total',
+                                        'Instances where the shadow model chose the same label', labels)
+        self.confidence_delta = histogram('model_server_shadow_confidence_delta',
+                                          'Shadow minus serving model confidence per instance',
+                                          DELTA_BUCKETS, labels)
+        self.latency_seconds = histogram('model_server_shadow_latency_seconds',
+                                         'Time the shadow model takes per mirrored request', LATENCY_BUCKETS, labels)
+        function_metric('model_server_shadow_queue_depth', 'Requests waiting for the shadow model',
+                        lambda: self._queue.qsize() if self._queue else 0, labels=labels)
+
+        self._queue = None
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker_pid != os.getpid():
+                self._queue = queue.Queue(self.max_queue)
+                worker = threading.Thread(target=self._run, args=(self._queue,), name='shadow-scorer', daemon=True)
+                worker.start()
+                self._worker_pid = os.getpid()
+
+    def offer(self, texts, labels, confidences):
+        """Mirror a scored request to the shadow model, if it is sampled and the queue has room."""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((texts, labels, confidences))
+        except queue.Full:
+            self.requests_total['dropped'].inc()
+
+    def compare(self, texts, labels, confidences):
+        start = time.perf_counter()
+        shadow_labels, shadow_confidences = self.shadow.run_model(texts)
+        self.latency_seconds.observe(time.perf_counter() - start)
+
+        self.instances_total.inc(len(texts))
+        self.agreements_total.inc(int(np.count_nonzero(shadow_labels == labels)))
+        for delta in (shadow_confidences - confidences).tolist():
+            self.confidence_delta.observe(delta)
+
+    def _run(self, pending):
+        while True:
+            texts, labels, confidences = pending.get()
+            try:
+                self.compare(texts, labels, confidences)
+            except Exception as e:
+                self.requests_total['failed'].inc()
+                print(f"Shadow scoring with {self.shadow.name}/{self.shadow.version} failed: {e!r}")
+                continue
+            self.requests_total['scored'].inc()
+
+    def stats(self):
+        instances = self.instances_total.value
+        delta = self.confidence_delta.snapshot()
+        return {
+            "target": self.target,
+            "shadow": f"{self.shadow.name}/{self.shadow.version}",
+            "sample_rate": self.sample_rate,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            **{outcome: metric.value for outcome, metric in self.requests_total.items()},
+            "instances": instances,
+            "agreement_rate": self.agreements_total.value / instances if instances else None,
+            "mean_confidence_delta": delta["sum"] / delta["count"] if delta["count"] else None,
+            "latency_seconds": self.latency_seconds.snapshot(),
+        }
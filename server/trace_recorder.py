@@ -0,0 +1,84 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+from metrics import function_metric
+
+
+class TraceRecorder:
+    """
+    Appends sampled live requests to a JSONL workload trace.
+
+    Each line is {"timestamp": <unix seconds>, "payload": <request body>}, the
+    format scripts/async_load_generator.py replays with --trace. `record`
+    takes the texts of a request; requests that are not sampled cost one
+    random number, and the v1 payload of the others is built by a background
+    thread fed through a bounded queue, so recording never blocks the request
+    path. When the queue is full the request is skipped and counted in
+    `dropped`. Lines are written with O_APPEND, so several gunicorn workers
+    can share one file; lines that cannot be written are logged and counted
+    in `write_errors`.
+    """
+
+    def __init__(self, path, sample_rate=1.0, max_queue=10000, flush_interval=0.5):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self.dropped = 0
+        self.write_errors = 0
+
+        self._queue = None
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+
+        function_metric('model_server_trace_write_errors_total', 'Recorded requests that could not be written',
+                        lambda: self.write_errors, kind='counter')
+
+    def _ensure_worker(self):
+        if self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker_pid != os.getpid():
+                self._queue = queue.Queue(self.max_queue)
+                worker = threading.Thread(target=self._run, args=(self._queue,), name='trace-recorder', daemon=True)
+                worker.start()
+                self._worker_pid = os.getpid()
+
+    def record(self, texts):
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((time.time(), texts))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self, pending):
+        fd = None
+        while True:
+            lines = []
+            try:
+                item = pending.get()
+                while True:
+                    timestamp, texts = item
+                    payload = {"instances": [{"text": text} for text in texts]}
+                    lines.append(json.dumps({"timestamp": timestamp, "payload": payload}))
+                    item = pending.get_nowait()
+            except queue.Empty:
+                pass
+
+            try:
+                if fd is None:
+                    fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                os.write(fd, ('\n'.join(lines) + '\n').encode('utf-8'))
+                self.recorded += len(lines)
+            except OSError as e:
+                # e.g. a full disk; keep serving and try again with the next lines
+                self.write_errors += len(lines)
+                print(f"Writing {len(lines)} requests to trace {self.path} failed: {e!r}")
+            time.sleep(self.flush_interval)
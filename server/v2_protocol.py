@@ -0,0 +1,266 @@
+"""
+KServe v2 / Open Inference Protocol request and response encoding.
+
+Requests carry the texts as a BYTES input tensor, either as JSON `data` or,
+with the binary data extension, as raw bytes after the JSON header:
+
+    Inference-Header-Content-Length: <length of the JSON header>
+
+    {"inputs": [{"name": "text", "datatype": "BYTES", "shape": [2],
+                 "parameters": {"binary_data_size": 21}}],
+     "outputs": [{"name": "confidence", "parameters": {"binary_data": true}}]}
+    <binary tensor data>
+
+A binary BYTES tensor is each element as a 4-byte little-endian length
+followed by its bytes; numeric tensors are their little-endian values. The
+response has two outputs, `label` and `confidence` (FP32), each sent as JSON
+`data` or, when requested, as binary data after the response JSON header.
+Decoding and encoding stay on bytes and NumPy arrays, so the texts and
+probabilities of a large batch are never turned into JSON values.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+HEADER_LENGTH = 'Inference-Header-Content-Length'
+BINARY_CONTENT_TYPE = 'application/octet-stream'
+
+INPUT_NAME = 'text'
+OUTPUTS = ('label', 'confidence')
+
+_DATATYPES = {
+    np.dtype(np.bool_): 'BOOL',
+    np.dtype(np.int8): 'INT8',
+    np.dtype(np.int16): 'INT16',
+    np.dtype(np.int32): 'INT32',
+    np.dtype(np.int64): 'INT64',
+    np.dtype(np.uint8): 'UINT8',
+    np.dtype(np.float32): 'FP32',
+    np.dtype(np.float64): 'FP64',
+}
+
+
+class InferenceRequestError(ValueError):
+    """The request does not follow the protocol; reported to the client as a 400."""
+
+
+def datatype(dtype):
+    """The v2 datatype of a NumPy dtype; strings and objects are BYTES."""
+    return _DATATYPES.get(np.dtype(dtype), 'BYTES')
+
+
+def model_metadata(name, versions, label_dtype):
+    return {
+        "name": name,
+        "versions": versions,
+        "platform": "sklearn",
+        "inputs": [{"name": INPUT_NAME, "datatype": "BYTES", "shape": [-1]}],
+        "outputs": [
+            {"name": "label", "datatype": datatype(label_dtype), "shape": [-1]},
+            {"name": "confidence", "datatype": "FP32", "shape": [-1]},
+        ],
+    }
+
+
+def decode_bytes_tensor(buffer):
+    """Split a binary BYTES tensor into its elements, decoded as UTF-8."""
+    texts = []
+    offset = 0
+    end = len(buffer)
+    unpack_from = struct.unpack_from
+    try:
+        while offset < end:
+            (length,) = unpack_from('<I', buffer, offset)
+            offset += 4
+            if offset + length > end:
+                raise InferenceRequestError("BYTES tensor element runs past the end of its data")
+            texts.append(str(buffer[offset:offset + length], 'utf-8'))
+            offset += length
+    except struct.error:
+        raise InferenceRequestError("BYTES tensor data is truncated")
+    except UnicodeDecodeError:
+        raise InferenceRequestError("BYTES tensor element is not valid UTF-8")
+    return texts
+
+
+def encode_bytes_tensor(values):
+    parts = []
+    for value in values:
+        data = value if isinstance(value, bytes) else str(value).encode('utf-8')
+        parts.append(struct.pack('<I', len(data)))
+        parts.append(data)
+    return b''.join(parts)
+
+
+def encode_tensor(array):
+    """Return (datatype, data) for `array` in the binary tensor encoding."""
+    array_datatype = datatype(array.dtype)
+    if array_datatype == 'BYTES':
+        return array_datatype, encode_bytes_tensor(array.tolist())
+    return array_datatype, array.astype(array.dtype.newbyteorder('<'), copy=False).tobytes()
+
+
+def _flatten(data, texts, name):
+    # JSON tensors may be nested by shape, e.g. [[a], [b]] for shape [2, 1]
+    for value in data:
+        if isinstance(value, str):
+            texts.append(value)
+        elif isinstance(value, list):
+            _flatten(value, texts, name)
+        else:
+            raise InferenceRequestError(f"Input `{name}` data must be strings, got {type(value).__name__}")
+    return texts
+
+
+def _check_shape(tensor, count):
+    shape = tensor.get('shape')
+    if not isinstance(shape, list) or not all(isinstance(dim, int) and not isinstance(dim, bool) and dim >= 0
+                                              for dim in shape):
+        raise InferenceRequestError(f"`shape` of input `{tensor.get('name')}` must be a list of non-negative integers")
+    if int(np.prod(shape)) != count:
+        raise InferenceRequestError(f"Input `{tensor.get('name')}` has {count} elements, but its shape is {shape}")
+
+
+def _parameters(entry, where):
+    parameters = entry.get('parameters')
+    if parameters is None:
+        return {}
+    if not isinstance(parameters, dict):
+        raise InferenceRequestError(f"`parameters` of {where} must be a JSON object")
+    return parameters
+
+
+def _binary_data_size(tensor):
+    size = _parameters(tensor, f"input `{tensor.get('name')}`").get('binary_data_size')
+    if size is not None and (not isinstance(size, int) or isinstance(size, bool) or size < 0):
+        raise InferenceRequestError(f"binary_data_size of input `{tensor.get('name')}` must be a non-negative integer")
+    return size
+
+
+def _check_request(request):
+    if not isinstance(request, dict) or not isinstance(request.get('inputs'), list):
+        raise InferenceRequestError("Request must be a JSON object with an `inputs` list")
+    if not all(isinstance(tensor, dict) for tensor in request['inputs']):
+        raise InferenceRequestError("Each entry of `inputs` must be a JSON object")
+    _parameters(request, "the request")
+    outputs = request.get('outputs')
+    if outputs is not None:
+        if not isinstance(outputs, list) or not all(isinstance(output, dict) for output in outputs):
+            raise InferenceRequestError("`outputs` must be a list of JSON objects")
+        for output in outputs:
+            _parameters(output, f"output `{output.get('name')}`")
+
+
+def decode_infer_request(body, header_length=None):
+    """
+    Parse an inference request body.
+
+    Returns (texts, request), where `request` is the JSON header, used to
+    build the response. `header_length` is the Inference-Header-Content-Length
+    header, if present.
+    """
+    if header_length is not None:
+        try:
+            header_length = int(header_length)
+        except ValueError:
+            raise InferenceRequestError(f"Invalid {HEADER_LENGTH}: {header_length!r}")
+        if not 0 <= header_length <= len(body):
+            raise InferenceRequestError(f"{HEADER_LENGTH} is larger than the request body")
+        header, binary = body[:header_length], memoryview(body)[header_length:]
+    else:
+        header, binary = body, memoryview(b'')
+
+    try:
+        request = json.loads(header)
+    except (ValueError, RecursionError) as e:
+        raise InferenceRequestError(f"Request header is not valid JSON: {e}")
+    _check_request(request)
+
+    # Find our input, and where its binary data starts among all binary inputs
+    tensor, offset = None, 0
+    for candidate in request['inputs']:
+        size = _binary_data_size(candidate)
+        if candidate.get('name') == INPUT_NAME or len(request['inputs']) == 1:
+            tensor = candidate
+            break
+        offset += size or 0
+    if tensor is None:
+        raise InferenceRequestError(f"Request has no `{INPUT_NAME}` input")
+    if tensor.get('datatype') != 'BYTES':
+        raise InferenceRequestError(f"Input `{tensor.get('name')}` must have datatype BYTES")
+
+    size = _binary_data_size(tensor)
+    if size is not None:
+        if offset + size > len(binary):
+            raise InferenceRequestError("binary_data_size is larger than the binary data sent")
+        texts = decode_bytes_tensor(binary[offset:offset + size])
+    else:
+        data = tensor.get('data')
+        if not isinstance(data, list):
+            raise InferenceRequestError(f"Input `{tensor.get('name')}` has no `data`")
+        texts = _flatten(data, [], tensor.get('name'))
+    _check_shape(tensor, len(texts))
+
+    _requested_outputs(request)
+    return texts, request
+
+
+def _wants_binary(request, name):
+    for output in request.get('outputs') or ():
+        if output.get('name') == name:
+            parameters = output.get('parameters') or {}
+            if 'binary_data' in parameters:
+                return bool(parameters['binary_data'])
+    return bool((request.get('parameters') or {}).get('binary_data_output', False))
+
+
+def requested_outputs(names):
+    """The outputs to return, given the names a request asked for (all of them if none)."""
+    unknown = [name for name in names if name not in OUTPUTS]
+    if unknown:
+        raise InferenceRequestError(f"Unknown output {unknown[0]!r}; available outputs are {list(OUTPUTS)}")
+    return names or list(OUTPUTS)
+
+
+def _requested_outputs(request):
+    return requested_outputs([output.get('name') for output in request.get('outputs') or ()])
+
+
+def output_arrays(labels, confidences):
+    return {
+        'label': np.asarray(labels),
+        'confidence': np.asarray(confidences, dtype=np.float32),
+    }
+
+
+def encode_infer_response(name, version, request, labels, confidences):
+    """
+    Build the response body for `labels` and `confidences`.
+
+    Returns (body, header_length); `header_length` is None when no output is
+    binary and the body is plain JSON.
+    """
+    arrays = output_arrays(labels, confidences)
+
+    outputs, binary = [], []
+    for output_name in _requested_outputs(request):
+        array = arrays[output_name]
+        output = {"name": output_name, "datatype": datatype(array.dtype), "shape": [len(array)]}
+        if _wants_binary(request, output_name):
+            _, data = encode_tensor(array)
+            output["parameters"] = {"binary_data_size": len(data)}
+            binary.append(data)
+        else:
+            output["data"] = array.tolist()
+        outputs.append(output)
+
+    response = {"model_name": name, "model_version": version, "outputs": outputs}
+    if 'id' in request:
+        response["id"] = request['id']
+
+    header = json.dumps(response).encode('utf-8')
+    if not binary:
+        return header, None
+    return b''.join([header] + binary), len(header)
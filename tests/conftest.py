@@ -0,0 +1,75 @@
+"""
+Shared fixtures. The server modules import each other by bare name, as they
+do when run from server/, so that directory goes on the path.
+"""
+
+import importlib
+import os
+import random
+import sys
+
+import joblib
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server'))
+
+SAMPLE_TEXTS = [
+    "I love this product, it's amazing",
+    "Great service and fast delivery",
+    "This is terrible, doesn't work at all",
+    "Awful experience, never buying again",
+    "Fantastic customer support",
+    "Disappointed with the quality",
+    "Best purchase I've made this year",
+    "Would recommend to everyone",
+    "Complete waste of money",
+    "Exceeded all my expectations",
+]
+
+EDGE_TEXTS = [
+    "",
+    "   ",
+    "zzz qqq unseen words only",
+    "GREAT great Great service SERVICE and and and fast",
+    "Complete waste of money. Complete waste of money!",
+    "I love this product, it's amazing " * 20,
+    "Café naïve ÉLAN élan",
+]
+
+
+def random_texts(rng, n):
+    words = ' '.join(SAMPLE_TEXTS + EDGE_TEXTS).split()
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(0, 30))) for _ in range(n)]
+
+
+@pytest.fixture(scope='session')
+def texts():
+    """Sample, edge-case and random texts to compare outputs on."""
+    return SAMPLE_TEXTS + EDGE_TEXTS + random_texts(random.Random(0), 300)
+
+
+def fit_pipeline(vectorizer):
+    rng = random.Random(1)
+    training = SAMPLE_TEXTS + random_texts(rng, 400)
+    labels = [i % 2 for i in range(len(training))]
+    return Pipeline([('vectorizer', vectorizer), ('classifier', MultinomialNB())]).fit(training, labels)
+
+
+@pytest.fixture(scope='session', params=['v1', 'v2'])
+def pipeline(request):
+    """A pipeline shaped like sentiment-model-v1 (unigram counts) or v2 (bigram TF-IDF)."""
+    if request.param == 'v1':
+        return fit_pipeline(CountVectorizer())
+    return fit_pipeline(TfidfVectorizer(ngram_range=(1, 2)))
+
+
+@pytest.fixture(scope='session')
+def model_server(tmp_path_factory):
+    """The model_server module, serving a v1-shaped pipeline as MODEL_PATH."""
+    path = tmp_path_factory.mktemp('model') / 'model.joblib'
+    joblib.dump(fit_pipeline(CountVectorizer()), path)
+    os.environ.update(MODEL_PATH=str(path), MODEL_WATCH_SECONDS='0', WARMUP_BATCHES='0')
+    return importlib.import_module('model_server')
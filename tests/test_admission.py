@@ -0,0 +1,301 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from admission import (NORMAL, PRIORITIES, AdmissionController, DeadlineExceeded, Overloaded, parse_deadline,
+                       parse_priority)
+
+HIGH, BEST_EFFORT = PRIORITIES['high'], PRIORITIES['best-effort']
+
+
+def start(controller, priority=NORMAL, deadline=None):
+    """Acquire in a new thread; returns (thread, outcome list)."""
+    outcome = []
+
+    def acquire():
+        try:
+            controller.acquire(priority, deadline)
+            outcome.append('admitted')
+        except (Overloaded, DeadlineExceeded) as e:
+            outcome.append(e)
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    return thread, outcome
+
+
+def queue(controller, priority=NORMAL, deadline=None):
+    """Like start(), once the request is queued."""
+    queued = controller.stats()['queued']
+    thread, outcome = start(controller, priority, deadline)
+    wait_queued(controller, queued + 1)
+    return thread, outcome
+
+
+def wait_queued(controller, n):
+    deadline = time.monotonic() + 5
+    while controller.stats()['queued'] != n:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_admits_up_to_max_in_flight_then_queues():
+    controller = AdmissionController(2, 4)
+    controller.acquire()
+    controller.acquire()
+    thread, outcome = queue(controller)
+    assert controller.stats()['in_flight'] == 2 and controller.stats()['queued'] == 1
+
+    controller.release()
+    thread.join()
+    assert outcome == ['admitted']
+    assert controller.stats()['in_flight'] == 2 and controller.stats()['queued'] == 0
+
+    controller.release()
+    controller.release()
+    assert controller.stats()['in_flight'] == 0
+
+
+def test_full_queue_is_rejected_with_429():
+    controller = AdmissionController(1, 1)
+    controller.acquire()
+    thread, _ = queue(controller)
+    shed = controller.stats()['shed']['queue_full']
+
+    with pytest.raises(Overloaded) as e:
+        controller.acquire()
+    assert e.value.status == 429
+    assert 1 <= e.value.retry_after <= 60
+    assert controller.stats()['shed']['queue_full'] == shed + 1
+
+    controller.release()
+    thread.join()
+    controller.release()
+
+
+def test_higher_priority_displaces_the_newest_lower_priority_waiter():
+    controller = AdmissionController(1, 2)
+    controller.acquire()
+    first, first_outcome = queue(controller, BEST_EFFORT)
+    second, second_outcome = queue(controller, BEST_EFFORT)
+
+    high, high_outcome = start(controller, HIGH)
+    second.join()
+    assert isinstance(second_outcome[0], Overloaded) and second_outcome[0].status == 503
+
+    # The high-priority request is admitted first, even though it came last
+    controller.release()
+    high.join()
+    assert high_outcome == ['admitted'] and first.is_alive()
+    controller.release()
+    first.join()
+    assert first_outcome == ['admitted']
+    controller.release()
+    assert controller.stats()['in_flight'] == 0
+
+
+def test_equal_priority_does_not_displace():
+    controller = AdmissionController(1, 1)
+    controller.acquire()
+    thread, _ = queue(controller, HIGH)
+    with pytest.raises(Overloaded) as e:
+        controller.acquire(HIGH)
+    assert e.value.status == 429
+    controller.release()
+    thread.join()
+    controller.release()
+
+
+def test_queue_timeout_is_503():
+    controller = AdmissionController(1, 4, max_queue_wait_ms=20)
+    controller.acquire()
+    with pytest.raises(Overloaded) as e:
+        controller.acquire()
+    assert e.value.status == 503
+    assert controller.stats()['queued'] == 0
+    controller.release()
+    assert controller.stats()['in_flight'] == 0
+
+
+def test_deadline_while_queued():
+    controller = AdmissionController(1, 4, max_queue_wait_ms=1000)
+    controller.acquire()
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        controller.acquire(deadline=start + 0.02)
+    assert time.monotonic() - start < 0.5
+    assert controller.stats()['queued'] == 0
+    controller.release()
+    assert controller.stats()['in_flight'] == 0
+
+
+def test_slot_releases_and_counts_expired_requests():
+    controller = AdmissionController(1, 1, max_queue_wait_ms=1000)
+    with controller.slot():
+        assert controller.stats()['in_flight'] == 1
+    assert controller.stats()['in_flight'] == 0
+
+    with pytest.raises(RuntimeError):
+        with controller.slot():
+            raise RuntimeError
+    assert controller.stats()['in_flight'] == 0
+
+    expired = controller.stats()['shed']['deadline']
+    controller.acquire()
+    with pytest.raises(DeadlineExceeded):
+        with controller.slot(deadline=time.monotonic() + 0.01):
+            pass
+    assert controller.stats()['shed']['deadline'] == expired + 1
+    controller.release()
+
+
+def test_async_acquire_is_admitted_on_release():
+    controller = AdmissionController(1, 4)
+
+    async def run():
+        await controller.acquire_async()
+        waiting = asyncio.ensure_future(controller.acquire_async())
+        await asyncio.sleep(0.01)
+        assert controller.stats()['queued'] == 1
+        controller.release()
+        await waiting
+        controller.release()
+
+    asyncio.run(run())
+    assert controller.stats()['in_flight'] == 0 and controller.stats()['queued'] == 0
+
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    controller = AdmissionController(1, 4)
+
+    async def run():
+        await controller.acquire_async()
+        waiting = asyncio.ensure_future(controller.acquire_async())
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert controller.stats()['queued'] == 0
+        controller.release()
+
+    asyncio.run(run())
+    assert controller.stats()['in_flight'] == 0
+
+
+def test_cancelled_async_waiter_returns_a_slot_it_was_given():
+    controller = AdmissionController(1, 4)
+
+    async def run():
+        await controller.acquire_async()
+        waiting = asyncio.ensure_future(controller.acquire_async())
+        await asyncio.sleep(0.01)
+        # Handed the slot, but cancelled before it runs again
+        controller.release()
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+    asyncio.run(run())
+    assert controller.stats()['in_flight'] == 0 and controller.stats()['queued'] == 0
+    controller.acquire()
+    controller.release()
+
+
+@pytest.mark.parametrize('value, priority', [
+    ('high', HIGH), (' HIGH ', HIGH), ('best-effort', BEST_EFFORT), ('normal', NORMAL), ('urgent', NORMAL),
+    (None, NORMAL),
+])
+def test_parse_priority(value, priority):
+    assert parse_priority(value) == priority
+
+
+@pytest.mark.parametrize('value, deadline', [
+    ('250', 100.25), ('0', None), ('-5', None), ('nan', None), ('inf', None), ('soon', None), (None, None),
+])
+def test_parse_deadline(value, deadline):
+    assert parse_deadline(value, now=100.0) == deadline
+
+
+class TestHTTP:
+    URL = '/v1/models/sentiment-classifier:predict'
+    BODY = {"instances": [{"text": "great"}]}
+
+    @pytest.fixture
+    def client(self, model_server):
+        return model_server.app.test_client()
+
+    def test_queue_full_is_429_with_retry_after(self, model_server, client, monkeypatch):
+        monkeypatch.setattr(model_server, 'admission', AdmissionController(0, 0))
+        response = client.post(self.URL, json=self.BODY)
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+
+    def test_queue_timeout_is_503_with_retry_after(self, model_server, client, monkeypatch):
+        monkeypatch.setattr(model_server, 'admission', AdmissionController(0, 1, max_queue_wait_ms=10))
+        response = client.post(self.URL, json=self.BODY)
+        assert response.status_code == 503
+        assert int(response.headers['Retry-After']) >= 1
+
+    def test_deadline_is_504(self, model_server, client, monkeypatch):
+        monkeypatch.setattr(model_server, 'admission', AdmissionController(0, 1, max_queue_wait_ms=1000))
+        response = client.post(self.URL, json=self.BODY, headers={'X-Request-Timeout-Ms': '10'})
+        assert response.status_code == 504
+
+    def test_stream_is_rejected_before_it_starts(self, model_server, client, monkeypatch):
+        monkeypatch.setattr(model_server, 'admission', AdmissionController(0, 0))
+        response = client.post(self.URL, data=b'{"text": "great"}\n', content_type='application/x-ndjson')
+        assert response.status_code == 429
+
+    def test_admitted_request_releases_its_slot(self, model_server, client, monkeypatch):
+        controller = AdmissionController(1, 0)
+        monkeypatch.setattr(model_server, 'admission', controller)
+        for _ in range(3):
+            assert client.post(self.URL, json=self.BODY).status_code == 200
+            response = client.post(self.URL, data=b'{"text": "great"}\n{"text": "awful"}\n',
+                                   content_type='application/x-ndjson')
+            assert len(response.get_data().splitlines()) == 2
+        assert controller.stats()['in_flight'] == 0
+
+
+def test_asgi_reads_the_body_before_taking_a_slot(model_server, monkeypatch):
+    import asgi
+
+    controller = AdmissionController(1, 0)
+    monkeypatch.setattr(model_server, 'admission', controller)
+
+    async def run():
+        uploaded = asyncio.Event()
+        slow_client_messages = []
+
+        async def slow_receive():
+            await uploaded.wait()
+            return {'type': 'http.request', 'body': b'{"instances": [{"text": "great"}]}'}
+
+        async def send(message):
+            slow_client_messages.append(message)
+
+        scope = {'type': 'http', 'method': 'POST', 'path': TestHTTP.URL, 'headers': [], 'query_string': b''}
+        slow = asyncio.ensure_future(asgi.app(scope, slow_receive, send))
+        await asyncio.sleep(0.01)
+        assert controller.stats()['in_flight'] == 0
+
+        # A fast client is served while the slow one is still uploading
+        fast_messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'{"instances": [{"text": "awful"}]}'}
+
+        async def fast_send(message):
+            fast_messages.append(message)
+
+        await asgi.app(scope, receive, fast_send)
+        assert fast_messages[0]['status'] == 200
+
+        uploaded.set()
+        await slow
+        assert slow_client_messages[0]['status'] == 200
+
+    asyncio.run(run())
+    assert controller.stats()['in_flight'] == 0
@@ -0,0 +1,99 @@
+import os
+import shutil
+import threading
+import time
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+from artifact import export_serving_artifact, load_model
+from conftest import SAMPLE_TEXTS, fit_pipeline
+from model_repository import ModelRepository, ServingOptions
+
+
+def test_artifact_matches_pipeline(pipeline, texts, tmp_path):
+    export_serving_artifact(pipeline, tmp_path / 'serving')
+    model = load_model(str(tmp_path / 'serving'))
+    np.testing.assert_allclose(model.predict_proba(texts), pipeline.predict_proba(texts), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(model.predict(texts), pipeline.predict(texts))
+
+
+@pytest.mark.parametrize('options', [
+    {'sorted_vocabulary': True},
+    {'dtype': 'float32', 'sorted_vocabulary': True},
+    {'dtype': 'int8'},
+], ids=repr)
+def test_compact_artifact_stays_close(pipeline, texts, tmp_path, options):
+    export_serving_artifact(pipeline, tmp_path / 'compact', **options)
+    model = load_model(str(tmp_path / 'compact'))
+    tolerance = 1e-12 if options.get('dtype', 'float64') == 'float64' else 0.05
+    np.testing.assert_allclose(model.predict_proba(texts), pipeline.predict_proba(texts), rtol=0, atol=tolerance)
+
+
+def test_reexport_leaves_loaded_model_intact(texts, tmp_path):
+    v1, v2 = fit_pipeline(CountVectorizer()), fit_pipeline(TfidfVectorizer(ngram_range=(1, 2)))
+    target = tmp_path / 'serving'
+    export_serving_artifact(v1, target)
+    loaded = load_model(str(target))
+
+    # The loaded model memory-maps the old files; they must not be rewritten under it
+    export_serving_artifact(v2, target)
+    np.testing.assert_allclose(loaded.predict_proba(texts), v1.predict_proba(texts), rtol=0, atol=1e-12)
+    np.testing.assert_allclose(load_model(str(target)).predict_proba(texts), v2.predict_proba(texts),
+                               rtol=0, atol=1e-12)
+    assert os.listdir(tmp_path) == ['serving']
+
+
+@pytest.mark.parametrize('layout', ['joblib', 'artifact'])
+def test_no_failed_requests_during_reload(tmp_path, layout):
+    pipelines = [fit_pipeline(CountVectorizer()), fit_pipeline(TfidfVectorizer(ngram_range=(1, 2)))]
+    sources = []
+    for i, model in enumerate(pipelines):
+        sources.append(tmp_path / f'model{i}.joblib')
+        joblib.dump(model, sources[-1])
+
+    if layout == 'joblib':
+        path = tmp_path / 'model.joblib'
+        shutil.copyfile(sources[0], path)
+
+        def replace(i):
+            # Write aside, then rename over, as a deploy should
+            shutil.copyfile(sources[i], f'{path}.tmp')
+            os.replace(f'{path}.tmp', path)
+    else:
+        path = tmp_path / 'serving'
+        export_serving_artifact(pipelines[0], path)
+
+        def replace(i):
+            export_serving_artifact(pipelines[i], path)
+
+    repository = ModelRepository(ServingOptions(), watch_seconds=0.05)
+    repository.add_model('sentiment-classifier', '1', str(path))
+    reloads = repository.reloads.value
+    errors, stop = [], threading.Event()
+
+    def client():
+        while not stop.is_set():
+            try:
+                labels, _ = repository.get('sentiment-classifier').predict(SAMPLE_TEXTS)
+                assert len(labels) == len(SAMPLE_TEXTS)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=client) for _ in range(4)]
+    for t in threads:
+        t.start()
+    try:
+        for i in range(1, 5):
+            time.sleep(0.3)
+            replace(i % 2)
+        time.sleep(0.5)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+    assert not errors
+    assert repository.reloads.value > reloads
@@ -0,0 +1,139 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from admission import DeadlineExceeded
+from batcher import MicroBatcher
+
+
+class RecordingModel:
+    """predict_fn returning (the texts' lengths, their index in the batch), recording each batch."""
+
+    def __init__(self):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        self.started.set()
+        self.release.wait()
+        return np.array([len(text) for text in texts]), np.arange(len(texts))
+
+
+def submit_all(batcher, requests):
+    results, errors = [None] * len(requests), [None] * len(requests)
+
+    def submit(i):
+        try:
+            results[i] = batcher.submit(requests[i])
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def submit_behind_a_busy_batch(batcher, model, requests):
+    """Submit `requests` while the model is busy, so they queue up, then let them through."""
+    model.release.clear()
+    first = threading.Thread(target=batcher.submit, args=(['first'],))
+    first.start()
+    model.started.wait()
+    outcome = []
+    runner = threading.Thread(target=lambda: outcome.extend(submit_all(batcher, requests)))
+    runner.start()
+    while batcher.stats()['queue_depth'] < len(requests):
+        time.sleep(0.001)
+    model.release.set()
+    runner.join()
+    first.join()
+    return outcome
+
+
+def test_concurrent_requests_share_a_batch_and_get_their_own_rows():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=64, max_wait_ms=50)
+    requests = [['a' * i, 'b' * (i + 10)] for i in range(8)]
+    results, errors = submit_behind_a_busy_batch(batcher, model, requests)
+
+    assert errors == [None] * len(requests)
+    assert [len(batch) for batch in model.batches] == [1, 2 * len(requests)]
+    for request, (lengths, _) in zip(requests, results):
+        assert lengths.tolist() == [len(text) for text in request]
+
+
+def test_batches_stop_at_max_batch_size():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=4, max_wait_ms=50)
+    submit_behind_a_busy_batch(batcher, model, [[str(i)] for i in range(10)])
+
+    assert [len(batch) for batch in model.batches] == [1, 4, 4, 2]
+    assert batcher.stats()['batch_size']['count'] == 4
+
+
+def test_lone_request_waits_at_most_max_wait():
+    batcher = MicroBatcher(RecordingModel(), max_batch_size=64, max_wait_ms=20)
+    batcher.submit(['warm up the worker'])
+    start = time.perf_counter()
+    labels, _ = batcher.submit(['alone'])
+    assert labels.tolist() == [5]
+    assert time.perf_counter() - start < 0.5
+
+
+def test_model_error_reaches_every_request_in_the_batch():
+    def fail(texts):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(fail, max_batch_size=64, max_wait_ms=20)
+    _, errors = submit_all(batcher, [['a'], ['b'], ['c']])
+    assert all(isinstance(e, RuntimeError) for e in errors)
+
+    # The worker keeps going after a failed batch
+    batcher.predict_fn = RecordingModel()
+    assert batcher.submit(['ok'])[0].tolist() == [2]
+
+
+def test_expired_requests_never_reach_the_model():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=64, max_wait_ms=1)
+    with pytest.raises(DeadlineExceeded):
+        batcher.submit(['late'], deadline=time.monotonic() - 1)
+    assert model.batches == []
+    assert batcher.submit(['on time'], deadline=time.monotonic() + 10)[0].tolist() == [7]
+
+
+def test_close_scores_queued_requests_then_scores_directly():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=64, max_wait_ms=1)
+    batcher.submit(['before'])
+    batcher.close()
+    assert batcher.submit(['after'])[0].tolist() == [5]
+    assert model.batches == [['before'], ['after']]
+    with pytest.raises(DeadlineExceeded):
+        batcher.submit(['late'], deadline=time.monotonic() - 1)
+
+
+def test_unhealthy_while_stalled_on_one_batch():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=64, max_wait_ms=1)
+    assert batcher.healthy(0.01)
+
+    model.release.clear()
+    thread = threading.Thread(target=batcher.submit, args=(['stuck'],))
+    thread.start()
+    model.started.wait()
+    time.sleep(0.05)
+    assert not batcher.healthy(0.01)
+    assert batcher.healthy(10)
+
+    model.release.set()
+    thread.join()
+    assert batcher.healthy(0.01)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+from conftest import fit_pipeline
+from fast_scorer import FastScorer
+
+
+def assert_matches(model, scorer, texts):
+    np.testing.assert_allclose(scorer.predict_proba(texts), model.predict_proba(texts), rtol=0, atol=1e-9)
+    np.testing.assert_array_equal(scorer.predict(texts), model.predict(texts))
+
+
+@pytest.mark.parametrize('compiled_features', [True, False])
+def test_matches_pipeline(pipeline, texts, compiled_features):
+    assert_matches(pipeline, FastScorer.from_model(pipeline, compiled_features=compiled_features), texts)
+
+
+@pytest.mark.parametrize('vectorizer', [
+    CountVectorizer(binary=True),
+    CountVectorizer(ngram_range=(1, 3), stop_words='english'),
+    TfidfVectorizer(sublinear_tf=True, norm='l1'),
+    TfidfVectorizer(ngram_range=(1, 2), use_idf=False, norm=None),
+], ids=repr)
+def test_matches_vectorizer_settings(vectorizer, texts):
+    model = fit_pipeline(vectorizer)
+    assert_matches(model, FastScorer.from_model(model), texts)
+
+
+def test_empty_batch(pipeline):
+    assert FastScorer.from_model(pipeline).predict_proba([]).shape == (0, 2)
+
+
+def test_unsupported_classifier():
+    model = Pipeline([('vectorizer', CountVectorizer()), ('classifier', LogisticRegression())])
+    model.fit(["good", "bad"], [1, 0])
+    with pytest.raises(ValueError, match='LogisticRegression'):
+        FastScorer.from_model(model)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+from conftest import fit_pipeline
+from feature_extractor import FeatureExtractor, compile_features, compiled_features_faster
+
+VECTORIZERS = [
+    CountVectorizer(),
+    CountVectorizer(ngram_range=(1, 3)),
+    CountVectorizer(ngram_range=(2, 2), binary=True),
+    CountVectorizer(stop_words='english', ngram_range=(1, 2)),
+    TfidfVectorizer(ngram_range=(1, 2), strip_accents='unicode'),
+    TfidfVectorizer(ngram_range=(1, 2), lowercase=False, norm='l1'),
+    TfidfVectorizer(ngram_range=(1, 2), min_df=3, sublinear_tf=True),
+    TfidfVectorizer(ngram_range=(1, 2), max_features=50, use_idf=False),
+    TfidfVectorizer(ngram_range=(1, 2), token_pattern=r"(?u)\b\w+\b", norm=None),
+]
+
+
+@pytest.mark.parametrize('vectorizer', VECTORIZERS, ids=repr)
+def test_transform_is_identical(vectorizer, texts):
+    vectorizer.fit(texts)
+    expected = vectorizer.transform(texts)
+    actual = FeatureExtractor(vectorizer).transform(texts)
+
+    assert type(actual) is type(expected)
+    assert actual.shape == expected.shape
+    for name in ('data', 'indices', 'indptr'):
+        a, b = getattr(actual, name), getattr(expected, name)
+        assert a.dtype == b.dtype, name
+        np.testing.assert_array_equal(a, b, err_msg=name)
+
+
+def test_compiled_pipeline_predicts_the_same(pipeline, texts):
+    np.testing.assert_array_equal(compile_features(pipeline).predict_proba(texts), pipeline.predict_proba(texts))
+
+
+def test_custom_analyzer_is_rejected():
+    vectorizer = CountVectorizer(analyzer=str.split).fit(["good", "bad"])
+    with pytest.raises(ValueError):
+        FeatureExtractor(vectorizer)
+
+
+@pytest.mark.parametrize('vectorizer, faster', [
+    (CountVectorizer(), False),
+    (CountVectorizer(ngram_range=(1, 2)), True),
+    (TfidfVectorizer(), True),
+], ids=repr)
+def test_compiled_only_where_faster(vectorizer, faster):
+    assert compiled_features_faster(fit_pipeline(vectorizer)) is faster
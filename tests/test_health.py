@@ -0,0 +1,199 @@
+import gzip
+import json
+import threading
+import time
+
+import pytest
+
+import health
+from health import Readiness, UtilizationTracker, live, load_warmup_texts
+
+
+class FakeModel:
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.version = '1'
+        self.fail = fail
+        self.batches = []
+        self.batcher = None
+
+    def score(self, texts):
+        if self.fail:
+            raise RuntimeError("broken model")
+        self.batches.append(texts)
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_ready_once_every_model_has_warmed_up():
+    readiness = Readiness(batches=2, batch_size=5, texts=["a", "b"])
+    models = [FakeModel('m'), FakeModel('broken', fail=True), FakeModel('n')]
+    assert not readiness.ready
+
+    readiness.start(lambda: models)
+    wait_for(lambda: readiness.ready)
+    # A broken model does not keep the others out of service
+    assert models[0].batches == models[2].batches == [["a", "b", "a", "b", "a"]] * 2
+    assert readiness.stats()["warmup_seconds"] is not None
+
+
+def test_warms_up_once_per_process():
+    readiness = Readiness(batches=1, batch_size=1, texts=["a"])
+    model = FakeModel('m')
+    readiness.start(lambda: [model])
+    wait_for(lambda: readiness.ready)
+    readiness.start(lambda: [model])
+    assert len(model.batches) == 1
+
+
+def test_ready_at_once_without_warm_up_batches():
+    readiness = Readiness(batches=0)
+    readiness.start(lambda: pytest.fail("nothing to warm up"))
+    assert readiness.ready
+
+
+def test_waits_for_every_worker():
+    readiness = Readiness(batches=0)
+    readiness.expected_workers = 2
+    readiness.start(list)
+    assert readiness.warm and not readiness.ready
+
+    # Another worker, forked from the same master, warms up
+    with readiness._warmed_workers.get_lock():
+        readiness._warmed_workers.value += 1
+    assert readiness.ready
+
+
+def test_load_warmup_texts(tmp_path):
+    path = tmp_path / 'warmup.jsonl'
+    path.write_text('{"text": "great"}\n\n{"text": "awful"}\n')
+    assert load_warmup_texts(str(path), 10) == ["great", "awful"]
+    assert load_warmup_texts(str(path), 1) == ["great"]
+
+    trace = tmp_path / 'trace.jsonl.gz'
+    with gzip.open(trace, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps({"timestamp": 0, "payload": {"instances": [{"text": "a"}, {"text": "b"}]}}) + '\n')
+        f.write(json.dumps({"timestamp": 1, "payload": {"instances": [{"text": "c"}]}}) + '\n')
+    assert load_warmup_texts(str(trace), 10) == ["a", "b", "c"]
+
+    empty = tmp_path / 'empty.jsonl'
+    empty.write_text('\n')
+    with pytest.raises(ValueError):
+        load_warmup_texts(str(empty), 10)
+
+
+def test_live_unless_a_batcher_is_stalled():
+    class Batcher:
+        def __init__(self, healthy):
+            self.healthy = lambda stall_seconds: healthy
+
+    stalled, running = FakeModel('a'), FakeModel('b')
+    stalled.batcher, running.batcher = Batcher(False), Batcher(True)
+    assert live([running, FakeModel('c')])
+    assert not live([running, stalled])
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(health, 'time', clock)
+    return clock
+
+
+def serve(tracker, clock, seconds, rate, service_seconds):
+    """Requests arriving at `rate` per second for `seconds`, each taking `service_seconds`, one at a time."""
+    for _ in range(int(seconds * rate)):
+        with tracker.request():
+            clock.now += service_seconds
+        clock.now += 1.0 / rate - service_seconds
+
+
+def test_utilization_is_busy_fraction_while_keeping_up(clock):
+    tracker = UtilizationTracker(window_seconds=10)
+    serve(tracker, clock, 10, rate=5, service_seconds=0.04)
+    stats = tracker.stats()
+    assert stats["arrival_rate"] == pytest.approx(5, rel=0.05)
+    assert stats["capacity_requests_per_second"] == pytest.approx(25, rel=0.05)
+    assert stats["utilization"] == pytest.approx(0.2, rel=0.05)
+    assert stats["utilization"] == pytest.approx(stats["busy_fraction"], rel=0.05)
+
+
+def test_utilization_grows_past_one_when_overloaded(clock):
+    tracker = UtilizationTracker(window_seconds=10)
+    serve(tracker, clock, 10, rate=5, service_seconds=0.1)
+    assert tracker.utilization() == pytest.approx(0.5, rel=0.05)
+
+    # Three times the capacity arrives; two in three requests are turned away at once
+    for _ in range(300):
+        with pytest.raises(RuntimeError):
+            with tracker.request():
+                raise RuntimeError("shed")
+        with pytest.raises(RuntimeError):
+            with tracker.request():
+                raise RuntimeError("shed")
+        with tracker.request():
+            clock.now += 0.1
+    assert tracker.capacity() == pytest.approx(10, rel=0.05)
+    assert tracker.utilization() == pytest.approx(3, rel=0.05)
+
+
+def test_busy_time_counts_overlapping_requests_once(clock):
+    tracker = UtilizationTracker(window_seconds=10)
+    with tracker.request():
+        with tracker.request():
+            clock.now += 2
+        clock.now += 1
+    assert tracker.busy_seconds() == pytest.approx(3)
+
+
+class TestProbes:
+    @pytest.fixture
+    def warming_up(self, model_server, monkeypatch):
+        """A fresh Readiness whose warm-up waits until the event is set."""
+        release = threading.Event()
+
+        def targets():
+            release.wait()
+            return []
+
+        readiness = Readiness(batches=1, texts=["great"])
+        monkeypatch.setattr(model_server, 'readiness', readiness)
+        monkeypatch.setattr(model_server, 'warm_up_targets', targets)
+        yield release
+        release.set()
+
+    def test_not_ready_while_warming_up(self, model_server, warming_up):
+        client = model_server.app.test_client()
+        response = client.get('/v2/health/ready')
+        assert response.status_code == 400 and response.get_json() == {"ready": False}
+        assert client.get('/v1/models/sentiment-classifier').status_code == 503
+        assert client.get('/v2/models/sentiment-classifier/ready').status_code == 400
+        # Predictions are still served
+        assert client.post('/v1/models/sentiment-classifier:predict',
+                           json={"instances": [{"text": "great"}]}).status_code == 200
+
+        warming_up.set()
+        wait_for(lambda: client.get('/v2/health/ready').status_code == 200)
+        assert client.get('/v1/models/sentiment-classifier').get_json() == {"status": "ready"}
+
+    def test_utilization_is_exported(self, model_server):
+        client = model_server.app.test_client()
+        client.post('/v1/models/sentiment-classifier:predict', json={"instances": [{"text": "great"}]})
+        body = client.get('/metrics').get_data(as_text=True)
+        for name in ('model_server_utilization', 'model_server_capacity_requests_per_second',
+                     'model_server_busy_seconds_total', 'model_server_ready'):
+            assert f'\n{name} ' in body
+        assert client.get('/v1/models/sentiment-classifier/stats').get_json()["utilization"]["window_seconds"] > 0
@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+import pytest
+from flask import Flask, jsonify
+
+from conftest import SAMPLE_TEXTS
+from inference import format_predictions
+from json_codec import CODECS, RequestValidationError
+
+TEXTS = SAMPLE_TEXTS + ["", "naïve café ☕", "quote \" and \\ backslash", "tab\tnew\nline", " "]
+
+
+@pytest.fixture(params=list(CODECS))
+def codec(request):
+    try:
+        return CODECS[request.param]()
+    except ImportError:
+        pytest.skip(f"{request.param} is not installed")
+
+
+@pytest.mark.parametrize('n', [0, 1, 7, 1024])
+@pytest.mark.parametrize('ensure_ascii', [True, False])
+def test_decodes_like_request_json(codec, n, ensure_ascii):
+    instances = [{"text": TEXTS[i % len(TEXTS)]} if i % 5 else {"text": TEXTS[i % len(TEXTS)], "id": i}
+                 for i in range(n)]
+    body = json.dumps({"instances": instances}, ensure_ascii=ensure_ascii).encode('utf-8')
+    assert codec.decode_predict_request(body) == [instance['text'] for instance in instances]
+
+
+def test_missing_fields_score_as_empty(codec):
+    assert codec.decode_predict_request(b'{}') == []
+    assert codec.decode_predict_request(b'{"instances": [{}]}') == [""]
+
+
+@pytest.mark.parametrize('body', [b'not json', b'[]', b'{"instances": {}}', b'{"instances": ["text"]}',
+                                  b'{"instances": [{"text": 1}]}'])
+def test_rejects_malformed_requests(codec, body):
+    with pytest.raises(RequestValidationError):
+        codec.decode_predict_request(body)
+
+
+@pytest.mark.parametrize('n', [0, 1, 7, 1024])
+@pytest.mark.parametrize('dtype', [np.int64, np.int32])
+def test_encodes_like_jsonify(codec, n, dtype):
+    rng = np.random.default_rng(n)
+    labels = rng.integers(0, 5, n).astype(dtype)
+    confidences = rng.random(n) * 0.5 + 0.5
+    with Flask(__name__).app_context():
+        expected = jsonify({"predictions": format_predictions(labels, confidences)}).get_data()
+    assert codec.encode_predictions(labels, confidences) == expected
+
+
+def test_stream_lines(codec):
+    assert codec.decode_instance(b'{"text": "great"}') == "great"
+    with pytest.raises(RequestValidationError):
+        codec.decode_instance(b'"great"')
+
+    labels, confidences = np.array([1, 0]), np.array([0.75, 0.5])
+    lines = codec.encode_prediction_lines(labels, confidences).decode('utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == format_predictions(labels, confidences)
+
+
+def test_error_line_is_compact(codec):
+    assert codec.encode_error_line('Line 2: bad "line"') == b'{"error":"Line 2: bad \\"line\\""}\n'
+
+
+def test_stream_error_line_matches_prediction_lines(model_server):
+    response = model_server.app.test_client().post(
+        '/v1/models/sentiment-classifier:predict', data=b'{"text": "great"}\n"not an instance"\n',
+        content_type='application/x-ndjson')
+    prediction, error = response.get_data().splitlines()
+    assert b' ' not in prediction
+    assert error.startswith(b'{"error":"Line 2: ')
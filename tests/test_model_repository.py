@@ -0,0 +1,138 @@
+import collections
+import json
+import os
+
+import joblib
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer
+
+from conftest import SAMPLE_TEXTS, fit_pipeline
+from model_repository import ModelRepository, ServingOptions
+
+
+@pytest.fixture(scope='module')
+def model_bytes(tmp_path_factory):
+    path = tmp_path_factory.mktemp('model') / 'model.joblib'
+    joblib.dump(fit_pipeline(CountVectorizer()), path)
+    return path.read_bytes()
+
+
+@pytest.fixture
+def model_dir(tmp_path, model_bytes):
+    """MODEL_DIR with models a (versions 1, 2, 10) and b, c (version 1)."""
+    for name, versions in (('a', ['1', '2', '10']), ('b', ['1']), ('c', ['1'])):
+        for version in versions:
+            os.makedirs(tmp_path / 'models' / name / version)
+            (tmp_path / 'models' / name / version / 'model.joblib').write_bytes(model_bytes)
+    return tmp_path / 'models'
+
+
+def repository(model_dir, **kwargs):
+    return ModelRepository(ServingOptions(batching=False), model_dir=str(model_dir), **kwargs)
+
+
+def test_scans_models_and_versions(model_dir):
+    repo = repository(model_dir)
+    assert repo.model_names() == ['a', 'b', 'c']
+    assert sorted(repo.versions('a')) == ['1', '10', '2']
+    assert repo.versions('missing') == {}
+
+
+def test_unversioned_requests_go_to_the_highest_version(model_dir):
+    repo = repository(model_dir)
+    assert repo.traffic('a') == [('10', 1.0)]
+    assert repo.get('a').version == '10'
+    assert repo.get('a', '2').version == '2'
+    with pytest.raises(KeyError):
+        repo.get('a', '3')
+    with pytest.raises(KeyError):
+        repo.get('missing')
+
+
+def test_traffic_split(model_dir):
+    (model_dir / 'a' / 'traffic.json').write_text(json.dumps({"1": 90, "2": 10, "3": 50, "10": 0}))
+    repo = repository(model_dir)
+    # Unknown and zero-weight versions take no traffic
+    assert sorted(repo.traffic('a')) == [('1', 90.0), ('2', 10.0)]
+
+    counts = collections.Counter(repo.choose_version('a') for _ in range(5000))
+    assert set(counts) == {'1', '2'}
+    assert 0.07 < counts['2'] / 5000 < 0.13
+
+
+def test_traffic_split_without_usable_weights_uses_highest_version(model_dir):
+    (model_dir / 'a' / 'traffic.json').write_text(json.dumps({"3": 100, "1": 0}))
+    assert repository(model_dir).traffic('a') == [('10', 1.0)]
+
+
+def test_least_recently_used_models_are_evicted(model_dir, model_bytes):
+    repo = repository(model_dir, memory_budget_bytes=int(2.5 * len(model_bytes)))
+    a = repo.get('a', '1')
+    repo.get('b')
+    repo.get('a', '1')
+    repo.get('c')
+    assert sorted(f"{s.name}/{s.version}" for s in repo.loaded()) == ['a/1', 'c/1']
+    assert repo.evictions == 1
+
+    # A request still holding an evicted model finishes on it
+    repo.get('b')
+    assert sorted(f"{s.name}/{s.version}" for s in repo.loaded()) == ['b/1', 'c/1']
+    labels, _ = a.predict(SAMPLE_TEXTS)
+    assert len(labels) == len(SAMPLE_TEXTS)
+
+
+def test_without_a_budget_nothing_is_evicted(model_dir):
+    repo = repository(model_dir)
+    for name in ('a', 'b', 'c'):
+        repo.get(name)
+    assert len(repo.loaded()) == 3 and repo.evictions == 0
+
+
+@pytest.mark.parametrize('name', ['..', '.', '', '../models', 'a/1', 'a/../b', '/etc'])
+def test_names_outside_model_dir_are_rejected(model_dir, model_bytes, name):
+    # A model right outside MODEL_DIR, where `..` would find it
+    (model_dir.parent / '1').mkdir()
+    (model_dir.parent / '1' / 'model.joblib').write_bytes(model_bytes)
+    repo = repository(model_dir)
+    assert repo.versions(name) == {}
+    with pytest.raises(KeyError):
+        repo.get(name)
+
+
+def test_unknown_names_are_not_cached(model_dir):
+    repo = repository(model_dir)
+    for i in range(100):
+        assert repo.versions(f'missing-{i}') == {}
+    repo.versions('a')
+    assert list(repo._scanned) == ['a']
+
+
+def test_added_models_are_served_next_to_model_dir(model_dir, tmp_path, model_bytes):
+    path = tmp_path / 'extra.joblib'
+    path.write_bytes(model_bytes)
+    repo = repository(model_dir)
+    repo.add_model('a', '20', str(path))
+    repo.add_model('extra', '1', str(path))
+    assert repo.get('a').version == '20'
+    assert 'extra' in repo.model_names()
+
+
+def test_reload_swaps_in_a_new_model(model_dir):
+    repo = repository(model_dir)
+    old = repo.get('b')
+    reloads = repo.reloads.value
+    new = repo.reload('b', '1')
+    assert repo.get('b') is new and new is not old
+    assert repo.reloads.value == reloads + 1
+    assert len(old.predict(SAMPLE_TEXTS)[0]) == len(SAMPLE_TEXTS)
+
+
+def test_failed_reload_keeps_the_old_model(model_dir):
+    repo = repository(model_dir)
+    old = repo.get('b')
+    errors = repo.reload_errors.value
+    (model_dir / 'b' / '1' / 'model.joblib').write_bytes(b'not a model')
+    with pytest.raises(Exception):
+        repo.reload('b', '1')
+    assert repo.get('b') is old
+    assert repo.reload_errors.value == errors + 1
@@ -0,0 +1,99 @@
+import time
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer
+
+from conftest import SAMPLE_TEXTS, fit_pipeline
+from model_repository import ServedModel, ServingOptions
+from prediction_cache import PredictionCache, normalize_text
+
+
+@pytest.mark.parametrize('text, lowercase, normalized', [
+    ("  Great   product\n", True, "great product"),
+    ("Great\tProduct", False, "Great Product"),
+    ("", True, ""),
+])
+def test_normalize_text(text, lowercase, normalized):
+    assert normalize_text(text, lowercase) == normalized
+
+
+def test_equivalent_texts_share_a_key():
+    cache = PredictionCache('1')
+    assert cache.key("Great  product") == cache.key("great product")
+    assert cache.key("great product") != cache.key("great products")
+    assert PredictionCache('1', lowercase=False).key("Great") != PredictionCache('1', lowercase=False).key("great")
+
+
+def test_keys_differ_between_model_versions():
+    assert PredictionCache('1').key("great") != PredictionCache('2').key("great")
+
+
+def test_hits_and_misses():
+    cache = PredictionCache('1')
+    keys = [cache.key(text) for text in ("a", "b")]
+    assert cache.get_many(keys) == [None, None]
+    cache.put_many(keys, [1, 0], [0.9, 0.6])
+    assert cache.get_many(keys + [cache.key("c")]) == [(1, 0.9), (0, 0.6), None]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 3, 2)
+    assert stats["hit_ratio"] == pytest.approx(0.4)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache('1', max_entries=2)
+    a, b, c = (cache.key(text) for text in "abc")
+    cache.put_many([a, b], [1, 1], [0.5, 0.5])
+    cache.get_many([a])
+    cache.put_many([c], [0], [0.5])
+    assert cache.get_many([a, b, c]) == [(1, 0.5), None, (0, 0.5)]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_max_bytes_bounds_entries():
+    cache = PredictionCache('1', max_entries=100000, max_bytes=10000)
+    assert cache.max_entries < 100
+    keys = [cache.key(str(i)) for i in range(1000)]
+    cache.put_many(keys, [0] * 1000, [0.5] * 1000)
+    assert cache.stats()["entries"] == cache.max_entries
+
+
+def test_expired_entries_are_misses():
+    cache = PredictionCache('1', ttl_seconds=0.01)
+    key = cache.key("a")
+    cache.put_many([key], [1], [0.9])
+    assert cache.get_many([key]) == [(1, 0.9)]
+    time.sleep(0.02)
+    assert cache.get_many([key]) == [None]
+    assert cache.stats()["expirations"] == 1 and cache.stats()["entries"] == 0
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    path = tmp_path / 'model.joblib'
+    joblib.dump(fit_pipeline(CountVectorizer()), path)
+    return str(path)
+
+
+def test_served_model_scores_only_distinct_misses(model_path, texts):
+    served = ServedModel('m', '1', model_path, ServingOptions(cache=True, batching=False))
+    uncached = ServedModel('m', '1', model_path, ServingOptions(cache=False, batching=False))
+    scored = []
+    run_model = served.run_model
+    served.run_model = lambda batch: scored.append(list(batch)) or run_model(batch)
+
+    batch = SAMPLE_TEXTS[:3] + [SAMPLE_TEXTS[0].upper(), SAMPLE_TEXTS[1] + '  ']
+    labels, confidences = served.predict(batch)
+    assert scored == [SAMPLE_TEXTS[:3]]
+
+    expected_labels, expected_confidences = uncached.predict(batch)
+    np.testing.assert_array_equal(labels, expected_labels)
+    np.testing.assert_array_equal(confidences, expected_confidences)
+
+    # Now all hits, and mixed batches only score their misses
+    served.predict(batch)
+    served.predict(texts)
+    assert len(scored) == 2 and SAMPLE_TEXTS[0] not in scored[1]
+    np.testing.assert_array_equal(served.predict(texts)[1], uncached.predict(texts)[1])
+    served.close()
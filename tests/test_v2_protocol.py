@@ -0,0 +1,131 @@
+import json
+
+import numpy as np
+import pytest
+
+from v2_protocol import (HEADER_LENGTH, InferenceRequestError, decode_infer_request, encode_bytes_tensor,
+                         encode_infer_response)
+
+
+def json_request(data, shape=None, **tensor):
+    tensor = dict({"name": "text", "datatype": "BYTES", "shape": [len(data)] if shape is None else shape,
+                   "data": data}, **tensor)
+    return json.dumps({"inputs": [tensor]}).encode('utf-8')
+
+
+def binary_request(texts, shape=None):
+    data = encode_bytes_tensor(texts)
+    header = json.dumps({"inputs": [{"name": "text", "datatype": "BYTES",
+                                     "shape": [len(texts)] if shape is None else shape,
+                                     "parameters": {"binary_data_size": len(data)}}]}).encode('utf-8')
+    return header + data, len(header)
+
+
+def test_decodes_json_data():
+    texts, _ = decode_infer_request(json_request(["great", "awful"]))
+    assert texts == ["great", "awful"]
+
+
+def test_decodes_nested_json_data():
+    texts, _ = decode_infer_request(json_request([["great"], ["awful"]], shape=[2, 1]))
+    assert texts == ["great", "awful"]
+
+
+def test_decodes_binary_data():
+    body, header_length = binary_request(["great", "naïve café ☕", ""])
+    texts, _ = decode_infer_request(body, str(header_length))
+    assert texts == ["great", "naïve café ☕", ""]
+
+
+@pytest.mark.parametrize('data', [
+    [["great"], 5],
+    [5, "great"],
+    [["great"], [None]],
+    [{"text": "great"}],
+    [[True]],
+], ids=repr)
+def test_rejects_non_string_elements(data):
+    with pytest.raises(InferenceRequestError, match='must be strings'):
+        decode_infer_request(json_request(data, shape=[len(data)]))
+
+
+def test_string_row_is_not_split_into_characters():
+    with pytest.raises(InferenceRequestError, match='shape'):
+        decode_infer_request(json_request([["great", "awful"], "ok"], shape=[2, 2]))
+
+
+@pytest.mark.parametrize('data, shape', [
+    (["great", "awful"], [3]),
+    (["great", "awful"], [1, 1]),
+    ([["great"], ["awful"]], [1]),
+    (["great"], [0]),
+], ids=repr)
+def test_rejects_data_that_does_not_match_shape(data, shape):
+    with pytest.raises(InferenceRequestError, match='shape'):
+        decode_infer_request(json_request(data, shape=shape))
+
+
+@pytest.mark.parametrize('shape', [None, "2", [-1], [2.0], [True, 2]], ids=repr)
+def test_rejects_invalid_shape(shape):
+    body = json.dumps({"inputs": [{"name": "text", "datatype": "BYTES", "shape": shape,
+                                   "data": ["great", "awful"]}]}).encode('utf-8')
+    with pytest.raises(InferenceRequestError, match='shape'):
+        decode_infer_request(body)
+
+
+def test_rejects_binary_data_that_does_not_match_shape():
+    body, header_length = binary_request(["great", "awful"], shape=[3])
+    with pytest.raises(InferenceRequestError, match='shape'):
+        decode_infer_request(body, str(header_length))
+
+
+@pytest.mark.parametrize('body', [
+    b'not json',
+    b'[]',
+    b'{"inputs": {}}',
+    b'{"inputs": ["text"]}',
+    b'{"inputs": [{"name": "other", "datatype": "BYTES", "data": []}, {"name": "x", "datatype": "BYTES"}]}',
+    b'{"inputs": [{"name": "text", "datatype": "FP32", "shape": [1], "data": [1.0]}]}',
+    b'{"inputs": [{"name": "text", "datatype": "BYTES", "shape": [1]}]}',
+    b'{"inputs": [{"name": "text", "datatype": "BYTES", "shape": [1], "data": ["a"], "parameters": []}]}',
+    b'{"inputs": [{"name": "text", "datatype": "BYTES", "shape": [1], "data": ["a"]}], "parameters": 1}',
+    b'{"inputs": [{"name": "text", "datatype": "BYTES", "shape": [1], "data": ["a"]}], "outputs": {}}',
+    b'{"inputs": [{"name": "text", "datatype": "BYTES", "shape": [1], "data": ["a"]}], "outputs": [1]}',
+    b'{"inputs": [{"name": "text", "datatype": "BYTES", "shape": [1], "data": ["a"]}],'
+    b' "outputs": [{"name": "probability"}]}',
+    b'[' * 100000,
+], ids=lambda body: body[:60].decode('utf-8'))
+def test_rejects_malformed_requests(body):
+    with pytest.raises(InferenceRequestError):
+        decode_infer_request(body)
+
+
+@pytest.mark.parametrize('size', ['-1', '"4"', 'true', '1.5', '100'])
+def test_rejects_invalid_binary_data_size(size):
+    header = (b'{"inputs": [{"name": "text", "datatype": "BYTES", "shape": [1],'
+              b' "parameters": {"binary_data_size": ' + size.encode('ascii') + b'}}]}')
+    with pytest.raises(InferenceRequestError):
+        decode_infer_request(header + encode_bytes_tensor(["a"]), str(len(header)))
+
+
+@pytest.mark.parametrize('header_length', ['abc', '-1', '1000000'])
+def test_rejects_invalid_header_length(header_length):
+    body, _ = binary_request(["great"])
+    with pytest.raises(InferenceRequestError, match=HEADER_LENGTH):
+        decode_infer_request(body, header_length)
+
+
+@pytest.mark.parametrize('data', [b'\x05\x00\x00\x00abc', b'\x01\x00', b'\x01\x00\x00\x00\xff'])
+def test_rejects_corrupt_binary_tensor(data):
+    header = json.dumps({"inputs": [{"name": "text", "datatype": "BYTES", "shape": [1],
+                                     "parameters": {"binary_data_size": len(data)}}]}).encode('utf-8')
+    with pytest.raises(InferenceRequestError, match='BYTES tensor'):
+        decode_infer_request(header + data, str(len(header)))
+
+
+def test_binary_response():
+    request = {"inputs": [], "parameters": {"binary_data_output": True}}
+    body, header_length = encode_infer_response('m', '1', request, np.array([1, 0]), np.array([0.75, 0.5]))
+    header = json.loads(body[:header_length])
+    assert [output["parameters"]["binary_data_size"] for output in header["outputs"]] == [16, 8]
+    np.testing.assert_array_equal(np.frombuffer(body[header_length + 16:], '<f4'), [0.75, 0.5])